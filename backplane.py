@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# deliver(channel, message, payload) fans a published message out to this process's sockets
+Deliver = Callable[[str, dict, Any], Awaitable[None]]
+# Subscribers per channel in this process
+Subscribers = Callable[[], Dict[str, int]]
+# requested(channel) has the leader scrape a channel another process asked for
+Requested = Callable[[str], Awaitable[None]]
+
+# Extend or release the leader key only while this process still holds it, in one step,
+# so a key that expired and was taken by another process is never touched
+RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+RESIGN = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class InMemoryBackplane:
+    """Single-process backplane: publishing delivers straight to local sockets.
+
+    It is always the leader, so the one process runs the scrape cycle.
+    """
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+        self.is_leader = True
+
+    async def start(self, deliver: Deliver, subscribers: Optional[Subscribers] = None, requested: Optional[Requested] = None):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, channel: str, message: dict, payload: Any = None):
+        if self._deliver is not None:
+            await self._deliver(channel, message, payload)
+
+    async def subscriber_counts(self, local: Dict[str, int]) -> Dict[str, int]:
+        return local
+
+    async def request_scrape(self, channel: str):
+        pass
+
+
+class RedisBackplane:
+    """Fans broadcasts out to every process through Redis pub/sub.
+
+    Every process subscribes to one pub/sub topic and delivers what it
+    receives to its own sockets, including messages it published itself.
+    Leadership is a Redis key held with SET NX and a TTL that the leader
+    keeps renewing; only the leader runs the scrape cycle, and another
+    process takes over within `LEADER_TTL` seconds if it dies.
+
+    Each new leader takes the next leader epoch from a Redis counter and
+    stamps it on the versioned messages it publishes as `epoch`. Versions
+    are only comparable within an epoch: followers adopt a new leader's
+    snapshots even when its versions are lower, and ignore messages an
+    old leader publishes after it was replaced.
+
+    Every process also records its subscriber counts in Redis, renewed with
+    the leader key and expiring after `LEADER_TTL`, so the leader refreshes
+    channels that only other processes' clients watch. A process with no
+    snapshot for a channel asks the leader to scrape it on a second topic
+    rather than scraping it itself.
+    """
+
+    def __init__(self, url: str = config.REDIS_URL, client=None, node_id: Optional[str] = None):
+        if client is None:
+            # Optional dependency, only needed when BACKPLANE=redis
+            import redis.asyncio as redis
+
+            client = redis.from_url(url)
+        self.redis = client
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.topic = f"{config.BACKPLANE_PREFIX}:broadcast"
+        self.leader_key = f"{config.BACKPLANE_PREFIX}:leader"
+        self.epoch_key = f"{config.BACKPLANE_PREFIX}:epoch"
+        self.requests_topic = f"{config.BACKPLANE_PREFIX}:requests"
+        # Processes that recorded subscriber counts, scored by when their counts expire (ms)
+        self.nodes_key = f"{config.BACKPLANE_PREFIX}:nodes"
+        self.is_leader = False
+        # The leader epoch this process won, 0 until it first leads
+        self.epoch = 0
+        self._deliver: Optional[Deliver] = None
+        self._subscribers: Optional[Subscribers] = None
+        self._requested: Optional[Requested] = None
+        self._pubsub = None
+        self._tasks: list = []
+        # Scrapes running for other processes' requests
+        self._answering: set = set()
+
+    def counts_key(self, node_id: str) -> str:
+        return f"{config.BACKPLANE_PREFIX}:subscribers:{node_id}"
+
+    async def start(self, deliver: Deliver, subscribers: Optional[Subscribers] = None, requested: Optional[Requested] = None):
+        self._deliver = deliver
+        self._subscribers = subscribers
+        self._requested = requested
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self.topic, self.requests_topic)
+        await self.elect()
+        await self.advertise()
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._campaign()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for task in self._answering:
+            task.cancel()
+        if self.is_leader:
+            await self.redis.eval(RESIGN, 1, self.leader_key, self.node_id)
+        self.is_leader = False
+        await self.redis.zrem(self.nodes_key, self.node_id)
+        await self.redis.delete(self.counts_key(self.node_id))
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.topic, self.requests_topic)
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    async def publish(self, channel: str, message: dict, payload: Any = None):
+        if "version" in message:
+            message = {**message, "epoch": self.epoch}
+        envelope = json.dumps({"channel": channel, "message": message, "payload": payload}, ensure_ascii=False)
+        await self.redis.publish(self.topic, envelope)
+
+    async def advertise(self):
+        """Record this process's subscriber counts for the leader, until LEADER_TTL passes."""
+        counts = self._subscribers() if self._subscribers is not None else {}
+        ttl_ms = int(config.LEADER_TTL * 1000)
+        key = self.counts_key(self.node_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if counts:
+                pipe.hset(key, mapping=counts)
+                pipe.pexpire(key, ttl_ms)
+            pipe.zadd(self.nodes_key, {self.node_id: time.time() * 1000 + ttl_ms})
+            await pipe.execute()
+
+    async def subscriber_counts(self, local: Dict[str, int]) -> Dict[str, int]:
+        """Subscribers per channel across every live process, given this one's `local` counts."""
+        await self.redis.zremrangebyscore(self.nodes_key, "-inf", time.time() * 1000)
+        others = [node for node in map(_text, await self.redis.zrange(self.nodes_key, 0, -1)) if node != self.node_id]
+        totals = Counter(local)
+        if others:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for node in others:
+                    pipe.hgetall(self.counts_key(node))
+                for counts in await pipe.execute():
+                    for channel, count in counts.items():
+                        totals[_text(channel)] += int(count)
+        return dict(totals)
+
+    async def request_scrape(self, channel: str):
+        """Ask the leader to scrape `channel` and publish its snapshot."""
+        # Counted first, so the leader keeps refreshing it for this process's subscribers
+        await self.advertise()
+        await self.redis.publish(self.requests_topic, channel)
+
+    async def elect(self) -> bool:
+        """Take or renew the leader key; returns whether this process leads."""
+        ttl_ms = int(config.LEADER_TTL * 1000)
+        if await self.redis.set(self.leader_key, self.node_id, nx=True, px=ttl_ms):
+            leader = True
+        else:
+            leader = bool(await self.redis.eval(RENEW, 1, self.leader_key, self.node_id, ttl_ms))
+        if leader and not self.is_leader:
+            self.epoch = await self.redis.incr(self.epoch_key)
+        if leader != self.is_leader:
+            logger.info(f"{self.node_id} is {'now' if leader else 'no longer'} the scrape leader"
+                        + (f" (epoch {self.epoch})" if leader else ""))
+        self.is_leader = leader
+        return leader
+
+    async def _campaign(self):
+        while True:
+            await asyncio.sleep(config.LEADER_TTL / 3)
+            try:
+                await self.elect()
+            except Exception as e:
+                print(f"Leader election error: {e}")
+                self.is_leader = False
+            try:
+                await self.advertise()
+            except Exception as e:
+                print(f"Error recording subscriber counts: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                item = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if item is None:
+                    continue
+                if _text(item["channel"]) == self.requests_topic:
+                    if self.is_leader and self._requested is not None:
+                        task = asyncio.create_task(self._requested(_text(item["data"])))
+                        self._answering.add(task)
+                        task.add_done_callback(self._answering.discard)
+                    continue
+                envelope = json.loads(item["data"])
+                await self._deliver(envelope["channel"], envelope["message"], envelope["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane receive error: {e}")
+                await asyncio.sleep(1)
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_backplane():
+    if config.BACKPLANE == "redis":
+        return RedisBackplane()
+    return InMemoryBackplane()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+from manager import ConnectionManager
+from models import Headline
+
+# Simulated network write time per frame
+SEND_LATENCY = 0.001
+
+
+class FakeWebSocket:
+    """Stands in for a starlette WebSocket; send_json encodes like starlette does."""
+
+    def __init__(self):
+        self.bytes_sent = 0
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(SEND_LATENCY)
+        self.bytes_sent += len(text)
+
+    async def send_json(self, data):
+        await self.send_text(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+    async def close(self):
+        pass
+
+
+def sample_message(count: int = 30) -> dict:
+    headlines = [
+        Headline(
+            topic=f"Sample headline number {i} about the day's events",
+            images=[f"https://3news.com/wp-content/uploads/2026/01/image-{i}.jpg"],
+            categories=["Politics"],
+            isLatest=(i == 0),
+            url=f"https://3news.com/news/politics/sample-headline-{i}",
+            route=f"/news/politics/sample-headline-{i}",
+        )
+        for i in range(count)
+    ]
+    return {"type": "data", "data": [h.model_dump() for h in headlines]}
+
+
+async def sequential_broadcast(connections, message):
+    """The previous broadcast: one send_json per socket, one after another."""
+    for connection in connections:
+        await connection.send_json(message)
+
+
+async def bench(subscribers: int):
+    channel = "news:HOME:headline"
+    message = sample_message()
+    manager = ConnectionManager()
+    manager.active_connections[channel] = {FakeWebSocket() for _ in range(subscribers)}
+
+    # Queues and writer tasks exist from connect time in the server
+    await manager.broadcast(channel, message)
+    await manager.flush()
+
+    start = time.perf_counter()
+    await manager.broadcast(channel, message)
+    await manager.flush()
+    concurrent = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await sequential_broadcast(list(manager.active_connections[channel]), message)
+    sequential = time.perf_counter() - start
+
+    for connection in list(manager.outboxes):
+        manager.disconnect(connection)
+
+    print(
+        f"{subscribers:>6} subscribers: "
+        f"concurrent {concurrent * 1000:8.1f} ms ({subscribers / concurrent:10.0f} msg/s)  "
+        f"sequential {sequential * 1000:8.1f} ms ({subscribers / sequential:10.0f} msg/s)"
+    )
+
+
+async def main():
+    for subscribers in (1000, 10000):
+        await bench(subscribers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Bytes on the wire and CPU per message for each wire encoding.
+
+Uses messages built from the fixture pages: a full headline list, a delta
+and an article detail. "send_json" is the old path, one json.dumps per
+socket. The other formats are encoded once per broadcast, so their CPU per
+socket is the encode time divided by the subscriber count. "+deflate" adds
+permessage-deflate, which compresses every frame again on each socket,
+because each connection keeps its own compression context.
+
+    python bench_encoding.py
+"""
+import json
+import time
+import zlib
+
+from bench_loop_lag import load_pages
+from encoding import encode
+from scraper import extract_page
+from snapshots import SnapshotStore
+
+ROUNDS = 2000
+SUBSCRIBERS = 1000
+
+
+def sample_messages():
+    sections = {}
+    for kind, html, url in load_pages():
+        sections.setdefault(kind, extract_page(kind, html, url, False))
+    headlines = sections["home"]["headlines"]
+    store = SnapshotStore()
+    full = store.update("news:HOME:headline", headlines)
+    # A typical refresh: one new story at the top, the oldest one gone
+    newer = [{**headlines[0], "url": headlines[0]["url"] + "-new", "route": headlines[0]["route"] + "-new"}] + headlines[:-1]
+    delta = store.update("news:HOME:headline", newer)
+    article = {"type": "data", "version": 1, "data": sections["article"]["article"]}
+    return {"headlines": full, "delta": delta, "article": article}
+
+
+def per_call(call, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        call()
+    return (time.perf_counter() - start) / rounds
+
+
+def deflate(frame) -> bytes:
+    # A fresh context per frame, as for the first message on a connection
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    data = frame.encode() if isinstance(frame, str) else frame
+    return (compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+
+
+def size(frame) -> int:
+    return len(frame.encode()) if isinstance(frame, str) else len(frame)
+
+
+def main():
+    print(f"{'message':<10}{'format':<18}{'bytes':>8}{'vs json':>9}{f'ms/{SUBSCRIBERS} sockets':>18}{'us/socket':>11}")
+    for name, message in sample_messages().items():
+        baseline = size(encode(message))
+        dumps = per_call(lambda: json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+        # (format, frame on the wire, CPU seconds to broadcast to SUBSCRIBERS sockets)
+        rows = [("send_json", encode(message), dumps * SUBSCRIBERS)]
+        for encoding in ("json", "compact", "msgpack"):
+            rows.append((encoding, encode(message, encoding), per_call(lambda: encode(message, encoding))))
+        for encoding in ("json", "compact"):
+            frame = encode(message, encoding)
+            # Encoded once, compressed again for every socket
+            seconds = per_call(lambda: encode(message, encoding)) + per_call(lambda: deflate(frame), ROUNDS // 10) * SUBSCRIBERS
+            rows.append((f"{encoding}+deflate", deflate(frame), seconds))
+        for label, frame, seconds in rows:
+            print(
+                f"{name:<10}{label:<18}{size(frame):>8}{size(frame) / baseline:>8.0%} "
+                f"{seconds * 1e3:>17.2f}{seconds / SUBSCRIBERS * 1e6:>11.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Single-pass ListSpec extraction against the per-selector extractors it replaced.
+
+Parses each fixture page once, then times only the extraction of its list
+sections (headlines, popular, cartoons), so the difference is the engine.
+The old extractors are kept below as the baseline.
+
+    python bench_extraction.py
+"""
+import time
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from bench_loop_lag import load_pages
+from parsing import css, make_soup, select_first, select_one_of
+from scraper import (
+    ARTICLE, BASE_URL, CARTOON_ARTICLES, HEADLINE_ARTICLES, IMG, PAGE_KINDS,
+    extract_cartoons, extract_headlines, extract_popular, route_of,
+)
+
+ROUNDS = 200
+
+HEADINGS = (css("h2"), css("h3"), css("h4"))
+HEADLINE_TITLES = tuple(css(s) for s in ("h2 a", "h3 a", "h4 a", ".entry-title a", "a.post-title", "a[href*='/news/']"))
+HEADLINE_CATEGORIES = tuple(css(s) for s in (".category", ".post-categories a", ".entry-meta .cat-links a"))
+CARTOON_TITLES = tuple(css(s) for s in (".entry-title a", "h2 a", "h3 a", "a[href*='/opinion/cartoon/']"))
+POPULAR_CONTAINER = css("div.p-4.space-y-4")
+POPULAR_NUMBER = css("div.shrink-0")
+POPULAR_TITLE = css("h4")
+POPULAR_LINK = css("a.block")
+
+
+def legacy_headlines(soup: BeautifulSoup, url: str) -> List[dict]:
+    headlines = []
+
+    # Standard scraping on rendered HTML
+    articles = select_first(soup, HEADLINE_ARTICLES)
+
+    for idx, article in enumerate(articles):
+        # Try multiple selectors for title/link
+        title_tag = select_one_of(article, HEADLINE_TITLES)
+        if not title_tag:
+            continue
+
+        topic = title_tag.get_text(strip=True) or title_tag.get("title") or ""
+        # If topic is generic, try to find a better one
+        if not topic or topic.upper() in ["NEWS", "READ MORE", "LATEST", "POLITICS", "SPORTS", "BUSINESS", "ENTERTAINMENT"]:
+            parent_h = select_one_of(article, HEADINGS)
+            if parent_h:
+                topic = parent_h.get_text(strip=True)
+
+        link = title_tag.get("href") or ""
+        if not link:
+            continue
+        if not link.startswith("http"):
+            link = f"{BASE_URL}{link}"
+
+        # If topic is still generic, skip it
+        if topic.upper() in ["NEWS", "READ MORE", "LATEST"]:
+            continue
+
+        # Improved image selection
+        # New structure: article a div img
+        img_tags = IMG.select(article)
+        images = []
+        for img in img_tags:
+            src = img.get("data-src") or img.get("src") or img.get("srcset")
+            if src and not src.startswith("data:"):
+                # If it's a srcset, take the first URL
+                if "," in src:
+                    src = src.split(",")[0].split(" ")[0]
+                if not src.startswith("http"):
+                    src = f"{BASE_URL}{src}"
+                images.append(src)
+
+        # Categories
+        cat_tags = select_first(article, HEADLINE_CATEGORIES)
+        categories = [cat.get_text(strip=True) for cat in cat_tags]
+        if not categories and "/news/" in link:
+            # Infer category from URL if missing
+            parts = link.split("/")
+            if len(parts) > 4:
+                categories = [parts[4].capitalize()]
+
+        headlines.append(dict(
+            topic=topic,
+            images=list(set(images)), # Unique images
+            categories=categories,
+            isLatest=(idx == 0),
+            url=link,
+            route=route_of(link)
+        ))
+
+    return headlines
+
+
+def legacy_cartoons(soup: BeautifulSoup, url: str) -> List[dict]:
+    headlines = []
+    # The structure on the cartoon page might be different
+    articles = select_first(soup, CARTOON_ARTICLES)
+
+    for idx, article in enumerate(articles):
+        title_tag = select_one_of(article, CARTOON_TITLES)
+        if not title_tag:
+            continue
+
+        topic = title_tag.get_text(strip=True)
+        link = title_tag.get("href")
+        if not link.startswith("http"):
+            link = f"{BASE_URL}{link}"
+
+        img_tags = IMG.select(article)
+        images = []
+        for img in img_tags:
+            src = img.get("data-src") or img.get("src")
+            if src and not src.startswith("data:"):
+                if not src.startswith("http"):
+                    src = f"{BASE_URL}{src}"
+                images.append(src)
+
+        headlines.append(dict(
+            topic=topic,
+            images=list(set(images)),
+            categories=["Cartoons", "Tilapia Corner"],
+            isLatest=(idx == 0),
+            url=link,
+            route=route_of(link)
+        ))
+    return headlines
+
+def legacy_popular(soup: BeautifulSoup, url: str) -> List[dict]:
+    headlines = []
+
+    # Based on browser research, popular articles are in a sidebar with "Popular Today 24h"
+    # They are within article tags inside a div.p-4.space-y-4
+
+    # Find the container by class or proximity to heading
+    container = POPULAR_CONTAINER.select_one(soup)
+    if not container:
+        # Fallback: look for heading and find sibling container
+        popular_heading = soup.find(lambda tag: tag.name in ["h3", "h2", "div"] and "Popular Today" in tag.get_text())
+        if popular_heading:
+            parent = popular_heading.find_parent("div")
+            if parent:
+                container = parent.find_next_sibling("div")
+
+    if not container:
+        return []
+
+    articles = ARTICLE.select(container)
+
+    for idx, article in enumerate(articles):
+        # Each popular article has a number div
+        number_div = POPULAR_NUMBER.select_one(article)
+        if not number_div or not number_div.get_text(strip=True).isdigit():
+            continue
+
+        title_tag = POPULAR_TITLE.select_one(article)
+        link_tag = POPULAR_LINK.select_one(article)
+
+        if not title_tag or not link_tag:
+            continue
+
+        topic = title_tag.get_text(strip=True)
+        link = link_tag.get("href")
+        if not link:
+            continue
+        if not link.startswith("http"):
+            link = f"{BASE_URL}{link}"
+
+        headlines.append(dict(
+            topic=topic,
+            images=[], # Sidebar list doesn't have images
+            categories=["Popular"],
+            isLatest=(idx == 0),
+            url=link,
+            route=route_of(link)
+        ))
+
+    return headlines
+
+
+SECTIONS = {
+    "headlines": (extract_headlines, legacy_headlines),
+    "popular": (extract_popular, legacy_popular),
+    "cartoons": (extract_cartoons, legacy_cartoons),
+}
+
+
+def per_call(extract, soup, url) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        extract(soup, url)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def same(new: List[dict], old: List[dict]) -> bool:
+    # The old extractors de-duplicated images through a set, so their order varies
+    return [{**item, "images": sorted(item["images"])} for item in new] == [
+        {**item, "images": sorted(item["images"])} for item in old
+    ]
+
+
+def main():
+    print(f"{'page':<48}{'section':<11}{'items':>6}{'old us':>10}{'new us':>10}{'speedup':>9}")
+    total_old = total_new = 0.0
+    for kind, html, url in load_pages():
+        _, parse_only, extractors = PAGE_KINDS[kind]
+        soup = make_soup(html, parse_only)
+        for name in extractors:
+            if name not in SECTIONS:
+                continue
+            new, old = SECTIONS[name]
+            assert same(new(soup, url), old(soup, url)), f"{url} {name}: output differs"
+            new_s, old_s = per_call(new, soup, url), per_call(old, soup, url)
+            total_old += old_s
+            total_new += new_s
+            print(f"{url:<48}{name:<11}{len(new(soup, url)):>6}{old_s * 1e6:>10.0f}{new_s * 1e6:>10.0f}{old_s / new_s:>8.2f}x")
+    print(f"{'all list sections':<59}{total_old * 1e6:>16.0f}{total_new * 1e6:>10.0f}{total_old / total_new:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
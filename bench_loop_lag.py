@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import config
+import parsing
+from scraper import BASE_URL, extract_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+KINDS = {
+    BASE_URL: "home",
+    f"{BASE_URL}/opinion/cartoon/": "cartoons",
+    f"{BASE_URL}/live/3news24": "live",
+}
+ROUNDS = 20
+TICK = 0.005
+
+
+def load_pages():
+    with open(os.path.join(FIXTURES, "pages.json")) as f:
+        pages = json.load(f)
+    loaded = []
+    for url, name in pages.items():
+        with open(os.path.join(FIXTURES, name)) as f:
+            html = f.read()
+        kind = KINDS.get(url) or ("article" if "fixture-article" in url else "headlines")
+        loaded.append((kind, html, url))
+    return loaded
+
+
+async def measure_lag(stop: asyncio.Event, lags: list):
+    """Record how late a TICK-second sleep wakes up while parsing runs."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def bench(executor: str, pages):
+    config.PARSE_EXECUTOR = executor
+    parsing.start_executor()
+    # Warm the pool so worker start-up is not counted
+    await asyncio.gather(*(parsing.run_parser(extract_page, *page, False) for page in pages))
+
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await asyncio.gather(*(parsing.run_parser(extract_page, *page, False) for page in pages))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    parsing.stop_executor()
+
+    lags.sort()
+    print(
+        f"{executor:>8}: {ROUNDS * len(pages) / elapsed:7.0f} pages/s  "
+        f"loop lag p50 {statistics.median(lags) * 1000:6.2f} ms  "
+        f"p99 {lags[int(len(lags) * 0.99)] * 1000:6.2f} ms  max {lags[-1] * 1000:6.2f} ms"
+    )
+
+
+async def main():
+    pages = load_pages()
+    for executor in ("inline", "thread", "process"):
+        await bench(executor, pages)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,302 @@
+"""WebSocket load generator and soak test.
+
+Starts the app in a subprocess, backed by the fixture pages (see
+bench_suite.py), and holds thousands of WebSocket clients against it across
+every channel format: headlines, topic_detail, liveTV, Cartoons and popular.
+Clients churn (reconnect after a random lifetime), some read slowly, and
+some drop their TCP connection without a close handshake.
+
+Every --report-every seconds it prints the clients connected, the server's
+RSS and memory per connection, status-event latency (server timestamp to
+client receipt), and how many clients were dropped or failed to connect.
+At the end every client disconnects. The run fails (exit status 1) if
+the server still holds sockets in `active_connections` or `subscriptions`,
+or if it does not shut down cleanly when terminated.
+
+    python bench_soak.py --clients 2000 --duration 600
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from bench_suite import ARTICLE_URLS, free_port
+from channels import CARTOONS_CHANNEL, LIVE_TV_CHANNEL, POPULAR_CHANNEL, headline_channel
+
+CHANNELS = [
+    headline_channel("HOME"),
+    headline_channel("POLITICS"),
+    headline_channel("ELECTIONS"),
+    POPULAR_CHANNEL,
+    CARTOONS_CHANNEL,
+    LIVE_TV_CHANNEL,
+] + [f"news:NEWS:topic_detail:{url}" for url in ARTICLE_URLS]
+
+# Short refresh intervals so status events keep flowing during the soak
+SERVER_ENV = {
+    "SCRUB_INTERVAL": "5",
+    "HEADLINE_MIN_INTERVAL": "2",
+    "HEADLINE_MAX_INTERVAL": "10",
+    "LIVE_TV_MIN_INTERVAL": "2",
+    "LIVE_TV_MAX_INTERVAL": "10",
+    "SCHEDULE_TICK": "1",
+    "PREFETCH_ENABLED": "0",
+    # Every simulated client comes from 127.0.0.1
+    "MAX_CONNECTIONS_PER_ADDRESS": "0",
+    # Every run starts cold
+    "SNAPSHOT_DB": "",
+}
+
+
+def serve(port: int):
+    """Run the app on `port` with page fetches answered by the fixture stub."""
+    import threading
+
+    import uvicorn
+
+    import main
+    from bench_suite import StubSite, StubTransport
+    from fetcher import fetcher
+
+    site = StubSite()
+    threading.Thread(target=site.serve_forever, daemon=True).start()
+    fetcher.transport = StubTransport(site.origin)
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+@dataclass
+class Stats:
+    connected: int = 0
+    connects: int = 0
+    failed: int = 0
+    dropped: int = 0
+    abrupt: int = 0
+    first_data: List[float] = field(default_factory=list)
+    status_latency: List[float] = field(default_factory=list)
+
+    def drain(self):
+        first_data, status_latency = self.first_data, self.status_latency
+        self.first_data, self.status_latency = [], []
+        return first_data, status_latency
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+async def server_gauges(http: httpx.AsyncClient, port: int) -> Dict[str, float]:
+    """Open sockets and channel memberships as the server counts them."""
+    text = (await http.get(f"http://127.0.0.1:{port}/metrics")).text
+    gauges = {"connections": 0.0, "subscribers": 0.0}
+    for line in text.splitlines():
+        if line.startswith("news_websocket_connections "):
+            gauges["connections"] = float(line.split()[-1])
+        elif line.startswith("news_channel_subscribers{"):
+            gauges["subscribers"] += float(line.split()[-1])
+    return gauges
+
+
+async def client(port: int, stats: Stats, stop: asyncio.Event, args, slow: bool, abrupt: bool):
+    """One simulated user: subscribe, read for a while, leave, come back."""
+    while not stop.is_set():
+        channel = random.choice(CHANNELS)
+        lifetime = random.expovariate(1 / args.lifetime)
+        start = time.perf_counter()
+        try:
+            ws = await connect(
+                f"ws://127.0.0.1:{port}/ws/{channel}",
+                proxy=None,
+                open_timeout=30,
+                # A slow reader buffers little, so the server feels its backpressure
+                max_queue=1 if slow else 16,
+            )
+        except Exception:
+            stats.failed += 1
+            await asyncio.sleep(1)
+            continue
+        stats.connects += 1
+        stats.connected += 1
+        try:
+            deadline = time.monotonic() + lifetime
+            got_data = False
+            while not stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), min(remaining, 1.0)))
+                except asyncio.TimeoutError:
+                    continue
+                if slow:
+                    # Latency seen by a slow reader is mostly its own delay, so it is not recorded
+                    await asyncio.sleep(args.slow_delay)
+                elif message["type"] == "data" and not got_data:
+                    got_data = True
+                    stats.first_data.append(time.perf_counter() - start)
+                elif message["type"] == "status":
+                    sent = datetime.fromisoformat(message["data"]["timestamp"])
+                    stats.status_latency.append((datetime.now(timezone.utc) - sent).total_seconds())
+        except ConnectionClosed:
+            # The server closed on us (e.g. evicted as a slow consumer)
+            stats.dropped += 1
+        finally:
+            stats.connected -= 1
+            if abrupt and not stop.is_set():
+                stats.abrupt += 1
+                ws.transport.abort()
+            else:
+                try:
+                    await asyncio.wait_for(ws.close(), 10)
+                except Exception:
+                    pass
+
+
+async def soak(args, port: int, server: subprocess.Popen) -> int:
+    async with httpx.AsyncClient(trust_env=False) as http:
+        while True:
+            try:
+                await server_gauges(http, port)
+                break
+            except httpx.TransportError:
+                if server.poll() is not None:
+                    print("Server exited during start-up")
+                    return 1
+                await asyncio.sleep(0.2)
+        base_rss = rss_bytes(server.pid)
+
+        stats = Stats()
+        stop = asyncio.Event()
+        tasks = []
+        started = time.monotonic()
+        rng = random.Random(args.seed)
+        for i in range(args.clients):
+            slow = rng.random() < args.slow
+            abrupt = rng.random() < args.abrupt
+            tasks.append(asyncio.create_task(client(port, stats, stop, args, slow, abrupt)))
+            if i % args.ramp == args.ramp - 1:
+                await asyncio.sleep(1)
+
+        print(f"{'time':>6} {'clients':>8} {'server':>7} {'rss MB':>8} {'KB/conn':>8} "
+              f"{'first p50':>10} {'p99':>8} {'status p50':>11} {'p99':>8} {'dropped':>8} {'failed':>7}")
+        while time.monotonic() - started < args.duration:
+            await asyncio.sleep(args.report_every)
+            gauges = await server_gauges(http, port)
+            rss = rss_bytes(server.pid)
+            per_conn = (rss - base_rss) / 1024 / gauges["connections"] if rss and base_rss and gauges["connections"] else float("nan")
+            first_data, status_latency = stats.drain()
+            print(
+                f"{time.monotonic() - started:6.0f} {stats.connected:8d} {gauges['connections']:7.0f} "
+                f"{(rss or 0) / 1048576:8.1f} {per_conn:8.1f} "
+                f"{percentile(first_data, 0.5) * 1000:8.1f}ms {percentile(first_data, 0.99) * 1000:6.1f}ms "
+                f"{percentile(status_latency, 0.5) * 1000:9.1f}ms {percentile(status_latency, 0.99) * 1000:6.1f}ms "
+                f"{stats.dropped:8d} {stats.failed:7d}"
+            )
+
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Give the server time to notice closed and aborted sockets
+        await asyncio.sleep(args.settle)
+        gauges = await server_gauges(http, port)
+
+    print(
+        f"{stats.connects} connects, {stats.abrupt} abrupt disconnects, "
+        f"{stats.dropped} dropped by the server, {stats.failed} failed to connect"
+    )
+    if gauges["connections"] or gauges["subscribers"]:
+        print(f"LEAK: server still holds {gauges['connections']:.0f} sockets and {gauges['subscribers']:.0f} subscriptions")
+        return 1
+    print("No leaked connections or subscriptions")
+    return 0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=300, help="seconds to soak")
+    parser.add_argument("--lifetime", type=float, default=30, help="mean seconds a client stays before reconnecting")
+    parser.add_argument("--slow", type=float, default=0.05, help="fraction of clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="seconds a slow client waits between reads")
+    parser.add_argument("--abrupt", type=float, default=0.1, help="fraction of clients that drop without a close handshake")
+    parser.add_argument("--ramp", type=int, default=200, help="clients started per second")
+    parser.add_argument("--report-every", type=float, default=10)
+    parser.add_argument("--settle", type=float, default=5, help="seconds to wait before checking for leaks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+        env={**os.environ, **SERVER_ENV},
+        # Its own process group, so the browser driver and parse workers go with it
+        start_new_session=True,
+    )
+    code = 1
+    try:
+        code = asyncio.run(soak(args, port, server))
+    finally:
+        if not shut_down(server):
+            code = 1
+    sys.exit(code)
+
+
+def shut_down(server: subprocess.Popen, timeout: float = 15) -> bool:
+    """Stop the server as a deployment would; False if it did not shut down cleanly.
+
+    Whatever is left of its process group afterwards is killed so the run
+    does not leak processes, but that still fails the run.
+    """
+    server.terminate()
+    try:
+        clean = server.wait(timeout=timeout) == 0
+        if not clean:
+            print(f"Server exited with status {server.returncode} on shutdown")
+    except subprocess.TimeoutExpired:
+        print(f"Server did not shut down within {timeout:g}s")
+        clean = False
+    try:
+        os.killpg(server.pid, 0)
+    except ProcessLookupError:
+        return clean
+    if clean:
+        print("Server left processes running after shutdown")
+    os.killpg(server.pid, signal.SIGKILL)
+    server.wait()
+    return False
+
+
+if __name__ == "__main__":
+    main_cli()
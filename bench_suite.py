@@ -0,0 +1,302 @@
+"""Offline benchmarks against the recorded fixture pages.
+
+Serves fixtures/ from a local stub HTTP server, routes the fetcher's
+requests for 3news.com to it, and measures:
+
+- latency and throughput of every scrub_* function (caches cleared, so each
+  call fetches, parses and builds models)
+- connect-to-first-data latency on /ws/... against a local uvicorn server,
+  cold (nothing cached) and warm
+- broadcast fan-out time to many simulated clients
+
+    python bench_suite.py                  # run and compare with bench_baseline.json
+    python bench_suite.py --save-baseline  # record this machine's numbers as the baseline
+
+A run fails (exit status 1) when any p50 is more than --tolerance slower
+than the baseline. p99 is reported but not gated: at these round counts it
+swings several-fold between back-to-back runs. Pass --p99-tolerance to gate
+it too. Baselines are machine-specific; record one on the machine that runs
+the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Awaitable, Callable, Dict, List
+from urllib.parse import urlparse
+
+import httpx
+import uvicorn
+import websockets
+
+import config
+
+config.PREFETCH_ENABLED = False
+
+import main
+import scraper
+from bench_broadcast import FakeWebSocket, sample_message
+from cache import article_cache, scrape_cache
+from fetcher import fetcher
+from manager import ConnectionManager
+from parsing import stop_executor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+SCRUB_ROUNDS = 200
+CONNECT_ROUNDS = 100
+BROADCAST_ROUNDS = 20
+ARTICLE_URLS = [
+    f"{scraper.BASE_URL}/news/politics/fixture-article-1",
+    f"{scraper.BASE_URL}/news/sports/fixture-article-2",
+    f"{scraper.BASE_URL}/news/business/fixture-article-3",
+]
+
+
+def site_path(url: str) -> str:
+    return urlparse(url).path.rstrip("/") or "/"
+
+
+class StubSite(ThreadingHTTPServer):
+    """Serves each fixture page at its original path, with an ETag per file."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        with open(os.path.join(FIXTURES, "pages.json")) as f:
+            pages = json.load(f)
+        self.pages = {}
+        for url, name in pages.items():
+            with open(os.path.join(FIXTURES, name), "rb") as f:
+                self.pages[site_path(url)] = (f'"{name}"', f.read())
+        super().__init__(("127.0.0.1", 0), StubHandler)
+
+    @property
+    def origin(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        page = self.server.pages.get(site_path(self.path))
+        if page is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag, body = page
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTransport(httpx.AsyncBaseTransport):
+    """Sends every request to the stub site, keeping its path and query."""
+
+    def __init__(self, origin: str):
+        self.origin = httpx.URL(origin)
+        self.inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=self.origin.scheme, host=self.origin.host, port=self.origin.port)
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def forget_everything():
+    """Cold start: no cached scrapes, reusable pages or remembered validators."""
+    scrape_cache.clear()
+    article_cache.clear()
+    scraper._recent.clear()
+    fetcher.seen.clear()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "ops_per_s": round(len(samples) / sum(samples), 1),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+    }
+
+
+async def timed(rounds: int, call: Callable[[], Awaitable], before: Callable[[], None] = forget_everything) -> Dict[str, float]:
+    await call()  # Warm up pools and connections
+    samples = []
+    for _ in range(rounds):
+        before()
+        start = time.perf_counter()
+        result = await call()
+        samples.append(time.perf_counter() - start)
+        assert result, "benchmark call returned nothing"
+    return summarize(samples)
+
+
+async def bench_scrubs() -> Dict[str, Dict[str, float]]:
+    articles = iter(ARTICLE_URLS * (SCRUB_ROUNDS + 1))
+    calls = {
+        "scrub_headlines:HOME": lambda: scraper.scrub_headlines("HOME"),
+        "scrub_headlines:POLITICS": lambda: scraper.scrub_headlines("POLITICS"),
+        "scrub_headlines:ELECTIONS": lambda: scraper.scrub_headlines("ELECTIONS"),
+        "scrub_popular": scraper.scrub_popular,
+        "scrub_cartoons": scraper.scrub_cartoons,
+        "scrub_live_tv": scraper.scrub_live_tv,
+        "scrub_article_detail": lambda: scraper.scrub_article_detail(next(articles)),
+    }
+    return {name: await timed(SCRUB_ROUNDS, call) for name, call in calls.items()}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def bench_connect() -> Dict[str, Dict[str, float]]:
+    port = free_port()
+    # No lifespan: the benchmark must not launch a browser or run the scrub cycle
+    server = uvicorn.Server(uvicorn.Config(main.app, port=port, lifespan="off", log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    async def first_data(channel: str):
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws/{channel}") as ws:
+            while True:
+                message = json.loads(await ws.recv())
+                if message["type"] == "data":
+                    return message["data"]
+
+    channels = {
+        "headlines": "news:HOME:headline",
+        "article": f"news:POLITICS:topic_detail:{ARTICLE_URLS[0]}",
+        "live": "news:liveTV",
+    }
+    results = {}
+    try:
+        for name, channel in channels.items():
+            results[f"connect_first_data:{name}:cold"] = await timed(CONNECT_ROUNDS, lambda: first_data(channel))
+            results[f"connect_first_data:{name}:warm"] = await timed(CONNECT_ROUNDS, lambda: first_data(channel), lambda: None)
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+
+async def bench_fan_out() -> Dict[str, Dict[str, float]]:
+    channel = "news:HOME:headline"
+    message = sample_message()
+    results = {}
+    for subscribers in (1000, 10000):
+        manager = ConnectionManager()
+        sockets = [FakeWebSocket() for _ in range(subscribers)]
+        manager.active_connections[channel] = set(sockets)
+
+        async def broadcast():
+            await manager.broadcast(channel, message)
+            await manager.flush()
+            return all(ws.bytes_sent for ws in sockets)
+
+        results[f"broadcast:{subscribers}"] = await timed(BROADCAST_ROUNDS, broadcast, lambda: None)
+        for ws in list(manager.outboxes):
+            manager.disconnect(ws)
+    return results
+
+
+async def run_all() -> Dict[str, Dict[str, float]]:
+    site = StubSite()
+    threading.Thread(target=site.serve_forever, daemon=True).start()
+    fetcher.transport = StubTransport(site.origin)
+    await fetcher.close()
+    try:
+        results = await bench_scrubs()
+        results.update(await bench_connect())
+        results.update(await bench_fan_out())
+        return results
+    finally:
+        await fetcher.close()
+        fetcher.transport = None
+        stop_executor()
+        site.shutdown()
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerances: Dict[str, float]) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for stat, tolerance in tolerances.items():
+            if current[stat] > base[stat] * (1 + tolerance):
+                regressions.append(f"{name} {stat}: {current[stat]:.2f} ms vs baseline {base[stat]:.2f} ms")
+    return regressions
+
+
+def report(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]):
+    print(f"{'benchmark':<42}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'base p50':>10}{'base p99':>10}")
+    for name, stats in results.items():
+        base = baseline.get(name, {})
+        print(
+            f"{name:<42}{stats['ops_per_s']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+            f"{base.get('p50_ms', float('nan')):>10.2f}{base.get('p99_ms', float('nan')):>10.2f}"
+        )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare with or write")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p50 slowdown before failing, as a fraction")
+    parser.add_argument("--p99-tolerance", type=float, default=None, help="allowed p99 slowdown before failing, as a fraction (not gated by default)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_all())
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+    tolerances = {"p50_ms": args.tolerance}
+    if args.p99_tolerance is not None:
+        tolerances["p99_ms"] = args.p99_tolerance
+    regressions = compare(results, baseline, tolerances)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import async_playwright, Page, Route
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BROWSER_ARGS = ['--disable-dev-shm-usage', '--no-sandbox']
+
+
+class BrowserPool:
+    """A long-lived headless Chromium with a bounded pool of reusable pages.
+
+    Every slot in the pool is its own browser context holding a single page,
+    so the pool size also caps how many renders run at once. The queue of
+    slots lives as long as the pool: a slot holds a page, or None when its
+    page has to be (re)created, and every fetch puts its slot back whatever
+    happens, so waiters are never stranded.
+    """
+
+    def __init__(self, size: int = config.BROWSER_POOL_SIZE):
+        self.size = size
+        # page -> [blocked, allowed] request counts for the fetch in progress
+        self._requests: dict = {}
+        self.requests_blocked = 0
+        self.requests_allowed = 0
+        self._playwright = None
+        self._browser = None
+        self._pages: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._pages.put_nowait(None)
+        self._crashed: set = set()
+        self._lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def start(self):
+        async with self._lock:
+            if self.started:
+                return
+            # A browser that crashed or disconnected still has a process to reap
+            await self._close_browser()
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            try:
+                self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            except Exception as e:
+                print(f"Error launching browser: {e}")
+                # Fallback to using system Chrome
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    channel='chrome',
+                    args=BROWSER_ARGS
+                )
+            # Open the idle slots' pages now rather than on their first fetch
+            slots = [self._pages.get_nowait() for _ in range(self._pages.qsize())]
+            for page in slots:
+                if page is None or page.is_closed():
+                    page = await self._new_page_or_none()
+                self._pages.put_nowait(page)
+            logger.info(f"Browser pool started with {self.size} pages")
+
+    async def stop(self):
+        async with self._lock:
+            await self._close_browser()
+            if self._playwright is not None:
+                try:
+                    await asyncio.wait_for(self._playwright.stop(), config.BROWSER_STOP_TIMEOUT)
+                except Exception as e:
+                    print(f"Error stopping Playwright: {e}")
+                self._playwright = None
+            # Idle slots are emptied; pages still rendering come back closed and are emptied then
+            for _ in range(self._pages.qsize()):
+                self._pages.get_nowait()
+                self._pages.put_nowait(None)
+            self._crashed.clear()
+            self._requests.clear()
+            logger.info("Browser pool stopped")
+
+    async def _close_browser(self):
+        if self._browser is None:
+            return
+        browser, self._browser = self._browser, None
+        try:
+            await asyncio.wait_for(browser.close(), config.BROWSER_STOP_TIMEOUT)
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+
+    async def _new_page(self) -> Page:
+        context = await self._browser.new_context(user_agent=config.USER_AGENT)
+        counts = [0, 0]
+        await context.route("**/*", lambda route: self._filter(route, counts))
+        page = await context.new_page()
+        page.on("crash", lambda p: self._crashed.add(p))
+        self._requests[page] = counts
+        return page
+
+    async def _new_page_or_none(self) -> Optional[Page]:
+        try:
+            return await self._new_page()
+        except Exception as e:
+            print(f"Error opening browser page: {e}")
+            return None
+
+    @staticmethod
+    def is_blocked(resource_type: str, url: str) -> bool:
+        """Whether a subresource is unneeded for scraping the DOM."""
+        if resource_type in config.BLOCKED_RESOURCE_TYPES:
+            return True
+        host = urlparse(url).hostname or ""
+        return any(blocked in host for blocked in config.BLOCKED_HOSTS)
+
+    async def _filter(self, route: Route, counts: list):
+        request = route.request
+        try:
+            if self.is_blocked(request.resource_type, request.url):
+                counts[0] += 1
+                await route.abort()
+            else:
+                counts[1] += 1
+                await route.continue_()
+        except Exception:
+            # The page navigated away or closed while the request was pending
+            pass
+
+    async def _discard(self, page: Page):
+        self._crashed.discard(page)
+        self._requests.pop(page, None)
+        try:
+            await asyncio.wait_for(page.context.close(), config.BROWSER_STOP_TIMEOUT)
+        except Exception:
+            pass
+
+    def _usable(self, page: Page) -> bool:
+        return self.started and not page.is_closed() and page not in self._crashed
+
+    async def _release(self, page: Page):
+        """Return a slot to the pool, emptied if its page crashed or closed."""
+        if not self._usable(page):
+            logger.info("Recycling crashed browser page")
+            await self._discard(page)
+            page = None
+        self._pages.put_nowait(page)
+
+    async def _acquire(self) -> Page:
+        """Take a slot, opening its page (and relaunching the browser) if it has none.
+
+        On failure the slot goes back empty, so the next fetch tries again.
+        """
+        try:
+            page = await asyncio.wait_for(self._pages.get(), config.BROWSER_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No browser page free after {config.BROWSER_ACQUIRE_TIMEOUT:g}s") from None
+        try:
+            if page is not None and not self._usable(page):
+                await self._discard(page)
+                page = None
+            if page is None:
+                if not self.started:
+                    await self.start()
+                page = await self._new_page()
+            return page
+        except BaseException:
+            self._pages.put_nowait(None)
+            raise
+
+    async def fetch(self, url: str, wait_selector: Optional[str] = None) -> str:
+        """Render `url` on a pooled page and return the resulting HTML."""
+        page = await self._acquire()
+        counts = self._requests.get(page, [0, 0])
+        counts[:] = [0, 0]
+        start = time.perf_counter()
+        try:
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=config.BROWSER_NAV_TIMEOUT_MS)
+                if wait_selector:
+                    await page.wait_for_selector(wait_selector, timeout=config.BROWSER_WAIT_TIMEOUT_MS)
+            except Exception as e:
+                print(f"Playwright wait error for {url}: {e}")
+                try:
+                    await page.wait_for_timeout(2000)
+                except Exception:
+                    pass
+            content = await page.content()
+            heap = await self._used_js_heap(page)
+            logger.info(
+                f"Rendered {url} in {(time.perf_counter() - start) * 1000:.0f} ms"
+                f" (used JS heap after render {heap / 1048576:.1f} MB,"
+                f" {counts[0]} requests blocked, {counts[1]} allowed)"
+            )
+            return content
+        finally:
+            self.requests_blocked += counts[0]
+            self.requests_allowed += counts[1]
+            await self._release(page)
+
+    @staticmethod
+    async def _used_js_heap(page: Page) -> int:
+        """The page's live JS heap (`performance.memory`); not the renderer's RSS."""
+        try:
+            return await page.evaluate("() => (performance.memory && performance.memory.usedJSHeapSize) || 0")
+        except Exception:
+            return 0
+
+
+browser_pool = BrowserPool()
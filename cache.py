@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+
+class ScrapeCache:
+    """A bounded LRU of scrape results with single-flight loading.
+
+    Concurrent misses for the same key share one in-flight load. Entries older
+    than their TTL are still served (stale-while-revalidate) while a refresh
+    runs in the background. Empty or failed scrapes are never cached, so a
+    transient error does not replace the last good snapshot.
+    """
+
+    def __init__(self, max_entries: int = config.CACHE_MAX_ENTRIES, name: str = "scrape cache"):
+        self.max_entries = max_entries
+        self.name = name
+        # Called with each key the LRU bound pushes out
+        self.on_evict: Optional[Callable[[str], None]] = None
+        # Called with (key, value) for each stored value
+        self.on_set: Optional[Callable[[str, Any], None]] = None
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Drop every entry; loads already in flight still complete."""
+        self._entries.clear()
+
+    def peek(self, key: str) -> Any:
+        """Return the cached value for `key` without loading or counting it."""
+        entry = self._entries.get(key)
+        return entry.value if entry else None
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since `key` was fetched, or None if it is not cached."""
+        entry = self._entries.get(key)
+        return time.monotonic() - entry.fetched_at if entry else None
+
+    async def get(self, key: str, loader: Loader, ttl: float) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if time.monotonic() - entry.fetched_at < ttl:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._load(key, loader)
+            return entry.value
+        self.misses += 1
+        if key in self._inflight:
+            self.coalesced += 1
+        return await asyncio.shield(self._load(key, loader))
+
+    async def refresh(self, key: str, loader: Loader) -> Any:
+        """Reload `key` now, joining a load that is already in flight."""
+        value = await asyncio.shield(self._load(key, loader))
+        return value if value else self.peek(key)
+
+    def _load(self, key: str, loader: Loader) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, loader))
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: str, loader: Loader) -> Any:
+        try:
+            try:
+                value = await loader()
+            except Exception:
+                logger.exception(f"Error loading {key}")
+                value = None
+            if value:
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def set(self, key: str, value: Any, age: float = 0.0):
+        """Store `value`, as if fetched `age` seconds ago."""
+        self._entries[key] = _Entry(value, time.monotonic() - age)
+        self._entries.move_to_end(key)
+        if self.on_set is not None:
+            self.on_set(key, value)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            logger.info(f"Evicted {evicted} from {self.name}")
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+scrape_cache = ScrapeCache()
+# Article details, kept apart so prefetching cannot push out headline snapshots
+article_cache = ScrapeCache(config.ARTICLE_CACHE_ENTRIES, "article cache")
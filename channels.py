@@ -0,0 +1,105 @@
+from typing import Any, Optional, Tuple
+
+import config
+from cache import Loader, ScrapeCache, article_cache, scrape_cache
+from models import ArticleDetail, Headline, LiveTV
+from prefetch import article_key, prefetcher
+from scraper import BASE_URL, scrub_headlines, scrub_article_detail, scrub_live_tv, scrub_cartoons, scrub_popular
+from search import search_index
+
+CATEGORIES = ["HOME", "NEWS", "POLITICS", "ENTERTAINMENT", "SPORTS", "BUSINESS", "OPINION", "VIDEOS", "ELECTIONS"]
+
+LIVE_TV_CHANNEL = "news:liveTV"
+CARTOONS_CHANNEL = "news:Cartoons:headline"
+POPULAR_CHANNEL = "news:popular:headline"
+SEARCH_PREFIX = "news:search:"
+
+
+def headline_channel(category: str) -> str:
+    return f"news:{category}:headline"
+
+
+def search_query(channel: str) -> Optional[str]:
+    """The query of a `news:search:{query}` channel, or None for other channels."""
+    if channel.startswith(SEARCH_PREFIX):
+        return channel[len(SEARCH_PREFIX):].strip() or None
+    return None
+
+
+def article_url(route: str) -> str:
+    # Reconstruct full URL if needed or use route as is if it's full URL
+    return route if route.startswith("http") else f"{BASE_URL}/{route.lstrip('/')}"
+
+
+def prefetching(loader: Loader, popular: bool = False) -> Loader:
+    """Wrap a headline scrape so the articles it finds are queued for prefetch."""
+    async def load():
+        headlines = await loader()
+        if headlines and config.PREFETCH_ENABLED:
+            for headline in headlines:
+                prefetcher.offer(article_url(headline.route), urgent=popular or headline.isLatest)
+        return headlines
+    return load
+
+
+def resolve(channel: str) -> Optional[Tuple[str, Loader, float]]:
+    """Map a channel name to its cache key, scrape function and TTL."""
+    if channel.startswith(SEARCH_PREFIX):
+        return None
+    if ":headline" in channel:
+        if "Cartoons" in channel:
+            return "cartoons", prefetching(scrub_cartoons), config.CARTOONS_TTL
+        if "popular" in channel:
+            return "popular", prefetching(scrub_popular, popular=True), config.POPULAR_TTL
+        parts = channel.split(":")
+        if len(parts) > 1:
+            cat = parts[1]
+            return f"headline:{cat.upper()}", prefetching(lambda: scrub_headlines(cat)), config.HEADLINE_TTL
+        return None
+    if ":topic_detail:" in channel:
+        # Format: news:{CAT}:topic_detail:{route}
+        url = article_url(channel.split(":topic_detail:", 1)[1])
+        return article_key(url), lambda: scrub_article_detail(url), config.ARTICLE_TTL
+    if channel == LIVE_TV_CHANNEL:
+        return "liveTV", scrub_live_tv, config.LIVE_TV_TTL
+    return None
+
+
+def known(channel: str) -> bool:
+    return search_query(channel) is not None or resolve(channel) is not None
+
+
+def cache_for(key: str) -> ScrapeCache:
+    return article_cache if key.startswith("article:") else scrape_cache
+
+
+def from_payload(key: str, payload: Any) -> Any:
+    """Rebuild the models the scrape for cache `key` returns from their JSON form."""
+    if key.startswith("article:"):
+        return ArticleDetail(**payload)
+    if key == "liveTV":
+        return LiveTV(**payload)
+    return [Headline(**item) for item in payload]
+
+
+async def get_channel_data(channel: str, refresh: bool = False) -> Any:
+    """Return the latest scrape for `channel`, served from the shared cache.
+
+    With `refresh` the scrape is redone (or joined, if one is already
+    running) and the fresh result returned, falling back to the last good
+    snapshot when the scrape comes back empty.
+
+    Search channels are answered from the in-memory index and never scrape.
+    """
+    query = search_query(channel)
+    if query is not None:
+        return search_index.search(query)
+    resolved = resolve(channel)
+    if resolved is None:
+        return None
+    key, loader, ttl = resolved
+    cache = cache_for(key)
+    if refresh:
+        return await cache.refresh(key, loader)
+    prefetcher.opened(key)
+    return await cache.get(key, loader, ttl)
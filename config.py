@@ -0,0 +1,120 @@
+import os
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+# Headless browser
+BROWSER_POOL_SIZE = _int("BROWSER_POOL_SIZE", 2)
+BROWSER_NAV_TIMEOUT_MS = _int("BROWSER_NAV_TIMEOUT_MS", 30000)
+BROWSER_WAIT_TIMEOUT_MS = _int("BROWSER_WAIT_TIMEOUT_MS", 15000)
+# Seconds a render waits for a free page, and that closing a page, the browser or Playwright may take
+BROWSER_ACQUIRE_TIMEOUT = _float("BROWSER_ACQUIRE_TIMEOUT", 60)
+BROWSER_STOP_TIMEOUT = _float("BROWSER_STOP_TIMEOUT", 10)
+USER_AGENT = os.getenv(
+    "USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+)
+
+# HTTP tier
+HTTP_TIMEOUT = _float("HTTP_TIMEOUT", 15.0)
+HTTP_MAX_CONNECTIONS = _int("HTTP_MAX_CONNECTIONS", 10)
+HTTP_REPROBE_EVERY = _int("HTTP_REPROBE_EVERY", 10)
+
+# Scrape cache (seconds)
+CACHE_MAX_ENTRIES = _int("CACHE_MAX_ENTRIES", 512)
+HEADLINE_TTL = _float("HEADLINE_TTL", 120)
+ARTICLE_TTL = _float("ARTICLE_TTL", 900)
+LIVE_TV_TTL = _float("LIVE_TV_TTL", 300)
+CARTOONS_TTL = _float("CARTOONS_TTL", 600)
+POPULAR_TTL = _float("POPULAR_TTL", 120)
+ARTICLE_CACHE_ENTRIES = _int("ARTICLE_CACHE_ENTRIES", 256)
+
+# Article prefetching from headline scrapes; PREFETCH_INTERVAL seconds between fetch starts
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") != "0"
+PREFETCH_CONCURRENCY = _int("PREFETCH_CONCURRENCY", 1)
+PREFETCH_INTERVAL = _float("PREFETCH_INTERVAL", 2)
+PREFETCH_QUEUE_SIZE = _int("PREFETCH_QUEUE_SIZE", 100)
+
+# Background scrub cycle; SCRUB_INTERVAL is where each channel's adaptive interval starts
+SCRUB_INTERVAL = _float("SCRUB_INTERVAL", 300)
+HEADLINE_MIN_INTERVAL = _float("HEADLINE_MIN_INTERVAL", 30)
+HEADLINE_MAX_INTERVAL = _float("HEADLINE_MAX_INTERVAL", 900)
+LIVE_TV_MIN_INTERVAL = _float("LIVE_TV_MIN_INTERVAL", 120)
+LIVE_TV_MAX_INTERVAL = _float("LIVE_TV_MAX_INTERVAL", 1800)
+SCHEDULE_JITTER = _float("SCHEDULE_JITTER", 0.1)
+SCHEDULE_TICK = _float("SCHEDULE_TICK", 5)
+SCRUB_CONCURRENCY = _int("SCRUB_CONCURRENCY", 4)
+SCRUB_JOB_TIMEOUT = _float("SCRUB_JOB_TIMEOUT", 60)
+SOUP_REUSE_SECONDS = _float("SOUP_REUSE_SECONDS", 10)
+
+# WebSocket fan-out
+BROADCAST_SEND_TIMEOUT = _float("BROADCAST_SEND_TIMEOUT", 5)
+# Frames queued per client, and how long a queue may stay full before the client is dropped
+SEND_QUEUE_SIZE = _int("SEND_QUEUE_SIZE", 64)
+SLOW_CONSUMER_SECONDS = _float("SLOW_CONSUMER_SECONDS", 30)
+DELTA_HISTORY = _int("DELTA_HISTORY", 20)
+# Channel snapshots kept in memory; the least recently used are dropped beyond this
+SNAPSHOT_MAX_CHANNELS = _int("SNAPSHOT_MAX_CHANNELS", 1024)
+
+# Connection lifecycle: the server pings every HEARTBEAT_INTERVAL seconds; a client that has answered
+# a ping and then goes silent for HEARTBEAT_INTERVAL + HEARTBEAT_TIMEOUT is dropped, as is one with no
+# subscriptions that sends nothing for IDLE_TIMEOUT. Limits of 0 turn a check off.
+HEARTBEAT_INTERVAL = _float("HEARTBEAT_INTERVAL", 20)
+HEARTBEAT_TIMEOUT = _float("HEARTBEAT_TIMEOUT", 20)
+IDLE_TIMEOUT = _float("IDLE_TIMEOUT", 300)
+# Keyed on the client address uvicorn reports; behind a proxy that is the proxy unless it trusts forwarded headers
+MAX_CONNECTIONS_PER_ADDRESS = _int("MAX_CONNECTIONS_PER_ADDRESS", 0)
+MAX_SUBSCRIBERS_PER_CHANNEL = _int("MAX_SUBSCRIBERS_PER_CHANNEL", 0)
+
+# Snapshots kept on disk for warm starts; an empty SNAPSHOT_DB turns this off.
+# Saved entries older than SNAPSHOT_DB_MAX_AGE seconds or beyond SNAPSHOT_DB_MAX_BYTES are pruned.
+SNAPSHOT_DB = os.getenv("SNAPSHOT_DB", "snapshots.db")
+SNAPSHOT_DB_MAX_BYTES = _int("SNAPSHOT_DB_MAX_BYTES", 32 * 1024 * 1024)
+SNAPSHOT_DB_MAX_AGE = _float("SNAPSHOT_DB_MAX_AGE", 7 * 24 * 3600)
+SNAPSHOT_DB_FLUSH_INTERVAL = _float("SNAPSHOT_DB_FLUSH_INTERVAL", 2)
+
+# Seconds each shutdown step (saving snapshots, closing the browser, ...) may take before it is abandoned
+SHUTDOWN_STEP_TIMEOUT = _float("SHUTDOWN_STEP_TIMEOUT", 10)
+
+# REST snapshots: seconds a CDN may serve a response after it goes stale, while revalidating or when we fail
+REST_STALE_WHILE_REVALIDATE = _float("REST_STALE_WHILE_REVALIDATE", 600)
+REST_STALE_IF_ERROR = _float("REST_STALE_IF_ERROR", 86400)
+
+# In-memory search over scraped stories: documents kept, seconds before an unseen story is dropped,
+# results per query, and how long new stories are batched before live results are recomputed
+SEARCH_MAX_DOCUMENTS = _int("SEARCH_MAX_DOCUMENTS", 2000)
+SEARCH_MAX_AGE = _float("SEARCH_MAX_AGE", 24 * 3600)
+SEARCH_RESULTS = _int("SEARCH_RESULTS", 20)
+SEARCH_PUSH_DELAY = _float("SEARCH_PUSH_DELAY", 0.5)
+
+# HTML parsing: "lxml" or "html.parser"; defaults to lxml when it is installed
+HTML_PARSER = os.getenv("HTML_PARSER")
+
+# Where HTML is parsed: "process" pool, "thread" pool, or "inline" on the event loop
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "process")
+PARSE_WORKERS = _int("PARSE_WORKERS", 2)
+
+# Cross-process fan-out: "memory" (single process) or "redis"
+BACKPLANE = os.getenv("BACKPLANE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+BACKPLANE_PREFIX = os.getenv("BACKPLANE_PREFIX", "news_socket")
+LEADER_TTL = _float("LEADER_TTL", 15)
+# Seconds a follower waits for the leader to scrape a channel it has no snapshot for, before scraping it itself
+LEADER_REQUEST_TIMEOUT = _float("LEADER_REQUEST_TIMEOUT", 10)
+
+# Requests aborted during browser renders; hosts match by substring
+BLOCKED_RESOURCE_TYPES = set(filter(None, os.getenv("BLOCKED_RESOURCE_TYPES", "image,media,font,stylesheet").split(",")))
+BLOCKED_HOSTS = list(filter(None, os.getenv(
+    "BLOCKED_HOSTS",
+    "googleads,doubleclick,googlesyndication,google-analytics,googletagmanager,"
+    "adservice,facebook.net,scorecardresearch,taboola,outbrain,hotjar,clarity.ms",
+).split(",")))
+
+# Metrics: how often event-loop lag is sampled (seconds)
+LOOP_LAG_INTERVAL = _float("LOOP_LAG_INTERVAL", 0.5)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "channel"
+ARTICLE = "article"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    version INTEGER,
+    payload TEXT NOT NULL,
+    saved_at REAL NOT NULL
+)
+"""
+
+
+class Saved(NamedTuple):
+    key: str
+    kind: str
+    version: Optional[int]
+    payload: Any
+    age: float
+
+
+class DurableStore:
+    """Channel snapshots and article details saved in SQLite, for warm starts.
+
+    `save` only records the latest value per key; a background task writes
+    pending values every `flush_interval` seconds in a worker thread, so
+    the event loop never waits on the disk. After each write, entries older
+    than `max_age` are deleted, then the oldest ones until the stored
+    payloads fit in `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str = config.SNAPSHOT_DB,
+        max_bytes: int = config.SNAPSHOT_DB_MAX_BYTES,
+        max_age: float = config.SNAPSHOT_DB_MAX_AGE,
+        flush_interval: float = config.SNAPSHOT_DB_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: Dict[str, Tuple[str, Optional[int], str, float]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.written = 0
+        self.pruned = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def open(self):
+        if not self.enabled or self._db is not None:
+            return
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def load(self) -> List[Saved]:
+        """Everything saved within `max_age`, oldest first."""
+        if self._db is None:
+            return []
+        now = time.time()
+        rows = self._db.execute(
+            "SELECT key, kind, version, payload, saved_at FROM snapshots WHERE saved_at >= ? ORDER BY saved_at",
+            (now - self.max_age,),
+        ).fetchall()
+        saved = []
+        for key, kind, version, payload, saved_at in rows:
+            try:
+                saved.append(Saved(key, kind, version, json.loads(payload), max(0.0, now - saved_at)))
+            except ValueError as e:
+                print(f"Error reading saved snapshot {key}: {e}")
+        return saved
+
+    def save(self, key: str, kind: str, payload: Any, version: Optional[int] = None):
+        if self._db is None:
+            return
+        self._pending[key] = (kind, version, json.dumps(payload, ensure_ascii=False), time.time())
+
+    def start(self):
+        if self._db is not None and self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error saving snapshots: {e}")
+
+    async def flush(self):
+        """Write pending saves and apply the retention policy."""
+        async with self._lock:
+            if not self._pending or self._db is None:
+                return
+            pending, self._pending = self._pending, {}
+            await asyncio.to_thread(self._write, pending)
+            logger.info(f"Saved {len(pending)} snapshots to {self.path}")
+
+    def _write(self, pending: Dict[str, Tuple[str, Optional[int], str, float]]):
+        db = self._db
+        db.executemany(
+            "INSERT OR REPLACE INTO snapshots (key, kind, version, payload, saved_at) VALUES (?, ?, ?, ?, ?)",
+            [(key, *row) for key, row in pending.items()],
+        )
+        pruned = db.execute("DELETE FROM snapshots WHERE saved_at < ?", (time.time() - self.max_age,)).rowcount
+        # Newest first, keep rows while the running total of payload sizes fits
+        pruned += db.execute(
+            """
+            DELETE FROM snapshots WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(LENGTH(CAST(payload AS BLOB))) OVER (ORDER BY saved_at DESC, key) AS total FROM snapshots
+                ) WHERE total > ?
+            )
+            """,
+            (self.max_bytes,),
+        ).rowcount
+        db.commit()
+        self.written += len(pending)
+        self.pruned += pruned
+
+
+durable = DurableStore()
@@ -0,0 +1,105 @@
+import json
+from typing import Dict, List, Union
+
+from scraper import route_of
+
+try:
+    # Optional dependency, only needed for clients that ask for MessagePack
+    import msgpack
+except ImportError:
+    msgpack = None
+
+Frame = Union[str, bytes]
+
+# Wire formats a client can ask for with ?encoding=...:
+#   json    - the messages as documented, as text frames
+#   compact - JSON text without fields the client can rebuild (see `compact`)
+#   msgpack - the documented messages as binary MessagePack frames
+ENCODINGS = ("json", "compact", "msgpack")
+
+# Message fields holding lists of headline items
+ITEM_FIELDS = ("data", "added", "updated")
+
+
+def available(encoding: str) -> bool:
+    return encoding in ENCODINGS and (encoding != "msgpack" or msgpack is not None)
+
+
+def compact(message: dict) -> dict:
+    """Drop what the client can rebuild from the rest of the message.
+
+    A headline's `route` is left out when it is `route_of(url)`, and category
+    names are replaced by indexes into a `categories` list sent once per
+    message. The list is sent whenever a headline was packed, even empty,
+    since `expand` only rebuilds routes when it is there. `expand` reverses
+    this.
+    """
+    names: List[str] = []
+    packed_any = False
+    index: Dict[str, int] = {}
+
+    def intern(name: str) -> int:
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+        return index[name]
+
+    out = dict(message)
+    for name in ITEM_FIELDS:
+        items = message.get(name)
+        if not isinstance(items, list) or not items or not isinstance(items[0], dict) or "route" not in items[0]:
+            continue
+        packed = []
+        for item in items:
+            item = dict(item)
+            if item["route"] == route_of(item["url"]):
+                del item["route"]
+            item["categories"] = [intern(name) for name in item["categories"]]
+            packed.append(item)
+        out[name] = packed
+        packed_any = True
+    if packed_any:
+        out["categories"] = names
+    return out
+
+
+def expand(message: dict) -> dict:
+    """Rebuild the documented message from a `compact` one."""
+    names = message.get("categories")
+    if names is None:
+        return message
+    out = {k: v for k, v in message.items() if k != "categories"}
+    for name in ITEM_FIELDS:
+        items = message.get(name)
+        if not isinstance(items, list):
+            continue
+        out[name] = [
+            {**item, "categories": [names[i] for i in item["categories"]], "route": item.get("route", route_of(item["url"]))}
+            for item in items
+        ]
+    return out
+
+
+def encode(message: dict, encoding: str = "json") -> Frame:
+    """Serialize a message for the wire; JSON matches starlette's send_json."""
+    if encoding == "msgpack":
+        return msgpack.packb(message)
+    if encoding == "compact":
+        message = compact(message)
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class Frames:
+    """One message, encoded at most once per wire format however many sockets get it."""
+
+    __slots__ = ("message", "_frames")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self._frames: Dict[str, Frame] = {}
+
+    def get(self, encoding: str) -> Frame:
+        frame = self._frames.get(encoding)
+        if frame is None:
+            frame = self._frames[encoding] = encode(self.message, encoding)
+        return frame
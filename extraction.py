@@ -0,0 +1,299 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import soupsieve
+from bs4 import BeautifulSoup, Tag
+
+from parsing import css, select_first
+
+# Compounds the engine matches itself: tag name, classes and attribute tests, joined by descendant spaces
+_COMPOUND = re.compile(
+    r"(?P<name>[A-Za-z][\w-]*)?(?P<rest>(?:\.[\w-]+|\[[\w-]+(?:[*^$]?=(?:'[^']*'|\"[^\"]*\"|[\w-]+))?\])*)$"
+)
+_CLASS = re.compile(r"\.([\w-]+)")
+_ATTR = re.compile(r"\[([\w-]+)(?:([*^$]?=)(?:'([^']*)'|\"([^\"]*)\"|([\w-]+)))?\]")
+
+
+class Compound(NamedTuple):
+    name: Optional[str]
+    classes: frozenset
+    # (attribute, operator or None, value)
+    attrs: Tuple[Tuple[str, Optional[str], str], ...]
+
+    def matches(self, tag: Tag) -> bool:
+        if self.name is not None and tag.name != self.name:
+            return False
+        if self.classes and not self.classes.issubset(tag.get("class") or ()):
+            return False
+        for attr, op, value in self.attrs:
+            actual = tag.get(attr)
+            if actual is None:
+                return False
+            if op is None:
+                continue
+            if isinstance(actual, list):
+                actual = " ".join(actual)
+            if not (actual == value if op == "=" else value in actual if op == "*="
+                    else actual.startswith(value) if op == "^=" else actual.endswith(value)):
+                return False
+        return True
+
+
+def _compounds(selector: str) -> Optional[Tuple[Compound, ...]]:
+    """Split a descendant-only selector into compounds, or None if it needs soupsieve."""
+    compounds = []
+    # Split on spaces outside [...]
+    for part in re.findall(r"(?:\[[^\]]*\]|[^\s\[])+", selector):
+        found = _COMPOUND.match(part)
+        if found is None or not part:
+            return None
+        attrs = tuple(
+            (attr, op or None, next((v for v in values if v is not None), ""))
+            for attr, op, *values in _ATTR.findall(found.group("rest"))
+        )
+        name = found.group("name")
+        compounds.append(Compound(name.lower() if name else None, frozenset(_CLASS.findall(found.group("rest"))), attrs))
+    return tuple(compounds) or None
+
+
+class Matcher:
+    """A selector matched during the engine's walk, against the element and its ancestors.
+
+    Selectors made of simple compounds joined by descendant spaces (the
+    kind item specs use) are matched directly; anything else goes to
+    soupsieve.
+    """
+
+    __slots__ = ("selector", "compounds", "name")
+
+    def __init__(self, selector: str):
+        selector = selector.strip()
+        self.selector = css(selector)
+        self.compounds = _compounds(selector) if not re.search(r"[>+~,:\\]", selector) else None
+        # Only elements with this name can match; None when any element might
+        self.name = self.compounds[-1].name if self.compounds else None
+
+    def match(self, tag: Tag, ancestors: Callable[[], Iterable[Tag]]) -> bool:
+        if self.compounds is None:
+            return self.selector.match(tag)
+        if not self.compounds[-1].matches(tag):
+            return False
+        # Descendant combinators only, so matching each compound at its nearest ancestor is enough
+        i = len(self.compounds) - 2
+        if i < 0:
+            return True
+        for ancestor in ancestors():
+            if self.compounds[i].matches(ancestor):
+                i -= 1
+                if i < 0:
+                    return True
+        return False
+
+
+def matchers(*selectors: str) -> Tuple[Matcher, ...]:
+    return tuple(Matcher(s) for s in selectors)
+
+
+@lru_cache(maxsize=4096)
+def absolute(base_url: str, link: str) -> str:
+    return link if link.startswith("http") else f"{base_url}{link}"
+
+
+@lru_cache(maxsize=4096)
+def first_of_srcset(src: str) -> str:
+    return src.split(",")[0].split(" ")[0] if "," in src else src
+
+
+@dataclass
+class ListSpec:
+    """Where a page keeps a list of headline items, and how each item is read.
+
+    Tuples of matchers are fallback chains: the first one that matches
+    inside an item wins (for `title`, `link` and `headings`), or the first
+    one with any matches supplies them all (for `categories`).
+
+    - `container`: selectors for the element holding the items, tried in
+      order; `container_heading` finds it as the div after a heading with
+      that text instead. Without either, items are searched in the whole page.
+    - `base_url` prefixes relative links and image sources; `route` turns
+      an item's absolute URL into its route.
+    - `items`: fallback chain of selectors for the item elements.
+    - `link`: where the href is read; the title element when empty.
+    - `numbered`: an element whose text must be a number, or the item is skipped.
+    - `generic_topics`: titles replaced by the item's first heading;
+      `skip_topics`: titles that drop the item.
+    - `image_attrs`: attributes read for each <img>, in order; a srcset
+      contributes its first URL.
+    - `fixed_categories` is used when `categories` is empty; `infer_category`
+      falls back to the section in a /news/... URL.
+    """
+
+    items: Tuple[soupsieve.SoupSieve, ...]
+    title: Tuple[Matcher, ...]
+    base_url: str
+    route: Callable[[str], str]
+    link: Tuple[Matcher, ...] = ()
+    container: Tuple[soupsieve.SoupSieve, ...] = ()
+    container_heading: Optional[str] = None
+    numbered: Optional[Matcher] = None
+    title_attr: bool = False
+    headings: Tuple[Matcher, ...] = ()
+    generic_topics: frozenset = frozenset()
+    skip_topics: frozenset = frozenset()
+    image_attrs: Tuple[str, ...] = ()
+    categories: Tuple[Matcher, ...] = ()
+    fixed_categories: Tuple[str, ...] = ()
+    infer_category: bool = False
+    _slots: Dict[Optional[str], list] = field(init=False, repr=False)
+    _by_name: Dict[str, tuple] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Every selector read inside an item, as (role, chain position, matcher), by tag name
+        self._slots = {}
+        roles = [("title", self.title), ("link", self.link), ("heading", self.headings), ("category", self.categories)]
+        if self.numbered is not None:
+            roles.append(("numbered", (self.numbered,)))
+        for role, selectors in roles:
+            for position, matcher in enumerate(selectors):
+                self._slots.setdefault(matcher.name, []).append((role, position, matcher))
+        self._by_name = {}
+
+    def _for(self, name: str) -> tuple:
+        slots = self._by_name.get(name)
+        if slots is None:
+            slots = self._by_name[name] = tuple(self._slots.get(name, ())) + tuple(self._slots.get(None, ()))
+        return slots
+
+    def __call__(self, soup: BeautifulSoup, url: str) -> List[dict]:
+        container = self._container(soup)
+        if container is None:
+            return []
+        return [item for idx, node in enumerate(select_first(container, self.items))
+                if (item := self._item(node, idx)) is not None]
+
+    def _container(self, soup: BeautifulSoup) -> Optional[Tag]:
+        if not self.container and self.container_heading is None:
+            return soup
+        for selector in self.container:
+            found = selector.select_one(soup)
+            if found:
+                return found
+        if self.container_heading is not None:
+            heading = soup.find(lambda tag: tag.name in ("h3", "h2", "div") and self.container_heading in tag.get_text())
+            if heading:
+                parent = heading.find_parent("div")
+                if parent:
+                    return parent.find_next_sibling("div")
+        return None
+
+    def _scan(self, node: Tag):
+        """Walk the item once, noting the first match of every single-element selector and all
+        matches of the category selectors and images."""
+        first: Dict[Tuple[str, int], Tag] = {}
+        # Per role, the earliest chain position matched so far; later positions cannot win
+        best: Dict[str, int] = {}
+        categories: Dict[int, List[Tag]] = {}
+        images: List[Tag] = []
+        want_images = bool(self.image_attrs)
+        outside = list(node.parents)
+        # The current element's ancestors inside the item, outermost first
+        path: List[Tag] = []
+
+        def ancestors() -> Iterable[Tag]:
+            return chain(reversed(path), outside)
+
+        def walk(parent: Tag):
+            path.append(parent)
+            for el in parent.contents:
+                if not isinstance(el, Tag):
+                    continue
+                if want_images and el.name == "img":
+                    images.append(el)
+                for role, position, matcher in self._for(el.name):
+                    if role == "category":
+                        if matcher.match(el, ancestors):
+                            categories.setdefault(position, []).append(el)
+                    elif position < best.get(role, position + 1) and (role, position) not in first \
+                            and matcher.match(el, ancestors):
+                        first[role, position] = el
+                        best[role] = position
+                if el.contents:
+                    walk(el)
+            path.pop()
+
+        walk(node)
+        return first, categories, images
+
+    @staticmethod
+    def _pick(first: Dict[Tuple[str, int], Tag], role: str, count: int) -> Optional[Tag]:
+        # Like select_one_of: the first position in the chain that matched anything
+        for position in range(count):
+            found = first.get((role, position))
+            if found is not None:
+                return found
+        return None
+
+    def _item(self, node: Tag, idx: int) -> Optional[dict]:
+        first, category_tags, image_tags = self._scan(node)
+
+        if self.numbered is not None:
+            number = first.get(("numbered", 0))
+            if not number or not number.get_text(strip=True).isdigit():
+                return None
+
+        title = self._pick(first, "title", len(self.title))
+        if not title:
+            return None
+        topic = title.get_text(strip=True)
+        if self.title_attr:
+            topic = topic or title.get("title") or ""
+        if self.headings and (not topic or topic.upper() in self.generic_topics):
+            heading = self._pick(first, "heading", len(self.headings))
+            if heading:
+                topic = heading.get_text(strip=True)
+
+        link_tag = self._pick(first, "link", len(self.link)) if self.link else title
+        if not link_tag:
+            return None
+        link = link_tag.get("href") or ""
+        if not link:
+            return None
+        link = absolute(self.base_url, link)
+
+        if topic.upper() in self.skip_topics:
+            return None
+
+        images = []
+        for img in image_tags:
+            src = None
+            for attr in self.image_attrs:
+                src = img.get(attr)
+                if src:
+                    break
+            if src and not src.startswith("data:"):
+                images.append(absolute(self.base_url, first_of_srcset(src) if "srcset" in self.image_attrs else src))
+
+        categories = list(self.fixed_categories)
+        for position in range(len(self.categories)):
+            tags = category_tags.get(position)
+            if tags:
+                categories = [tag.get_text(strip=True) for tag in tags]
+                break
+        if not categories and self.infer_category and "/news/" in link:
+            # Infer category from URL if missing
+            parts = link.split("/")
+            if len(parts) > 4:
+                categories = [parts[4].capitalize()]
+
+        return dict(
+            topic=topic,
+            # Unique images, in page order
+            images=list(dict.fromkeys(images)),
+            categories=categories,
+            isLatest=(idx == 0),
+            url=link,
+            route=self.route(link),
+        )
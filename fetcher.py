@@ -0,0 +1,197 @@
+import hashlib
+import importlib.util
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+import config
+from browser import browser_pool
+from metrics import FETCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+HTTP = "http"
+BROWSER = "browser"
+
+Process = Callable[[str, bool], Awaitable[Any]]
+
+
+class HttpPage(NamedTuple):
+    html: Optional[str]  # None when the server answered 304 Not Modified
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+@dataclass
+class Seen:
+    """What a URL looked like last time: its validators, content hash and extraction."""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: bytes
+    result: Any
+
+
+def digest(html: str) -> bytes:
+    return hashlib.blake2b(html.encode(), digest_size=16).digest()
+
+
+def url_pattern(url: str) -> str:
+    """Collapse a URL to the page type it belongs to.
+
+    Article URLs share a pattern per section (`/news/politics/*`) so one
+    rendered article teaches us about all of its siblings.
+    """
+    parsed = urlparse(url)
+    segments = [s for s in parsed.path.split("/") if s]
+    if len(segments) >= 3:
+        segments[-1] = "*"
+    return f"{parsed.netloc}/{'/'.join(segments)}"
+
+
+class TieredFetcher:
+    """Fetch pages over plain HTTP first and render them only when needed.
+
+    A page is accepted from the HTTP tier when the caller's processing finds
+    the content it needs in the raw HTML; otherwise it is rendered by the
+    browser pool. The tier that worked last is remembered per URL pattern,
+    and patterns that needed the browser are re-probed over HTTP every
+    `reprobe_every` fetches.
+
+    Each URL's ETag, Last-Modified and a hash of its HTML are kept with the
+    result extracted from it. Later HTTP fetches are conditional, and a 304
+    or an identical body returns that result without parsing the page again.
+    """
+
+    def __init__(self, reprobe_every: int = config.HTTP_REPROBE_EVERY, max_seen: int = config.CACHE_MAX_ENTRIES):
+        self.reprobe_every = reprobe_every
+        self.max_seen = max_seen
+        self.tiers: Dict[str, str] = {}
+        self.seen: "OrderedDict[str, Seen]" = OrderedDict()
+        # Overrides the network transport, e.g. to serve pages from a local stub
+        self.transport: Optional[httpx.AsyncBaseTransport] = None
+        self.not_modified = 0
+        self.unchanged = 0
+        self._browser_streak: Dict[str, int] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                timeout=config.HTTP_TIMEOUT,
+                follow_redirects=True,
+                transport=self.transport,
+                headers={"User-Agent": config.USER_AGENT},
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.HTTP_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _should_try_http(self, pattern: str) -> bool:
+        if self.tiers.get(pattern, HTTP) == HTTP:
+            return True
+        streak = self._browser_streak.get(pattern, 0) + 1
+        self._browser_streak[pattern] = streak
+        return streak % self.reprobe_every == 0
+
+    async def fetch_http(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> HttpPage:
+        """GET `url`, conditionally when validators from an earlier response are given."""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = await self.client.get(url, headers=headers)
+        if response.status_code == 304 and headers:
+            return HttpPage(None, etag, last_modified)
+        response.raise_for_status()
+        return HttpPage(response.text, response.headers.get("etag"), response.headers.get("last-modified"))
+
+    def _remember(self, url: str, html: str, result: Any, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.seen[url] = Seen(etag, last_modified, digest(html), result)
+        self.seen.move_to_end(url)
+        while len(self.seen) > self.max_seen:
+            self.seen.popitem(last=False)
+
+    def _unchanged(self, url: str, html: Optional[str]) -> Optional[Seen]:
+        """The remembered state of `url` if `html` (None for a 304) is what we saw last time."""
+        seen = self.seen.get(url)
+        if seen is None:
+            return None
+        if html is None:
+            self.not_modified += 1
+        elif digest(html) == seen.digest:
+            self.unchanged += 1
+        else:
+            return None
+        self.seen.move_to_end(url)
+        return seen
+
+    async def fetch(self, url: str, process: Process, wait_selector: Optional[str] = None) -> Any:
+        """Fetch `url` and hand its HTML to `process`.
+
+        `process(html, require_ready)` returns None when `require_ready` is set
+        and the HTML lacks the content the caller needs, in which case the page
+        is rendered in the browser and processed again unconditionally.
+        """
+        pattern = url_pattern(url)
+        tried_http = self._should_try_http(pattern)
+        if tried_http:
+            start = time.perf_counter()
+            try:
+                seen = self.seen.get(url)
+                with FETCH_SECONDS.time(tier=HTTP):
+                    page = await self.fetch_http(url, seen.etag, seen.last_modified) if seen else await self.fetch_http(url)
+                unchanged = self._unchanged(url, page.html)
+                if unchanged is not None:
+                    unchanged.etag, unchanged.last_modified = page.etag, page.last_modified
+                    logger.info(f"{url} is unchanged, reusing its last extraction")
+                    return unchanged.result
+                result = await process(page.html, True)
+                if result is not None:
+                    self.tiers[pattern] = HTTP
+                    self._browser_streak.pop(pattern, None)
+                    self._remember(url, page.html, result, page.etag, page.last_modified)
+                    logger.info(f"Fetched {url} over HTTP in {(time.perf_counter() - start) * 1000:.0f} ms")
+                    return result
+                logger.info(f"HTTP response for {url} is missing required content, rendering")
+            except Exception as e:
+                print(f"HTTP fetch error for {url}: {e}")
+
+        try:
+            with FETCH_SECONDS.time(tier=BROWSER):
+                content = await browser_pool.fetch(url, wait_selector=wait_selector)
+        except Exception as e:
+            print(f"Error getting page content for {url}: {e}")
+            content = "<html></html>"  # Process an empty page
+            if not tried_http:
+                # Fallback to simple HTTP request if Playwright fails
+                try:
+                    content = (await self.fetch_http(url)).html
+                except Exception as http_error:
+                    print(f"HTTP fallback also failed for {url}: {http_error}")
+            return await process(content, False)
+        self.tiers[pattern] = BROWSER
+        unchanged = self._unchanged(url, content)
+        if unchanged is not None:
+            logger.info(f"Rendered {url} is unchanged, reusing its last extraction")
+            return unchanged.result
+        result = await process(content, False)
+        self._remember(url, content, result)
+        return result
+
+
+fetcher = TieredFetcher()
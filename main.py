@@ -1,153 +1,601 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from scraper import scrub_headlines, scrub_article_detail, scrub_live_tv, scrub_cartoons, scrub_popular
-from manager import manager
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from channels import (
+    CATEGORIES, LIVE_TV_CHANNEL, CARTOONS_CHANNEL, POPULAR_CHANNEL, cache_for, from_payload, get_channel_data, known, resolve, search_query,
+    SEARCH_PREFIX, headline_channel,
+)
+from manager import manager, status_event
+from backplane import create_backplane
+from browser import browser_pool
+from cache import article_cache, scrape_cache
+from durable import ARTICLE, CHANNEL, durable
+from fetcher import fetcher
+from metrics import CYCLE_SECONDS, REST_RESPONSES, SCRUB_SECONDS, monitor_loop_lag, registry
+from parsing import start_executor, stop_executor
+from prefetch import prefetcher
+from rest import cache_control, not_modified, representations
+from scheduler import scheduler
+from search import search_index
+from snapshots import snapshots, unique
 import asyncio
+import config
 import json
-from typing import List
+import logging
+import time
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
-CATEGORIES = ["HOME", "NEWS", "POLITICS", "ENTERTAINMENT", "SPORTS", "BUSINESS", "OPINION", "VIDEOS", "ELECTIONS"]
+SYNC_LABELS = {
+    LIVE_TV_CHANNEL: "Live TV",
+    CARTOONS_CHANNEL: "Cartoons",
+    POPULAR_CHANNEL: "Popular",
+}
+
+def to_payload(data):
+    if isinstance(data, list):
+        # Clients apply deltas by URL, so each story appears once
+        return unique([h if isinstance(h, dict) else h.model_dump() for h in data])
+    return data if isinstance(data, dict) else data.model_dump()
+
+def index_scrape(key: str, value):
+    """Add a scrape to the search index and schedule live search results to be recomputed."""
+    if not value or key == "liveTV":
+        return
+    try:
+        if key.startswith("article:"):
+            search_index.add_article(to_payload(value))
+        else:
+            search_index.add_headlines(to_payload(value))
+    except Exception as e:
+        print(f"Error indexing {key}: {e}")
+        return
+    schedule_search_push()
+
+scrape_cache.on_set = index_scrape
+article_cache.on_set = index_scrape
+
+_search_push: Optional[asyncio.Task] = None
+
+def schedule_search_push():
+    global _search_push
+    if _search_push is not None and not _search_push.done():
+        return
+    try:
+        _search_push = asyncio.get_running_loop().create_task(push_search_results())
+    except RuntimeError:
+        # No event loop (e.g. indexing during a test); results are computed on the next connect
+        pass
+
+async def push_search_results():
+    """Send search subscribers their new results once the stories scraped meanwhile are indexed.
+
+    Waits SEARCH_PUSH_DELAY so a burst of scrapes is one recompute, and only
+    recomputes queries that a changed story matches or already listed.
+    Each process answers its own search subscribers, so this is not published
+    on the backplane.
+    """
+    await asyncio.sleep(config.SEARCH_PUSH_DELAY)
+    changed = search_index.take_changed()
+    if not changed:
+        return
+    for channel in list(manager.active_connections):
+        query = search_query(channel)
+        # Skip channels whose subscribers left while earlier ones were delivered
+        if query is None or channel not in manager.active_connections:
+            continue
+        listed = {item["url"] for item in snapshots.payload(channel) or ()}
+        if not any(url in listed or search_index.matches(url, query) for url in changed):
+            continue
+        try:
+            results = search_index.search(query)
+            message = snapshots.update(channel, results)
+            if message:
+                await manager.deliver(channel, {**message, "status": status_event("ready", "New results")}, results)
+        except Exception as e:
+            print(f"Error pushing search results for {channel}: {e}")
+
+# channel -> set once the leader publishes a snapshot this follower asked for
+_leader_requests: Dict[str, asyncio.Event] = {}
+
+def mirror_snapshot(channel: str, message: dict, payload):
+    """Followers keep the leader's snapshots so they can serve connects without scraping.
+
+    They index what the leader scraped too, so they can answer searches.
+    """
+    if payload is None or "version" not in message or manager.is_leader or search_query(channel) is not None:
+        return
+    snapshots.adopt(channel, payload, message["version"], message.get("epoch", 0))
+    resolved = resolve(channel)
+    if resolved is not None:
+        index_scrape(resolved[0], payload)
+    requested = _leader_requests.pop(channel, None)
+    if requested is not None:
+        requested.set()
+
+manager.listeners.append(mirror_snapshot)
+
+async def leader_snapshot(channel: str):
+    """Ask the leader to scrape `channel` and wait for the snapshot it publishes.
+
+    Concurrent connects to the same channel share one request. Returns None
+    if nothing arrives within LEADER_REQUEST_TIMEOUT.
+    """
+    requested = _leader_requests.get(channel)
+    if requested is None:
+        requested = _leader_requests[channel] = asyncio.Event()
+        try:
+            await manager.request_scrape(channel)
+        except Exception as e:
+            print(f"Error asking the leader for {channel}: {e}")
+            # Wake any connects already waiting, so they scrape for themselves
+            del _leader_requests[channel]
+            requested.set()
+            return None
+    try:
+        await asyncio.wait_for(requested.wait(), config.LEADER_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        if _leader_requests.get(channel) is requested:
+            del _leader_requests[channel]
+        return None
+    return snapshots.payload(channel)
+
+async def answer_scrape_request(channel: str):
+    """Leader: scrape a channel a follower has no snapshot for, and publish it for mirroring.
+
+    Subscribers that already hold the channel only hear about it if the
+    scrape changed their snapshot.
+    """
+    if resolve(channel) is None or search_query(channel) is not None:
+        return
+    try:
+        data = await asyncio.wait_for(get_channel_data(channel), config.SCRUB_JOB_TIMEOUT)
+        if not data:
+            return
+        payload = to_payload(data)
+        previous = snapshots.version(channel)
+        message = snapshots.update(channel, payload)
+        if message and previous:
+            await manager.broadcast(channel, message, payload)
+        else:
+            await manager.broadcast(channel, {"type": "snapshot", "version": snapshots.version(channel)}, payload)
+    except Exception as e:
+        print(f"Error scraping {channel} for another process: {e}")
+
+manager.on_scrape_request = answer_scrape_request
+
+def release_channel(channel: str):
+    """Forget a search channel's results once nobody here is subscribed to it.
+
+    Every query a client sends is a channel of its own; keeping their
+    snapshots would grow memory with each new search.
+    """
+    if search_query(channel) is not None:
+        snapshots.discard(channel)
+
+manager.on_vacated = release_channel
+
+def restore_snapshots():
+    """Load what was saved before the last shutdown, so the first subscribers are served from disk.
+
+    Restored entries are aged as saved, so stale ones are refreshed in the
+    background on first use. Changes are saved again from then on.
+    """
+    restored = 0
+    for saved in durable.load():
+        try:
+            if saved.kind == CHANNEL:
+                resolved = resolve(saved.key)
+                if resolved is None:
+                    continue
+                key = resolved[0]
+                snapshots.adopt(saved.key, saved.payload, saved.version)
+            else:
+                key = saved.key
+            cache_for(key).set(key, from_payload(key, saved.payload), age=saved.age)
+            restored += 1
+        except Exception as e:
+            print(f"Error restoring snapshot {saved.key}: {e}")
+    logger.info(f"Restored {restored} snapshots from {durable.path}")
+    snapshots.on_change = save_channel
+    article_cache.on_set = save_article
+
+def save_channel(channel: str, payload, version: int):
+    # Search results are recomputed from the index, not restored
+    if search_query(channel) is None:
+        durable.save(channel, CHANNEL, payload, version)
+
+def save_article(key: str, value):
+    index_scrape(key, value)
+    durable.save(key, ARTICLE, to_payload(value))
+
+def channel_subscribers():
+    """Subscribers per channel, with article channels counted per category and searches together."""
+    counts = {}
+    for channel, sockets in manager.active_connections.items():
+        if ":topic_detail:" in channel:
+            channel = channel.split(":topic_detail:", 1)[0] + ":topic_detail"
+        elif search_query(channel) is not None:
+            channel = SEARCH_PREFIX.rstrip(":")
+        counts[channel] = counts.get(channel, 0) + len(sockets)
+    return [({"channel": channel}, count) for channel, count in counts.items()]
+
+CACHES = {"scrape": scrape_cache, "article": article_cache}
+
+def cache_gauge(field: str):
+    return lambda: [({"cache": name}, cache.stats()[field]) for name, cache in CACHES.items()]
+
+def cache_lookups():
+    return [
+        ({"cache": name, "result": result}, stats[result])
+        for name, stats in ((name, cache.stats()) for name, cache in CACHES.items())
+        for result in ("hits", "stale_hits", "misses", "coalesced")
+    ]
+
+registry.collected("news_websocket_connections", "Open WebSocket connections.", lambda: [({}, len(manager.subscriptions))])
+registry.collected("news_channel_subscribers", "Subscribers per channel.", channel_subscribers)
+registry.collected("news_cache_entries", "Entries held by each scrape cache.", cache_gauge("entries"))
+registry.collected("news_cache_hit_ratio", "Share of cache lookups served from memory, fresh or stale.", cache_gauge("hit_rate"))
+registry.collected("news_cache_lookups_total", "Cache lookups by result; coalesced misses joined a load in flight.", cache_lookups, "counter")
+registry.collected("news_fetch_unchanged_total", "Fetches that reused the last extraction, by reason.", lambda: [
+    ({"reason": "not_modified"}, fetcher.not_modified), ({"reason": "same_hash"}, fetcher.unchanged)], "counter")
+registry.collected("news_prefetch_articles_total", "Prefetched articles by outcome.", lambda: [
+    ({"outcome": outcome}, prefetcher.stats()[outcome]) for outcome in ("offered", "dropped", "fetched", "failed", "used", "wasted")], "counter")
+registry.collected("news_send_queue_frames", "Frames waiting in client send queues.", lambda: [
+    ({}, sum(len(outbox) for outbox in manager.outboxes.values()))])
+registry.collected("news_send_queue_max_depth", "Deepest client send queue.", lambda: [
+    ({}, max((len(outbox) for outbox in manager.outboxes.values()), default=0))])
+registry.collected("news_send_queue_overflow_total", "Frames dropped or merged because a client's queue was full.", lambda: [
+    ({"action": action}, manager.queue_counters[action]) for action in ("dropped", "coalesced")], "counter")
+registry.collected("news_clients_evicted_total", "Clients disconnected by the server, by reason.", lambda: [
+    ({"reason": reason}, manager.queue_counters[reason])
+    for reason in ("slow_consumer", "failed_send", "missed_heartbeat", "idle")], "counter")
+registry.collected("news_connections_total", "WebSocket connections by lifecycle event.", lambda: [
+    ({"event": event}, manager.connection_counters[event])
+    for event in ("opened", "closed", "rejected_address_limit", "rejected_channel_limit")], "counter")
+registry.collected("news_snapshot_db_writes_total", "Snapshots written to or pruned from the on-disk store.", lambda: [
+    ({"action": "written"}, durable.written), ({"action": "pruned"}, durable.pruned)], "counter")
+registry.collected("news_search_index_size", "Stories, distinct terms and postings held by the search index.", lambda: [
+    ({"unit": unit}, search_index.stats()[unit]) for unit in ("documents", "terms", "postings")])
+registry.collected("news_search_evicted_total", "Stories dropped from the search index to stay within its limits.", lambda: [
+    ({}, search_index.evicted)], "counter")
+registry.collected("news_browser_requests_total", "Subresource requests during browser renders.", lambda: [
+    ({"result": "blocked"}, browser_pool.requests_blocked), ({"result": "allowed"}, browser_pool.requests_allowed)], "counter")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/search")
+async def search_endpoint(q: str, limit: int = config.SEARCH_RESULTS):
+    """Ranked stories matching `q`, from the in-memory index."""
+    return {"query": q, "results": search_index.search(q, max(1, min(limit, 100)))}
+
+async def initial_data(channel: str):
+    """Data for a new subscriber.
+
+    Followers use the leader's snapshot, asking the leader to scrape the
+    channel when they have none, and only scrape it themselves if the
+    leader does not answer in time.
+    """
+    if not manager.is_leader:
+        mirrored = snapshots.payload(channel)
+        if mirrored is None and search_query(channel) is None:
+            mirrored = await leader_snapshot(channel)
+        if mirrored is not None:
+            return mirrored
+    return await get_channel_data(channel)
+
+async def serve_snapshot(request: Request, channel: str, missing: str) -> Response:
+    """Answer a GET for `channel` from memory, with a strong ETag and caching headers for CDNs."""
+    data = await initial_data(channel)
+    if not data:
+        REST_RESPONSES.inc(code="404")
+        raise HTTPException(404, missing)
+    key, _, ttl = resolve(channel)
+    representation = representations.get(channel, data, to_payload)
+    headers = {"ETag": representation.etag, "Cache-Control": cache_control(ttl, cache_for(key).age(key))}
+    if not_modified(request.headers.get("if-none-match"), representation.etag):
+        REST_RESPONSES.inc(code="304")
+        return Response(status_code=304, headers=headers)
+    REST_RESPONSES.inc(code="200")
+    return Response(representation.body, media_type="application/json", headers=headers)
+
+@app.get("/headlines/{category}")
+async def headlines_endpoint(request: Request, category: str):
+    if category.upper() not in CATEGORIES:
+        REST_RESPONSES.inc(code="404")
+        raise HTTPException(404, f"Unknown category: {category}")
+    return await serve_snapshot(request, headline_channel(category.upper()), "Headlines not found")
+
+@app.get("/topic_detail/{route:path}")
+async def topic_detail_endpoint(request: Request, route: str, category: str = "NEWS"):
+    return await serve_snapshot(request, f"news:{category.upper()}:topic_detail:{route}", "Article not found")
+
+@app.get("/liveTV")
+async def live_tv_endpoint(request: Request):
+    return await serve_snapshot(request, LIVE_TV_CHANNEL, "Live TV not found")
+
+@app.get("/cartoons")
+async def cartoons_endpoint(request: Request):
+    return await serve_snapshot(request, CARTOONS_CHANNEL, "Cartoons not found")
+
+@app.get("/popular")
+async def popular_endpoint(request: Request):
+    return await serve_snapshot(request, POPULAR_CHANNEL, "Popular headlines not found")
+
+async def send_snapshot(websocket: WebSocket, channel: str, data, since: Optional[int], status: dict):
+    """Send `data` to a newly connected client, resuming from `since` if given.
+
+    `status` goes out with the data frame, or on its own if the client is
+    already up to date.
+    """
+    payload = to_payload(data)
+    ready = {"type": "status", "data": status}
+    # Every process answers searches from its own index
+    local = search_query(channel) is not None
+    if not manager.is_leader and not local:
+        # Versions come from the leader only; without its snapshot send plain data
+        if snapshots.version(channel) == 0:
+            await manager.send(websocket, channel, {"type": "data", "data": payload, "status": status})
+            return
+        message = None
+        previous = 0
+    else:
+        previous = snapshots.version(channel)
+        message = snapshots.update(channel, payload)
+    if since is None:
+        await manager.send(websocket, channel, {**snapshots.full(channel), "status": status})
+    else:
+        catch_up = snapshots.since(channel, since)
+        await manager.send(websocket, channel, {**catch_up, "status": status} if catch_up else ready)
+    if message and previous:
+        # The connect scraped newer data than existing subscribers have seen
+        if local:
+            await manager.deliver(channel, message, payload)
+        else:
+            await manager.broadcast(channel, message, payload)
+
+async def scrub_channel(channel: str) -> bool:
+    """Refresh one channel and broadcast the result to its subscribers.
+
+    Returns whether the refresh changed the channel's snapshot.
+    """
+    label = SYNC_LABELS.get(channel) or f"{channel.split(':')[1]} headlines"
+    start = time.perf_counter()
+    try:
+        # One syncing event for the whole channel, fanned out like any broadcast
+        await manager.broadcast_status(channel, "syncing", f"Syncing {label}")
+        data = await asyncio.wait_for(get_channel_data(channel, refresh=True), config.SCRUB_JOB_TIMEOUT)
+        if data:
+            # Only changes since the last snapshot go out; nothing if unchanged
+            payload = to_payload(data)
+            message = snapshots.update(channel, payload)
+            if message:
+                # The ready event travels with the update; clients that want it separately get it split off
+                await manager.broadcast(channel, {**message, "status": status_event("ready", "Sync complete")}, payload)
+            else:
+                await manager.broadcast_status(channel, "ready", "Sync complete")
+            return message is not None
+    except asyncio.TimeoutError:
+        print(f"Timed out syncing {label} after {config.SCRUB_JOB_TIMEOUT}s")
+    except Exception as e:
+        print(f"Error broadcasting {label}: {e}")
+    finally:
+        SCRUB_SECONDS.observe(time.perf_counter() - start, channel=channel)
+        logger.info(f"Synced {channel} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return False
+
+async def run_scrub_cycle():
+    """Scrub the channels subscribed in any process that are due, at most SCRUB_CONCURRENCY at a time."""
+    subscribers = await manager.all_subscriber_counts()
+    channels = scheduler.due(subscribers)
+    if not channels:
+        return
+    semaphore = asyncio.Semaphore(config.SCRUB_CONCURRENCY)
+
+    async def job(channel: str):
+        async with semaphore:
+            changed = await scrub_channel(channel)
+        scheduler.record(channel, changed, subscribers[channel])
+        logger.info(f"Refresh interval for {channel} is now {scheduler.interval(channel) or 0:.0f} s")
+
+    start = time.perf_counter()
+    with CYCLE_SECONDS.time():
+        async with asyncio.TaskGroup() as tg:
+            for channel in channels:
+                tg.create_task(job(channel))
+    logger.info(f"Scrub cycle of {len(channels)} channels finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+    stats = prefetcher.stats()
+    logger.info(
+        f"Article prefetch: {stats['fetched']} fetched, {stats['used']} used, {stats['wasted']} wasted,"
+        f" article cache hit rate {stats['cache']['hit_rate']:.0%}"
+    )
 
 async def background_scrubber():
-    """Periodically scrubs the site and broadcasts to active channels."""
+    """Scrubs channels as they come due and broadcasts to their subscribers."""
     while True:
         try:
-            # 1. Headlines for categories
-            for cat in CATEGORIES:
-                channel = f"news:{cat}:headline"
-                if channel in manager.active_connections:
-                    try:
-                        # Send syncing status to all connections in channel
-                        for ws in manager.active_connections[channel]:
-                            await manager.send_status(ws, "syncing", f"Syncing {cat} headlines")
-                        headlines = await scrub_headlines(cat)
-                        if headlines:
-                            await manager.broadcast(channel, {"type": "data", "data": [h.model_dump() for h in headlines]})
-                            for ws in manager.active_connections[channel]:
-                                await manager.send_status(ws, "ready", "Sync complete")
-                    except Exception as e:
-                        print(f"Error broadcasting headlines for {cat}: {e}")
-    
-            # 2. Live TV
-            live_channel = "news:liveTV"
-            if live_channel in manager.active_connections:
-                try:
-                    for ws in manager.active_connections[live_channel]:
-                        await manager.send_status(ws, "syncing", "Syncing Live TV")
-                    live_data = await scrub_live_tv()
-                    if live_data:
-                        await manager.broadcast(live_channel, {"type": "data", "data": live_data.model_dump()})
-                        for ws in manager.active_connections[live_channel]:
-                            await manager.send_status(ws, "ready", "Sync complete")
-                except Exception as e:
-                    print(f"Error broadcasting live TV: {e}")
-    
-            # 3. Cartoons Headlines
-            cartoon_headline_channel = "news:Cartoons:headline"
-            if cartoon_headline_channel in manager.active_connections:
-                try:
-                    for ws in manager.active_connections[cartoon_headline_channel]:
-                        await manager.send_status(ws, "syncing", "Syncing Cartoons")
-                    cartoons = await scrub_cartoons()
-                    if cartoons:
-                        await manager.broadcast(cartoon_headline_channel, {"type": "data", "data": [h.model_dump() for h in cartoons]})
-                        for ws in manager.active_connections[cartoon_headline_channel]:
-                            await manager.send_status(ws, "ready", "Sync complete")
-                except Exception as e:
-                    print(f"Error broadcasting cartoons: {e}")
-
-            # 4. Popular Today
-            popular_channel = "news:popular:headline"
-            if popular_channel in manager.active_connections:
-                try:
-                    for ws in manager.active_connections[popular_channel]:
-                        await manager.send_status(ws, "syncing", "Syncing Popular")
-                    popular_data = await scrub_popular()
-                    if popular_data:
-                        await manager.broadcast(popular_channel, {"type": "data", "data": [h.model_dump() for h in popular_data]})
-                        for ws in manager.active_connections[popular_channel]:
-                            await manager.send_status(ws, "ready", "Sync complete")
-                except Exception as e:
-                    print(f"Error broadcasting popular: {e}")
+            # With a shared backplane only the elected leader scrapes
+            if manager.is_leader:
+                await run_scrub_cycle()
         except Exception as e:
             print(f"Background scrubber error: {e}")
-            
-        # Wait for some time before next scrub (e.g., 5 minutes)
-        await asyncio.sleep(300)
+
+        # Sleep until the next channel is due, waking periodically for new subscriptions
+        await asyncio.sleep(scheduler.sleep_time())
 
 @app.on_event("startup")
 async def startup_event():
+    # Before the first client is accepted, so it can be served from disk
+    if durable.enabled:
+        try:
+            durable.open()
+            restore_snapshots()
+        except Exception as e:
+            print(f"Error opening snapshot store: {e}")
+        durable.start()
+    start_executor()
+    await manager.use_backplane(create_backplane())
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        print(f"Error starting browser pool: {e}")
+    if config.PREFETCH_ENABLED:
+        prefetcher.start()
+    asyncio.create_task(monitor_loop_lag())
+    asyncio.create_task(manager.heartbeat())
     asyncio.create_task(background_scrubber())
 
-@app.websocket("/ws/{channel:path}")
-async def websocket_endpoint(websocket: WebSocket, channel: str):
-    await manager.connect(websocket, channel)
-    
-    # Send loading status
-    await manager.send_status(websocket, "loading", "Connecting to channel")
-    
-    # Initial data push
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Saved snapshots first, so a step that hangs cannot lose them
+    await shutdown_step("snapshot store", durable.stop())
+    await shutdown_step("prefetcher", prefetcher.stop())
+    await shutdown_step("fetcher", fetcher.close())
+    await shutdown_step("browser pool", browser_pool.stop())
+    await shutdown_step("parser pool", asyncio.to_thread(stop_executor))
+    await shutdown_step("backplane", manager.close_backplane())
+
+async def shutdown_step(name: str, step):
+    """Run one shutdown step, giving up after SHUTDOWN_STEP_TIMEOUT so the rest still run."""
+    try:
+        await asyncio.wait_for(step, config.SHUTDOWN_STEP_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"Error stopping {name}: timed out after {config.SHUTDOWN_STEP_TIMEOUT}s")
+    except Exception as e:
+        print(f"Error stopping {name}: {e}")
+
+async def push_initial(websocket: WebSocket, channel: str, since: Optional[int] = None):
+    """Send the first data for a new subscription to `channel`."""
     try:
+        # Send loading status
+        await manager.send_status(websocket, "loading", "Connecting to channel", channel)
+
         # Send fetching status
-        await manager.send_status(websocket, "fetching", "Fetching initial data")
-        
-        if ":headline" in channel:
-            if "Cartoons" in channel:
-                data = await scrub_cartoons()
-            elif "popular" in channel:
-                data = await scrub_popular()
-            else:
-                parts = channel.split(":")
-                if len(parts) > 1:
-                    cat = parts[1]
-                    data = await scrub_headlines(cat)
-                else:
-                    data = []
+        await manager.send_status(websocket, "fetching", "Fetching initial data", channel)
+
+        if search_query(channel) is not None:
+            results = await get_channel_data(channel)
+            await send_snapshot(websocket, channel, results, since, status_event("ready", "Results loaded"))
+            if channel not in manager.active_connections:
+                # The client left before its results were stored
+                release_channel(channel)
+
+        elif ":headline" in channel:
+            data = await initial_data(channel)
             if data:
-                await websocket.send_json({"type": "data", "data": [h.model_dump() for h in data]})
+                await send_snapshot(websocket, channel, data, since, status_event("ready", "Data loaded"))
             else:
-                await websocket.send_json({"type": "data", "data": []})
-            await manager.send_status(websocket, "ready", "Data loaded")
-            
+                await manager.send(websocket, channel, {"type": "data", "data": [], "status": status_event("ready", "Data loaded")})
+
         elif ":topic_detail:" in channel:
             # Format: news:{CAT}:topic_detail:{route}
             # Or news:Cartoons:topic_detail:{route}
-            parts = channel.split(":topic_detail:")
-            if len(parts) > 1:
-                route = parts[1]
-                # Reconstruct full URL if needed or use route as is if it's full URL
-                url = route if route.startswith("http") else f"https://3news.com/{route}"
-                detail = await scrub_article_detail(url)
-                if detail:
-                    await websocket.send_json({"type": "data", "data": detail.model_dump()})
-                    await manager.send_status(websocket, "ready", "Article loaded")
-                else:
-                    await websocket.send_json({"type": "error", "error": "Article not found"})
-                    await manager.send_status(websocket, "error", "Article not found")
-                    
-        elif channel == "news:liveTV":
-            live_data = await scrub_live_tv()
+            detail = await initial_data(channel)
+            if detail:
+                await send_snapshot(websocket, channel, detail, since, status_event("ready", "Article loaded"))
+            else:
+                await manager.send(websocket, channel, {"type": "error", "error": "Article not found"})
+                await manager.send_status(websocket, "error", "Article not found", channel)
+
+        elif channel == LIVE_TV_CHANNEL:
+            live_data = await initial_data(channel)
             if live_data:
-                await websocket.send_json({"type": "data", "data": live_data.model_dump()})
-                await manager.send_status(websocket, "ready", "Live TV loaded")
+                await send_snapshot(websocket, channel, live_data, since, status_event("ready", "Live TV loaded"))
             else:
-                await websocket.send_json({"type": "error", "error": "Live TV not found"})
-                await manager.send_status(websocket, "error", "Live TV not found")
+                await manager.send(websocket, channel, {"type": "error", "error": "Live TV not found"})
+                await manager.send_status(websocket, "error", "Live TV not found", channel)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"WebSocket error: {e}")
+        await manager.send_status(websocket, "error", str(e), channel)
+
+async def handle_command(websocket: WebSocket, text: str, tasks: Set[asyncio.Task]):
+    """Apply a `subscribe`/`unsubscribe` command sent by the client.
+
+    Format: {"action": "subscribe", "channel": "news:HOME:headline", "since": 4}
+    or with "channels": [...] to (un)subscribe several at once.
+    {"action": "pong"} answers a server ping; {"action": "ping"} is answered with a pong.
+    """
+    try:
+        command = json.loads(text)
+        action = command.get("action")
+        if action == "pong":
+            manager.seen(websocket, pong=True)
+            return
+        if action == "ping":
+            await manager.send(websocket, None, {"type": "pong"})
+            return
+        channels = command.get("channels") or [command["channel"]]
+        if not isinstance(channels, list):
+            raise TypeError("channels must be a list")
+    except (ValueError, AttributeError, KeyError, TypeError):
+        await manager.send(websocket, None, {"type": "error", "error": "Invalid command"})
+        return
+
+    for channel in channels:
+        if action in ("subscribe", "unsubscribe") and not isinstance(channel, str):
+            await manager.send(websocket, None, {"type": "error", "error": f"Unknown channel: {channel}"})
+            continue
+        if action == "subscribe":
+            if not known(channel):
+                await manager.send(websocket, None, {"type": "error", "error": f"Unknown channel: {channel}"})
+                continue
+            if channel in manager.subscriptions.get(websocket, ()):
+                continue
+            if not manager.subscribe(websocket, channel):
+                await manager.send(websocket, None, {"type": "error", "error": f"Channel is full: {channel}"})
+                continue
+            task = asyncio.create_task(push_initial(websocket, channel, command.get("since")))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif action == "unsubscribe":
+            manager.unsubscribe(websocket, channel)
+            await manager.send_status(websocket, "unsubscribed", None, channel)
+        else:
+            await manager.send(websocket, None, {"type": "error", "error": f"Unknown action: {action}"})
+            return
 
-        # Keep connection open
+async def serve_commands(websocket: WebSocket, tasks: Set[asyncio.Task]):
+    """Read client commands until the socket closes, then clean up."""
+    try:
         while True:
-            # Wait for any message from client (or just keep alive)
-            data = await websocket.receive_text()
-            # Handle client messages if needed
-            
+            text = await websocket.receive_text()
+            manager.seen(websocket)
+            await handle_command(websocket, text, tasks)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, channel)
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
         await manager.send_status(websocket, "error", str(e))
-        manager.disconnect(websocket, channel)
+    finally:
+        for task in tasks:
+            task.cancel()
+        manager.disconnect(websocket)
+
+@app.websocket("/ws")
+async def multiplexed_endpoint(websocket: WebSocket, statuses: str = "all", encoding: str = "json"):
+    """One socket, many channels: the client sends subscribe/unsubscribe commands."""
+    if not await manager.connect(websocket, statuses=statuses, encoding=encoding):
+        return
+    await serve_commands(websocket, set())
+
+@app.websocket("/ws/{channel:path}")
+async def websocket_endpoint(websocket: WebSocket, channel: str, since: Optional[int] = None,
+                             statuses: str = "all", encoding: str = "json"):
+    if not await manager.connect(websocket, channel, statuses, encoding):
+        return
+    # Initial data push
+    await push_initial(websocket, channel, since)
+    # Keep connection open; further channels can be added with commands
+    await serve_commands(websocket, set())
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Protocol-level pings as well, so half-open sockets of clients that never answer ours still close
+    uvicorn.run(app, host="0.0.0.0", port=8000,
+                ws_ping_interval=config.HEARTBEAT_INTERVAL, ws_ping_timeout=config.HEARTBEAT_TIMEOUT)
@@ -1,46 +1,459 @@
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from fastapi import WebSocket
-from typing import Dict, Set, List
-import json
+from typing import Any, Awaitable, Callable, Deque, Dict, Set, List, Optional
+import asyncio
+import config
+import logging
+import time
+from encoding import Frame, Frames, available, encode
+from metrics import BROADCAST_SECONDS, FRAMES_SENT
+from models import StatusEvent
+
+logger = logging.getLogger(__name__)
+
+# How much status traffic a client wants:
+#   all    - every status event as its own frame
+#   final  - no loading/fetching/syncing progress events
+#   folded - as final, and a status that accompanies data rides in the data frame
+STATUS_MODES = ("all", "final", "folded")
+INTERMEDIATE_STATUSES = frozenset({"loading", "fetching", "syncing"})
+
+def tag(channel: Optional[str], message: dict) -> dict:
+    """Add the `channel` a message belongs to, right after its `type`."""
+    if channel is None:
+        return message
+    return {"type": message["type"], "channel": channel, **message}
+
+def status_event(status: str, message: Optional[str] = None) -> dict:
+    """A StatusEvent, timestamped now, as it goes out in a frame."""
+    return StatusEvent(status=status, message=message, timestamp=datetime.now(timezone.utc).isoformat()).model_dump()
+
+def unfold(message: dict) -> tuple:
+    """Split a message carrying a `status` into the bare message and its status frame."""
+    event = message.get("status")
+    if event is None or message["type"] == "status":
+        return message, None
+    return {k: v for k, v in message.items() if k != "status"}, {"type": "status", "data": event}
+
+
+@dataclass
+class Presence:
+    """What the heartbeat knows about one client."""
+    address: str
+    last_seen: float
+    # Set once the client answers a ping; from then on it has to keep answering
+    answers_pings: bool = False
+
+
+class Outbox:
+    """A bounded queue of outgoing frames for one socket, drained by its own writer task.
+
+    Sends never wait on the client. When the queue is full, a status event
+    replaces the queued status for the same channel, and a channel update
+    replaces a queued older update with the newest full snapshot. If nothing
+    can be merged, the oldest queued status is dropped, then the incoming
+    update; a channel that lost an update gets its next one as a full
+    snapshot. A client whose queue stays full for `SLOW_CONSUMER_SECONDS`,
+    or whose socket takes longer than `BROADCAST_SEND_TIMEOUT` to accept a
+    frame, is evicted.
+    """
+
+    def __init__(self, websocket: WebSocket, evict: Callable[[WebSocket, str], None], counters: Counter,
+                 limit: int = config.SEND_QUEUE_SIZE, statuses: str = "all", encoding: str = "json"):
+        self.websocket = websocket
+        self.limit = limit
+        self.statuses = statuses
+        self.encoding = encoding
+        self.counters = counters
+        self._evict = evict
+        # Each frame is [key, text or bytes]; keyed frames can be merged while queued
+        self._frames: Deque[list] = deque()
+        self._keyed: Dict[tuple, list] = {}
+        self._resync: Set[str] = set()
+        self._full_since: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.create_task(self._write())
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def wants(self, status: str) -> bool:
+        return self.statuses == "all" or status not in INTERMEDIATE_STATUSES
+
+    def put(self, text: Frame, key: Optional[tuple] = None, snapshot: Optional[Frames] = None):
+        """Queue a frame. `key` is ("status" | "data", channel); `snapshot` is the channel's full data message."""
+        if key is not None and key[0] == "data" and key[1] in self._resync and snapshot is not None:
+            text = snapshot.get(self.encoding)
+            self._resync.discard(key[1])
+        if len(self._frames) >= self.limit and not self._make_room(text, key, snapshot):
+            return
+        frame = [key, text]
+        self._frames.append(frame)
+        if key is not None:
+            self._keyed[key] = frame
+        self._idle.clear()
+        self._ready.set()
+
+    def _make_room(self, text: Frame, key: Optional[tuple], snapshot: Optional[Frames]) -> bool:
+        """Handle a full queue; returns whether the new frame should still be appended."""
+        now = time.monotonic()
+        if self._full_since is None:
+            self._full_since = now
+        elif now - self._full_since > config.SLOW_CONSUMER_SECONDS:
+            self._evict(self.websocket, "slow_consumer")
+            return False
+        queued = self._keyed.get(key) if key is not None else None
+        if queued is not None and (key[0] == "status" or snapshot is not None):
+            # The client has not seen the queued frame yet, so only the newest matters
+            queued[1] = text if key[0] == "status" else snapshot.get(self.encoding)
+            self.counters["coalesced"] += 1
+            return False
+        for frame in self._frames:
+            if frame[0] is not None and frame[0][0] == "status":
+                self._frames.remove(frame)
+                if self._keyed.get(frame[0]) is frame:
+                    del self._keyed[frame[0]]
+                self.counters["dropped"] += 1
+                return True
+        self.counters["dropped"] += 1
+        if key is not None and key[0] == "data":
+            self._resync.add(key[1])
+        return False
+
+    async def drained(self):
+        await self._idle.wait()
+
+    def close(self):
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _write(self):
+        while True:
+            if not self._frames:
+                self._idle.set()
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            key, text = frame = self._frames.popleft()
+            if key is not None and self._keyed.get(key) is frame:
+                del self._keyed[key]
+            if len(self._frames) < self.limit:
+                self._full_since = None
+            try:
+                if isinstance(text, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(text), config.BROADCAST_SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(text), config.BROADCAST_SEND_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                FRAMES_SENT.inc(result="failed")
+                self._evict(self.websocket, "failed_send")
+                return
+            FRAMES_SENT.inc(result="ok")
+
 
 class ConnectionManager:
     def __init__(self):
         # channel_name -> set of websockets
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # websocket -> set of channel names it is subscribed to
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}
+        # Cross-process pub/sub; None delivers broadcasts to this process only
+        self.backplane = None
+        # Called with (channel, message, payload) for every delivered broadcast
+        self.listeners: List[Callable[[str, dict, Any], None]] = []
+        # Called with a channel once its last subscriber here has left
+        self.on_vacated: Optional[Callable[[str], None]] = None
+        # Called, in the leader, with a channel another process asked it to scrape
+        self.on_scrape_request: Optional[Callable[[str], Awaitable[None]]] = None
+        # websocket -> its outbound queue and writer task
+        self.outboxes: Dict[WebSocket, Outbox] = {}
+        # Frames dropped/coalesced in full queues, and clients evicted
+        self.queue_counters: Counter = Counter()
+        # websocket -> when it was last heard from, for heartbeats and idle eviction
+        self.presence: Dict[WebSocket, Presence] = {}
+        # Open sockets per client address
+        self.per_address: Counter = Counter()
+        # Connections opened, closed, and rejected by a limit
+        self.connection_counters: Counter = Counter()
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process should run the scrape cycle."""
+        return self.backplane is None or self.backplane.is_leader
+
+    async def use_backplane(self, backplane):
+        await backplane.start(self.deliver, self.subscriber_counts, self._scrape_requested)
+        self.backplane = backplane
+
+    def subscriber_counts(self) -> Dict[str, int]:
+        """Subscribers per channel in this process."""
+        return {channel: len(sockets) for channel, sockets in self.active_connections.items()}
+
+    async def all_subscriber_counts(self) -> Dict[str, int]:
+        """Subscribers per channel across every process sharing the backplane."""
+        if self.backplane is None:
+            return self.subscriber_counts()
+        return await self.backplane.subscriber_counts(self.subscriber_counts())
+
+    async def request_scrape(self, channel: str):
+        """Ask the leader to scrape `channel` and broadcast its snapshot."""
+        if self.backplane is not None:
+            await self.backplane.request_scrape(channel)
+
+    async def _scrape_requested(self, channel: str):
+        if self.on_scrape_request is not None:
+            await self.on_scrape_request(channel)
 
-    async def connect(self, websocket: WebSocket, channel: str):
+    async def close_backplane(self):
+        if self.backplane is not None:
+            await self.backplane.stop()
+            self.backplane = None
+
+    async def connect(self, websocket: WebSocket, channel: Optional[str] = None, statuses: str = "all", encoding: str = "json") -> bool:
+        """Accept `websocket`, subscribed to `channel` if given.
+
+        Returns False, having refused the handshake, when the client's address
+        already holds MAX_CONNECTIONS_PER_ADDRESS sockets or `channel` is full.
+        The refusal happens before `accept()`, so uvicorn answers the upgrade
+        with HTTP 403 and the client never sees a close code.
+        """
+        client = getattr(websocket, "client", None)
+        address = client.host if client else ""
+        if config.MAX_CONNECTIONS_PER_ADDRESS and self.per_address[address] >= config.MAX_CONNECTIONS_PER_ADDRESS:
+            return await self._reject(websocket, "address_limit")
+        if channel is not None and self.full(channel):
+            return await self._reject(websocket, "channel_limit")
         await websocket.accept()
-        if channel not in self.active_connections:
-            self.active_connections[channel] = set()
-        self.active_connections[channel].add(websocket)
+        self.connection_counters["opened"] += 1
+        self.per_address[address] += 1
+        self.presence[websocket] = Presence(address, time.monotonic())
+        self.subscriptions.setdefault(websocket, set())
+        outbox = self._outbox(websocket)
+        outbox.statuses = statuses if statuses in STATUS_MODES else "all"
+        outbox.encoding = encoding if available(encoding) else "json"
+        if channel is not None:
+            self.subscribe(websocket, channel)
+        return True
+
+    async def _reject(self, websocket: WebSocket, reason: str) -> bool:
+        self.connection_counters[f"rejected_{reason}"] += 1
+        try:
+            # Not accepted yet, so uvicorn answers the upgrade with HTTP 403 and drops the code
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+        return False
+
+    def full(self, channel: str) -> bool:
+        """Whether `channel` already has MAX_SUBSCRIBERS_PER_CHANNEL subscribers."""
+        return bool(config.MAX_SUBSCRIBERS_PER_CHANNEL) and \
+            len(self.active_connections.get(channel, ())) >= config.MAX_SUBSCRIBERS_PER_CHANNEL
+
+    def subscribe(self, websocket: WebSocket, channel: str) -> bool:
+        """Add `websocket` to `channel`; returns False if the channel is full."""
+        sockets = self.active_connections.get(channel)
+        if sockets is not None and websocket in sockets:
+            return True
+        if self.full(channel):
+            self.connection_counters["rejected_channel_limit"] += 1
+            return False
+        if sockets is None:
+            sockets = self.active_connections[channel] = set()
+        sockets.add(websocket)
+        self.subscriptions.setdefault(websocket, set()).add(channel)
+        return True
+
+    def seen(self, websocket: WebSocket, pong: bool = False):
+        """Record that the client sent something; `pong` if it answered a ping."""
+        presence = self.presence.get(websocket)
+        if presence is not None:
+            presence.last_seen = time.monotonic()
+            presence.answers_pings = presence.answers_pings or pong
 
-    def disconnect(self, websocket: WebSocket, channel: str):
+    def unsubscribe(self, websocket: WebSocket, channel: str):
         if channel in self.active_connections:
-            self.active_connections[channel].remove(websocket)
+            self.active_connections[channel].discard(websocket)
             if not self.active_connections[channel]:
                 del self.active_connections[channel]
+                if self.on_vacated is not None:
+                    self.on_vacated(channel)
+        if websocket in self.subscriptions:
+            self.subscriptions[websocket].discard(channel)
 
-    async def broadcast(self, channel: str, message: dict):
-        if channel in self.active_connections:
-            # Create a copy of the set to avoid issues if a connection is removed during iteration
-            for connection in list(self.active_connections[channel]):
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    self.active_connections[channel].remove(connection)
+    def disconnect(self, websocket: WebSocket, channel: Optional[str] = None):
+        """Drop `websocket` from `channel`, or from every channel it joined.
+
+        Safe to call more than once, and from any path that notices the
+        socket is gone; each step only touches what `websocket` still holds.
+        """
+        if channel is not None:
+            self.unsubscribe(websocket, channel)
+            return
+        for joined in list(self.subscriptions.pop(websocket, ())):
+            self.unsubscribe(websocket, joined)
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.close()
+        presence = self.presence.pop(websocket, None)
+        if presence is not None:
+            self.connection_counters["closed"] += 1
+            self.per_address[presence.address] -= 1
+            if self.per_address[presence.address] <= 0:
+                del self.per_address[presence.address]
+
+    def _outbox(self, websocket: WebSocket) -> Outbox:
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            outbox = self.outboxes[websocket] = Outbox(websocket, self._evict, self.queue_counters, config.SEND_QUEUE_SIZE)
+        return outbox
+
+    def _evict(self, websocket: WebSocket, reason: str):
+        if websocket not in self.outboxes:
+            return
+        logger.info(f"Disconnecting client: {reason.replace('_', ' ')}")
+        self.queue_counters[reason] += 1
+        self.disconnect(websocket)
+        asyncio.create_task(self._close(websocket))
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Disconnect clients that stopped answering pings, or have sat idle with no subscriptions.
+
+        Returns how many were disconnected.
+        """
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for websocket, presence in list(self.presence.items()):
+            silent = now - presence.last_seen
+            if presence.answers_pings and silent > config.HEARTBEAT_INTERVAL + config.HEARTBEAT_TIMEOUT:
+                self._evict(websocket, "missed_heartbeat")
+            elif config.IDLE_TIMEOUT and not self.subscriptions.get(websocket) and silent > config.IDLE_TIMEOUT:
+                self._evict(websocket, "idle")
+            else:
+                continue
+            reaped += 1
+        return reaped
+
+    async def heartbeat(self, interval: float = config.HEARTBEAT_INTERVAL):
+        """Every `interval` seconds, reap dead clients and ping the rest.
+
+        A ping is one frame per encoding, queued like any other; a client
+        answers with {"action": "pong"}.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reap()
+                frames = Frames({"type": "ping", "timestamp": datetime.now(timezone.utc).isoformat()})
+                for outbox in list(self.outboxes.values()):
+                    outbox.put(frames.get(outbox.encoding), ("ping", None))
+            except Exception as e:
+                print(f"Heartbeat error: {e}")
+
+    async def flush(self):
+        """Wait until every queued frame has been written."""
+        for outbox in list(self.outboxes.values()):
+            await outbox.drained()
+
+    async def broadcast(self, channel: str, message: dict, payload: Any = None):
+        """Send `message` to the channel's subscribers in every process.
+
+        `payload` is the full snapshot behind the message, for processes that
+        mirror the leader's state; it is not sent to clients.
+        """
+        if self.backplane is None:
+            await self.deliver(channel, message, payload)
+        else:
+            await self.backplane.publish(channel, message, payload)
+
+    async def deliver(self, channel: str, message: dict, payload: Any = None):
+        """Fan a broadcast out to this process's sockets."""
+        for listener in self.listeners:
+            try:
+                listener(channel, message, payload)
+            except Exception as e:
+                print(f"Error in broadcast listener: {e}")
+        if message["type"] == "snapshot":
+            # Only for processes mirroring the leader's state; clients never see it
+            return
+        connections = self.active_connections.get(channel)
+        if not connections:
+            return
+        start = time.perf_counter()
+        # Serialize once per variant and wire format, and queue the same frames for every client
+        message, status = unfold(message)
+        frames = Frames(tag(channel, message))
+        key = None
+        snapshot = None
+        if message["type"] == "status":
+            key = ("status", channel)
+            status = None
+        elif payload is not None and "version" in message:
+            key = ("data", channel)
+            # Encoded only for clients that are backed up
+            snapshot = Frames(tag(channel, {"type": "data", "version": message["version"], "data": payload}))
+        elif message["type"] == "data":
+            key = ("data", channel)
+        folded = status_frames = None
+        if status is not None:
+            folded = Frames(tag(channel, {**message, "status": status["data"]}))
+            status_frames = Frames(tag(channel, status))
+        wanted = message["data"]["status"] if message["type"] == "status" else None
+        for connection in list(connections):
+            outbox = self._outbox(connection)
+            if wanted is not None and not outbox.wants(wanted):
+                continue
+            if status is None:
+                outbox.put(frames.get(outbox.encoding), key, snapshot)
+            elif outbox.statuses == "folded":
+                outbox.put(folded.get(outbox.encoding), key, snapshot)
+            else:
+                outbox.put(frames.get(outbox.encoding), key, snapshot)
+                outbox.put(status_frames.get(outbox.encoding), ("status", channel))
+        BROADCAST_SECONDS.observe(time.perf_counter() - start)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(), config.BROADCAST_SEND_TIMEOUT)
+        except Exception:
+            pass
     
-    async def send_status(self, websocket: WebSocket, status: str, message: str = None):
+    async def send(self, websocket: WebSocket, channel: Optional[str], message: dict):
+        """Queue `message` for one client, tagged with the channel it belongs to.
+
+        A `status` carried by the message is folded into the frame for clients
+        that asked for that, and sent as its own frame right after otherwise.
+        """
+        if websocket not in self.subscriptions:
+            # Already disconnected
+            return
+        outbox = self._outbox(websocket)
+        if message["type"] == "status" and not outbox.wants(message["data"]["status"]):
+            return
+        status = None
+        if outbox.statuses != "folded":
+            message, status = unfold(message)
+        key = None
+        if message["type"] in ("status", "data"):
+            key = (message["type"], channel)
+        outbox.put(encode(tag(channel, message), outbox.encoding), key)
+        if status is not None:
+            outbox.put(encode(tag(channel, status), outbox.encoding), ("status", channel))
+
+    async def send_status(self, websocket: WebSocket, status: str, message: str = None, channel: Optional[str] = None):
         """Send a status event to a specific WebSocket connection."""
-        from datetime import datetime
-        from models import StatusEvent
-        
-        event = StatusEvent(
-            status=status,
-            message=message,
-            timestamp=datetime.utcnow().isoformat()
-        )
-        try:
-            await websocket.send_json({"type": "status", "data": event.model_dump()})
-        except Exception as e:
-            print(f"Error sending status: {e}")
+        outbox = self.outboxes.get(websocket)
+        if outbox is None or not outbox.wants(status):
+            return
+        await self.send(websocket, channel, {"type": "status", "data": status_event(status, message)})
+
+    async def broadcast_status(self, channel: str, status: str, message: str = None):
+        """Send one status event to every subscriber of `channel`, built and serialized once."""
+        await self.broadcast(channel, {"type": "status", "data": status_event(status, message)})
 
 manager = ConnectionManager()
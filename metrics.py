@@ -0,0 +1,161 @@
+import asyncio
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import config
+
+# Bucket upper bounds in seconds, from a cache hit to a slow browser render
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Metric:
+    """A named family of samples in the Prometheus text format."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for key, (counts, total) in self._values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                samples.append((f"{self.name}_bucket", {**labels, "le": le}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Collected(Metric):
+    """A gauge or counter read from existing state each time metrics are scraped.
+
+    `collect` returns (labels, value) pairs, so nothing is tracked on the
+    hot path for values other objects already keep.
+    """
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]], kind: str = "gauge"):
+        super().__init__(name, help)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, labels, value) for labels, value in self.collect()]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def collected(self, name: str, help: str, collect, kind: str = "gauge") -> Metric:
+        return self.register(Collected(name, help, collect, kind))
+
+    def render(self) -> str:
+        parts = []
+        for metric in self.metrics:
+            try:
+                parts.append(metric.render())
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}")
+        return "\n".join(parts) + "\n"
+
+
+registry = Registry()
+
+FETCH_SECONDS = registry.register(Histogram("news_fetch_seconds", "Page fetch time by tier.", ["tier"]))
+PARSE_SECONDS = registry.register(Histogram("news_parse_seconds", "HTML parse and extraction time by page kind.", ["kind"]))
+MODEL_BUILD_SECONDS = registry.register(Histogram(
+    "news_model_build_seconds", "Time spent building pydantic models in each scrub function.", ["scraper"]))
+SCRUB_SECONDS = registry.register(Histogram("news_scrub_seconds", "Time to refresh and broadcast one channel.", ["channel"]))
+CYCLE_SECONDS = registry.register(Histogram("news_scrub_cycle_seconds", "Duration of a background scrape cycle."))
+BROADCAST_SECONDS = registry.register(Histogram("news_broadcast_seconds", "Time to serialize one broadcast and queue it for local sockets."))
+FRAMES_SENT = registry.register(Counter("news_frames_sent_total", "Frames written to sockets, by result.", ["result"]))
+REST_RESPONSES = registry.register(Counter("news_rest_responses_total", "REST snapshot responses by status code.", ["code"]))
+LOOP_LAG_SECONDS = registry.register(Histogram(
+    "news_event_loop_lag_seconds", "How late the event loop wakes from a timed sleep.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+
+async def monitor_loop_lag(interval: float = config.LOOP_LAG_INTERVAL):
+    """Sample event-loop lag: the delay between when a sleep should end and when it does."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
@@ -0,0 +1,119 @@
+import asyncio
+import importlib.util
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import soupsieve
+from bs4 import BeautifulSoup
+from bs4.filter import ElementFilter
+
+import config
+
+# lxml builds the tree several times faster than the pure-Python html.parser
+PARSER = config.HTML_PARSER or ("lxml" if importlib.util.find_spec("lxml") else "html.parser")
+
+Rule = Tuple[Optional[str], frozenset, Dict[str, str]]
+
+
+def rule(name: Optional[str] = None, classes: str = "", **attrs: str) -> Rule:
+    """Describe a subtree to keep: a tag name, class tokens it must all carry, and exact attributes."""
+    return name, frozenset(classes.split()), {k.replace("_", "-"): v for k, v in attrs.items()}
+
+
+class SubtreeFilter(ElementFilter):
+    """Only build the parts of a page a scraper reads.
+
+    Outermost tags matching one of `rules` are kept with their whole subtree;
+    everything outside them is skipped while parsing, so the extraction
+    selectors run against a much smaller tree.
+    """
+
+    def __init__(self, *rules: Rule):
+        super().__init__()
+        self.rules = rules
+
+    def __add__(self, other: "SubtreeFilter") -> "SubtreeFilter":
+        return SubtreeFilter(*self.rules, *other.rules)
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        attrs = attrs or {}
+        classes = attrs.get("class") or ""
+        if not isinstance(classes, str):
+            classes = " ".join(classes)
+        tokens = set(classes.split())
+        for rule_name, rule_classes, rule_attrs in self.rules:
+            if rule_name is not None and rule_name != name:
+                continue
+            if not rule_classes <= tokens:
+                continue
+            if any(attrs.get(k) != v for k, v in rule_attrs.items()):
+                continue
+            return True
+        return False
+
+    def allow_string_creation(self, string) -> bool:
+        return False
+
+
+def make_soup(html: str, parse_only: Optional[SubtreeFilter] = None) -> BeautifulSoup:
+    return BeautifulSoup(html, PARSER, parse_only=parse_only)
+
+
+def css(selector: str) -> soupsieve.SoupSieve:
+    """Compile a selector once, at import time, instead of on every call."""
+    return soupsieve.compile(selector)
+
+
+def select_first(tag, selectors: Iterable[soupsieve.SoupSieve]):
+    """Return the matches of the first selector in a fallback chain that matches anything."""
+    for selector in selectors:
+        found = selector.select(tag)
+        if found:
+            return found
+    return []
+
+
+def select_one_of(tag, selectors: Iterable[soupsieve.SoupSieve]):
+    """Return the first element matched by a fallback chain of selectors, or None.
+
+    A bs4 Tag is always truthy, even when empty, so like the `a or b or c`
+    chains it replaces, only a selector that matches nothing falls through.
+    """
+    for selector in selectors:
+        found = selector.select_one(tag)
+        if found is not None:
+            return found
+    return None
+
+
+_executor: Optional[Executor] = None
+
+
+def start_executor() -> Optional[Executor]:
+    """Create the parse pool configured by PARSE_EXECUTOR ("process", "thread" or "inline")."""
+    global _executor
+    if _executor is None and config.PARSE_EXECUTOR != "inline":
+        if config.PARSE_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=config.PARSE_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=config.PARSE_WORKERS, thread_name_prefix="parse")
+    return _executor
+
+
+def stop_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_parser(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a parse/extract function off the event loop.
+
+    `func` and its arguments must be picklable for the process pool, so
+    workers take raw HTML and return plain data rather than soups or models.
+    """
+    executor = start_executor()
+    if executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import logging
+from typing import Any, Awaitable, Callable, Optional, Set
+
+import config
+from cache import ScrapeCache, article_cache
+from scraper import scrub_article_detail
+
+logger = logging.getLogger(__name__)
+
+URGENT = 0
+NORMAL = 1
+
+
+def article_key(url: str) -> str:
+    return f"article:{url}"
+
+
+class Prefetcher:
+    """Warms the article cache with details users are about to open.
+
+    Headline scrapes offer the article URLs they found. New ones are queued,
+    latest and Popular items first, and loaded at most `concurrency` at a
+    time with `interval` seconds between fetch starts, so prefetching never
+    crowds out the scrapes subscribers are waiting on.
+
+    A prefetched article that is later opened counts as used; one evicted
+    from the cache before anyone opened it counts as wasted.
+    """
+
+    def __init__(
+        self,
+        cache: ScrapeCache = article_cache,
+        load: Callable[[str], Awaitable[Any]] = scrub_article_detail,
+        concurrency: int = config.PREFETCH_CONCURRENCY,
+        interval: float = config.PREFETCH_INTERVAL,
+        max_queued: int = config.PREFETCH_QUEUE_SIZE,
+    ):
+        self.cache = cache
+        self.load = load
+        self.concurrency = concurrency
+        self.interval = interval
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=max_queued)
+        self._queued: Set[str] = set()
+        self._unread: Set[str] = set()
+        self._order = itertools.count()
+        self._runner: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.offered = 0
+        self.dropped = 0
+        self.fetched = 0
+        self.failed = 0
+        self.used = 0
+        self.wasted = 0
+        cache.on_evict = self._evicted
+
+    def offer(self, url: str, urgent: bool = False):
+        """Queue `url` unless it is cached, already queued, or the queue is full."""
+        if url in self._queued or article_key(url) in self.cache:
+            return
+        try:
+            self._queue.put_nowait((URGENT if urgent else NORMAL, next(self._order), url))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self._queued.add(url)
+        self.offered += 1
+
+    def opened(self, key: str):
+        """Record a client opening `key`, crediting the prefetch that loaded it."""
+        if key in self._unread:
+            self._unread.discard(key)
+            self.used += 1
+
+    def _evicted(self, key: str):
+        if key in self._unread:
+            self._unread.discard(key)
+            self.wasted += 1
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        if self._runner is not None:
+            tasks.append(self._runner)
+            self._runner = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        while True:
+            _, _, url = await self._queue.get()
+            self._queued.discard(url)
+            if article_key(url) in self.cache:
+                continue
+            await semaphore.acquire()
+            task = asyncio.create_task(self._fetch(url))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+            await asyncio.sleep(self.interval)
+
+    async def _fetch(self, url: str):
+        key = article_key(url)
+        try:
+            value = await self.cache.refresh(key, lambda: self.load(url))
+        except Exception as e:
+            print(f"Error prefetching {url}: {e}")
+            value = None
+        if value:
+            self.fetched += 1
+            self._unread.add(key)
+        else:
+            self.failed += 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "offered": self.offered,
+            "dropped": self.dropped,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "used": self.used,
+            "wasted": self.wasted,
+            "unread": len(self._unread),
+            "use_rate": self.used / self.fetched if self.fetched else 0.0,
+            "cache": self.cache.stats(),
+        }
+
+
+prefetcher = Prefetcher()
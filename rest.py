@@ -0,0 +1,69 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+import config
+
+
+class Representation(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def etag_of(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, as RFC 9110 asks for)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cache_control(ttl: float, age: Optional[float]) -> str:
+    """Fresh for what is left of the channel's TTL, then served stale while a cache revalidates.
+
+    Without a known fetch time (a follower serving the leader's snapshot)
+    caches revalidate every time, which costs them a 304 at most.
+    """
+    max_age = int(max(0.0, ttl - age)) if age is not None else 0
+    return (
+        f"public, max-age={max_age}, stale-while-revalidate={int(config.REST_STALE_WHILE_REVALIDATE)},"
+        f" stale-if-error={int(config.REST_STALE_IF_ERROR)}"
+    )
+
+
+class Representations:
+    """Serialized REST bodies and their ETags, per channel.
+
+    A body is rebuilt only when the data object behind the channel changes,
+    so repeated reads and revalidations cost a dict lookup. Scrape results
+    are replaced, never mutated, which makes identity a safe check.
+    """
+
+    def __init__(self, max_entries: int = config.CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.built = 0
+
+    def get(self, channel: str, data: Any, payload) -> Representation:
+        """The representation of `data`; `payload` turns it into JSON-ready values."""
+        entry = self._entries.get(channel)
+        if entry is not None and entry[0] is data:
+            self._entries.move_to_end(channel)
+            return entry[1]
+        body = json.dumps({"channel": channel, "data": payload(data)}, separators=(",", ":")).encode()
+        representation = Representation(body, etag_of(body))
+        self._entries[channel] = (data, representation)
+        self._entries.move_to_end(channel)
+        self.built += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return representation
+
+
+representations = Representations()
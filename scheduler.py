@@ -0,0 +1,121 @@
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import config
+from channels import CATEGORIES, CARTOONS_CHANNEL, LIVE_TV_CHANNEL, POPULAR_CHANNEL, headline_channel
+
+
+@dataclass
+class Policy:
+    """Refresh interval bounds (seconds) for a kind of channel.
+
+    `jitter` spreads each wait by up to that fraction either way so channels
+    scheduled together drift apart instead of scraping in bursts.
+    """
+    min_interval: float
+    max_interval: float
+    initial: float
+    jitter: float = config.SCHEDULE_JITTER
+
+    def clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+
+HEADLINE_POLICY = Policy(config.HEADLINE_MIN_INTERVAL, config.HEADLINE_MAX_INTERVAL, config.SCRUB_INTERVAL)
+LIVE_TV_POLICY = Policy(config.LIVE_TV_MIN_INTERVAL, config.LIVE_TV_MAX_INTERVAL, config.SCRUB_INTERVAL)
+
+HEADLINE_CHANNELS = frozenset([headline_channel(cat) for cat in CATEGORIES] + [CARTOONS_CHANNEL, POPULAR_CHANNEL])
+
+
+@dataclass
+class _State:
+    interval: float
+    next_at: float
+
+
+class RefreshScheduler:
+    """Decides when each subscribed channel is scraped again.
+
+    Every channel has its own interval. A refresh that changed the snapshot
+    shortens it by `speedup`, one that did not lengthens it by `slowdown`,
+    so busy pages are polled often and quiet ones rarely. More subscribers
+    shorten the wait further (by 1 + log10(subscribers)). Waits stay within
+    the channel's policy bounds and are jittered. Channels nobody is
+    subscribed to are forgotten and cost nothing until someone subscribes.
+    """
+
+    def __init__(
+        self,
+        headline: Policy = HEADLINE_POLICY,
+        live: Policy = LIVE_TV_POLICY,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+        speedup: float = 0.5,
+        slowdown: float = 1.5,
+    ):
+        self.headline = headline
+        self.live = live
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self._states: Dict[str, _State] = {}
+
+    def policy(self, channel: str) -> Optional[Policy]:
+        if channel == LIVE_TV_CHANNEL:
+            return self.live
+        if channel in HEADLINE_CHANNELS:
+            return self.headline
+        return None
+
+    def interval(self, channel: str) -> Optional[float]:
+        state = self._states.get(channel)
+        return state.interval if state else None
+
+    def _wait(self, policy: Policy, interval: float, subscribers: int) -> float:
+        wait = policy.clamp(interval / (1 + math.log10(max(subscribers, 1))))
+        return wait * (1 + self.rng.uniform(-policy.jitter, policy.jitter))
+
+    def due(self, subscribers: Dict[str, int]) -> List[str]:
+        """Channels to refresh now, given each channel's subscriber count.
+
+        A newly subscribed channel has just been scraped for its first
+        subscriber, so it is first due one interval from now.
+        """
+        now = self.clock()
+        for channel in [c for c in self._states if not subscribers.get(c)]:
+            del self._states[channel]
+        ready = []
+        for channel, count in subscribers.items():
+            policy = self.policy(channel)
+            if policy is None or count <= 0:
+                continue
+            state = self._states.get(channel)
+            if state is None:
+                self._states[channel] = _State(policy.initial, now + self._wait(policy, policy.initial, count))
+            elif now >= state.next_at:
+                # Not due again until this refresh is recorded
+                state.next_at = math.inf
+                ready.append(channel)
+        return ready
+
+    def record(self, channel: str, changed: bool, subscribers: int):
+        """Adapt `channel`'s interval to whether its last refresh changed anything."""
+        state = self._states.get(channel)
+        policy = self.policy(channel)
+        if state is None or policy is None:
+            return
+        state.interval = policy.clamp(state.interval * (self.speedup if changed else self.slowdown))
+        state.next_at = self.clock() + self._wait(policy, state.interval, subscribers)
+
+    def sleep_time(self, tick: float = config.SCHEDULE_TICK) -> float:
+        """Seconds until the next channel is due, checked at least every `tick`."""
+        if not self._states:
+            return tick
+        return max(0.0, min(tick, min(s.next_at for s in self._states.values()) - self.clock()))
+
+
+scheduler = RefreshScheduler()
@@ -1,10 +1,15 @@
-import httpx
 from bs4 import BeautifulSoup
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from models import Headline, ArticleDetail, LiveTV
 import asyncio
-from playwright.async_api import async_playwright
+import config
+from fetcher import fetcher
+from metrics import MODEL_BUILD_SECONDS, PARSE_SECONDS
 import logging
+import time
+from urllib.parse import urlparse, parse_qs, unquote
+from extraction import ListSpec, matchers
+from parsing import SubtreeFilter, css, make_soup, rule, run_parser, select_first, select_one_of
 
 
 logging.basicConfig(level=logging.INFO)
@@ -12,184 +17,249 @@ logger = logging.getLogger(__name__)
 
 BASE_URL = "https://3news.com"
 
-async def get_soup(url: str):
-    logger.info(f"Fetching URL: {url}")
-    async with async_playwright() as p:
-        # For hosted environments, use the system Chrome if available
-        try:
-            browser = await p.chromium.launch(
-                headless=True,
-                # Add these arguments for better compatibility
-                args=['--disable-dev-shm-usage', '--no-sandbox']
-            )
-        except Exception as e:
-            print(f"Error launching browser: {e}")
-            # Fallback to using system Chrome
-            browser = await p.chromium.launch(
-                headless=True,
-                channel='chrome',  # Use system Chrome
-                args=['--disable-dev-shm-usage', '--no-sandbox']
-            )
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        )
-        page = await context.new_page()
-        try:
-            # Increase timeout for slow pages
-            await page.goto(url, wait_until="domcontentloaded", timeout=30000)
-            # Wait for articles or some content to load
-            await page.wait_for_selector("article, .post-item, section.bg-white", timeout=15000)
-        except Exception as e:
-            print(f"Playwright wait error for {url}: {e}")
-            # Try to get content anyway
-            try:
-                await page.wait_for_timeout(2000)  # Small delay
-            except:
-                pass
-            
+def route_of(link: str) -> str:
+    """The site-relative route of an article link; off-site links are kept whole."""
+    return link.replace(BASE_URL, "") if link.startswith(BASE_URL) else link
+
+# Selectors each scrubber depends on. A plain HTTP response is only used when
+# the one for the page being scraped matches; otherwise the page is rendered.
+HEADLINES_READY = css("article a[href], .post-item a[href]")
+ARTICLE_READY = css(".article-content p, .entry-content p, .post-content p")
+LIVE_TV_READY = css("iframe[src*='youtube.com/embed'], iframe[src*='facebook.com/plugins/video.php']")
+CARTOONS_READY = css("article a[href], .post-item a[href], .td-block-span6 a[href]")
+POPULAR_READY = css("div.p-4.space-y-4 article h4")
+
+# The home page carries both the headline list and the Popular sidebar, so both
+# scrubbers require the sidebar there and can share a single fetch. It is parsed
+# whole because the Popular fallback walks up from the section heading.
+HOME_READY = POPULAR_READY
+
+# Subtrees each page type is parsed into
+HEADLINES_PAGE = SubtreeFilter(rule("article"), rule(classes="post-item"))
+CARTOONS_PAGE = HEADLINES_PAGE + SubtreeFilter(rule(classes="td-block-span6"))
+LIVE_TV_PAGE = SubtreeFilter(rule("iframe"))
+ARTICLE_PAGE = SubtreeFilter(
+    rule("h1"),
+    rule("article"),
+    rule("nav", aria_label="Breadcrumb"),
+    rule(classes="md:mb-8"),
+    rule(classes="article-content"),
+    rule(classes="entry-content"),
+    rule(classes="post-content"),
+    rule(classes="post-categories"),
+    rule(classes="breadcrumb"),
+)
+
+# Extraction selectors, compiled once. Tuples are fallback chains tried in order.
+ARTICLE = css("article")
+IMG = css("img")
+IFRAME = css("iframe")
+PARAGRAPH = css("p")
+
+HEADLINE_ARTICLES = (ARTICLE, css(".post-item"), css("section.bg-white article"))
+
+ARTICLE_TITLES = (css("h1.entry-title"), css("h1"))
+ARTICLE_BODY_IMG = css("article img")
+ARTICLE_CONTENT_IMG = css(".article-content img")
+ARTICLE_CATEGORIES = tuple(css(s) for s in (
+    "nav[aria-label='Breadcrumb'] ol li a",
+    ".md\\:mb-8 a[href*='/tag/']",
+    ".post-categories a",
+    ".breadcrumb a",
+))
+ARTICLE_CONTENT = (css(".article-content"), css(".entry-content"), css(".post-content"))
+
+CARTOON_ARTICLES = (ARTICLE, css(".post-item"), css(".td-block-span6"))
+
+# List sections, each read in a single pass over every item (see extraction.ListSpec).
+# Like the extractors below, they run in the parse pool and return plain dicts,
+# which the scrub_* coroutines rebuild into models.
+extract_headlines = ListSpec(
+    items=HEADLINE_ARTICLES,
+    title=matchers("h2 a", "h3 a", "h4 a", ".entry-title a", "a.post-title", "a[href*='/news/']"),
+    title_attr=True,
+    # A generic title is replaced by the item's heading; if still generic, the item is skipped
+    headings=matchers("h2", "h3", "h4"),
+    generic_topics=frozenset(["NEWS", "READ MORE", "LATEST", "POLITICS", "SPORTS", "BUSINESS", "ENTERTAINMENT"]),
+    skip_topics=frozenset(["NEWS", "READ MORE", "LATEST"]),
+    image_attrs=("data-src", "src", "srcset"),
+    categories=matchers(".category", ".post-categories a", ".entry-meta .cat-links a"),
+    infer_category=True,
+    base_url=BASE_URL,
+    route=route_of,
+)
+
+extract_cartoons = ListSpec(
+    items=CARTOON_ARTICLES,
+    title=matchers(".entry-title a", "h2 a", "h3 a", "a[href*='/opinion/cartoon/']"),
+    image_attrs=("data-src", "src"),
+    fixed_categories=("Cartoons", "Tilapia Corner"),
+    base_url=BASE_URL,
+    route=route_of,
+)
+
+# The "Popular Today 24h" sidebar: numbered articles in div.p-4.space-y-4, without images
+extract_popular = ListSpec(
+    container=(css("div.p-4.space-y-4"),),
+    container_heading="Popular Today",
+    items=(ARTICLE,),
+    numbered=matchers("div.shrink-0")[0],
+    title=matchers("h4"),
+    link=matchers("a.block"),
+    fixed_categories=("Popular",),
+    base_url=BASE_URL,
+    route=route_of,
+)
+
+def extract_article_detail(soup: BeautifulSoup, url: str) -> dict:
+    title_tag = select_one_of(soup, ARTICLE_TITLES)
+    topic = title_tag.get_text(strip=True) if title_tag else "No Title"
+
+    # Improved image selection for article detail
+    img_tags = ARTICLE_BODY_IMG.select(soup) + ARTICLE_CONTENT_IMG.select(soup)
+    images = []
+    for img in img_tags:
+        src = img.get("data-src") or img.get("src")
+        if src and not src.startswith("data:"):
+            # Filter out common UI badges/icons
+            if any(x in src.lower() for x in ["badge", "icon", "logo", "gravatar", "preferred_source"]):
+                continue
+
+            # Extract original URL from Next.js image proxy if present
+            if "/_next/image?url=" in src:
+                parsed = urlparse(src)
+                query = parse_qs(parsed.query)
+                if "url" in query:
+                    src = unquote(query["url"][0])
+
+            if not src.startswith("http"):
+                src = f"{BASE_URL}{src}"
+            images.append(src)
+
+    # Improved category and tag selection
+    cat_tags = select_first(soup, ARTICLE_CATEGORIES)
+    categories = list(set([cat.get_text(strip=True) for cat in cat_tags if cat.get_text(strip=True) and cat.get_text(strip=True).upper() not in ["HOME", "3NEWS", "LATEST POSTS"]]))
+
+    # Improved content selection
+    content_divs = select_first(soup, ARTICLE_CONTENT)
+    descriptions = []
+    for div in content_divs:
+        descriptions.extend([p.get_text(strip=True) for p in PARAGRAPH.select(div) if p.get_text(strip=True)])
+
+    return dict(
+        topic=topic,
+        images=list(set(images)),
+        categories=categories,
+        descriptions=descriptions,
+        url=url
+    )
+
+def extract_live_tv(soup: BeautifulSoup, url: str) -> dict:
+    # Look for YouTube iframe or other video sources
+    iframes = IFRAME.select(soup)
+    video_url = "No live stream found"
+    for iframe in iframes:
+        src = iframe.get("src", "")
+        if "youtube.com/embed" in src or "facebook.com/plugins/video.php" in src:
+            video_url = src
+            break
+
+    # Fallback to the first iframe if no specific one found and it's not a common ad
+    if video_url == "No live stream found" and iframes:
+        for iframe in iframes:
+            src = iframe.get("src", "")
+            if src and "googleads" not in src and "doubleclick" not in src:
+                video_url = src
+                break
+
+    return dict(
+        video_url=video_url,
+        title="3News Live TV"
+    )
+
+# Page kinds: the selector that makes a plain HTTP response usable, the
+# subtrees to parse, and the sections extracted from one parse of the page.
+PAGE_KINDS: Dict[str, Tuple[Any, Optional[SubtreeFilter], Dict[str, Callable[[BeautifulSoup, str], Any]]]] = {
+    "home": (HOME_READY, None, {"headlines": extract_headlines, "popular": extract_popular}),
+    "headlines": (HEADLINES_READY, HEADLINES_PAGE, {"headlines": extract_headlines}),
+    "article": (ARTICLE_READY, ARTICLE_PAGE, {"article": extract_article_detail}),
+    "live": (LIVE_TV_READY, LIVE_TV_PAGE, {"live": extract_live_tv}),
+    "cartoons": (CARTOONS_READY, CARTOONS_PAGE, {"cartoons": extract_cartoons}),
+}
+
+def extract_page(kind: str, html: str, url: str, require_ready: bool) -> Optional[Dict[str, Any]]:
+    """Parse `html` once and run every extractor for its page kind.
+
+    Returns None when `require_ready` is set and the page lacks the content
+    the extractors need (so the fetcher should render it instead). A failing
+    extractor yields None for its section without affecting the others.
+    """
+    ready, parse_only, extractors = PAGE_KINDS[kind]
+    soup = make_soup(html, parse_only)
+    if require_ready and ready.select_one(soup) is None:
+        return None
+    sections = {}
+    for name, extract in extractors.items():
         try:
-            content = await page.content()
+            sections[name] = extract(soup, url)
         except Exception as e:
-            print(f"Error getting page content for {url}: {e}")
-            # Fallback to simple HTTP request if Playwright fails
-            try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(url)
-                    return BeautifulSoup(response.text, "html.parser")
-            except Exception as http_error:
-                print(f"HTTP fallback also failed for {url}: {http_error}")
-                return BeautifulSoup("<html></html>", "html.parser")  # Return empty soup
-            
-        content = await page.content()
-        await browser.close()
-        logger.info(f"Successfully fetched {url}")
-        return BeautifulSoup(content, "html.parser")
+            print(f"Error extracting {name} from {url}: {e}")
+            sections[name] = None
+    return sections
+
+_inflight: Dict[str, asyncio.Task] = {}
+_recent: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+async def get_page(url: str, kind: str) -> Dict[str, Any]:
+    """Fetch and extract `url`, sharing the result between concurrent callers.
+
+    Extracted pages are also reused for `SOUP_REUSE_SECONDS`, so scrubbers
+    that read different sections of the same page within one cycle fetch
+    and parse it once.
+    """
+    recent = _recent.get(url)
+    if recent and time.monotonic() - recent[0] < config.SOUP_REUSE_SECONDS:
+        return recent[1]
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.create_task(_fetch_page(url, kind))
+        _inflight[url] = task
+        task.add_done_callback(lambda _: _inflight.pop(url, None))
+    return await asyncio.shield(task)
+
+async def _fetch_page(url: str, kind: str) -> Dict[str, Any]:
+    logger.info(f"Fetching URL: {url}")
+
+    async def process(html: str, require_ready: bool):
+        with PARSE_SECONDS.time(kind=kind):
+            return await run_parser(extract_page, kind, html, url, require_ready)
+
+    sections = await fetcher.fetch(url, process, wait_selector=PAGE_KINDS[kind][0].pattern)
+    now = time.monotonic()
+    for key in [k for k, (at, _) in _recent.items() if now - at >= config.SOUP_REUSE_SECONDS]:
+        del _recent[key]
+    _recent[url] = (now, sections)
+    logger.info(f"Successfully fetched {url}")
+    return sections
 
 async def scrub_headlines(category: str) -> List[Headline]:
     url = f"{BASE_URL}/news/{category.lower()}" if category.upper() != "HOME" else BASE_URL
     if category.upper() == "ELECTIONS":
         url = f"{BASE_URL}/elections"
-    
+
     try:
-        soup = await get_soup(url)
-        headlines = []
-        
-        # Standard scraping on rendered HTML
-        articles = soup.select("article") or soup.select(".post-item") or soup.select("section.bg-white article")
-        
-        for idx, article in enumerate(articles):
-            # Try multiple selectors for title/link
-            title_tag = (
-                article.select_one("h2 a") or 
-                article.select_one("h3 a") or
-                article.select_one("h4 a") or
-                article.select_one(".entry-title a") or 
-                article.select_one("a.post-title") or
-                article.select_one("a[href*='/news/']")
-            )
-            if not title_tag:
-                continue
-                
-            topic = title_tag.get_text(strip=True) or title_tag.get("title") or ""
-            # If topic is generic, try to find a better one
-            if not topic or topic.upper() in ["NEWS", "READ MORE", "LATEST", "POLITICS", "SPORTS", "BUSINESS", "ENTERTAINMENT"]:
-                parent_h = article.select_one("h2") or article.select_one("h3") or article.select_one("h4")
-                if parent_h:
-                    topic = parent_h.get_text(strip=True)
-            
-            link = title_tag.get("href") or ""
-            if not link:
-                continue
-            if not link.startswith("http"):
-                link = f"{BASE_URL}{link}"
-            
-            # If topic is still generic, skip it
-            if topic.upper() in ["NEWS", "READ MORE", "LATEST"]:
-                continue
-                
-            # Improved image selection
-            # New structure: article a div img
-            img_tags = article.select("img")
-            images = []
-            for img in img_tags:
-                src = img.get("data-src") or img.get("src") or img.get("srcset")
-                if src and not src.startswith("data:"):
-                    # If it's a srcset, take the first URL
-                    if "," in src:
-                        src = src.split(",")[0].split(" ")[0]
-                    if not src.startswith("http"):
-                        src = f"{BASE_URL}{src}"
-                    images.append(src)
-            
-            # Categories
-            cat_tags = article.select(".category") or article.select(".post-categories a") or article.select(".entry-meta .cat-links a")
-            categories = [cat.get_text(strip=True) for cat in cat_tags]
-            if not categories and "/news/" in link:
-                # Infer category from URL if missing
-                parts = link.split("/")
-                if len(parts) > 4:
-                    categories = [parts[4].capitalize()]
-            
-            headlines.append(Headline(
-                topic=topic,
-                images=list(set(images)), # Unique images
-                categories=categories,
-                isLatest=(idx == 0),
-                url=link,
-                route=link.replace(BASE_URL, "") if link.startswith(BASE_URL) else link
-            ))
-            
-        return headlines
+        page = await get_page(url, "home" if url == BASE_URL else "headlines")
+        with MODEL_BUILD_SECONDS.time(scraper="headlines"):
+            return [Headline(**h) for h in page["headlines"]]
     except Exception as e:
         print(f"Error scrubbing headlines for {category}: {e}")
         return []
 
 async def scrub_article_detail(url: str) -> Optional[ArticleDetail]:
     try:
-        soup = await get_soup(url)
-        
-        title_tag = soup.select_one("h1.entry-title") or soup.select_one("h1")
-        topic = title_tag.get_text(strip=True) if title_tag else "No Title"
-        
-        # Improved image selection for article detail
-        img_tags = soup.select("article img") + soup.select(".article-content img")
-        images = []
-        for img in img_tags:
-            src = img.get("data-src") or img.get("src")
-            if src and not src.startswith("data:"):
-                # Filter out common UI badges/icons
-                if any(x in src.lower() for x in ["badge", "icon", "logo", "gravatar", "preferred_source"]):
-                    continue
-                    
-                # Extract original URL from Next.js image proxy if present
-                if "/_next/image?url=" in src:
-                    from urllib.parse import urlparse, parse_qs, unquote
-                    parsed = urlparse(src)
-                    query = parse_qs(parsed.query)
-                    if "url" in query:
-                        src = unquote(query["url"][0])
-                
-                if not src.startswith("http"):
-                    src = f"{BASE_URL}{src}"
-                images.append(src)
-        
-        # Improved category and tag selection
-        cat_tags = soup.select("nav[aria-label='Breadcrumb'] ol li a") or soup.select(".md:mb-8 a[href*='/tag/']") or soup.select(".post-categories a") or soup.select(".breadcrumb a")
-        categories = list(set([cat.get_text(strip=True) for cat in cat_tags if cat.get_text(strip=True) and cat.get_text(strip=True).upper() not in ["HOME", "3NEWS", "LATEST POSTS"]]))
-        
-        # Improved content selection
-        content_divs = soup.select(".article-content") or soup.select(".entry-content") or soup.select(".post-content")
-        descriptions = []
-        for div in content_divs:
-            descriptions.extend([p.get_text(strip=True) for p in div.select("p") if p.get_text(strip=True)])
-            
-        return ArticleDetail(
-            topic=topic,
-            images=list(set(images)),
-            categories=categories,
-            descriptions=descriptions,
-            url=url
-        )
+        page = await get_page(url, "article")
+        with MODEL_BUILD_SECONDS.time(scraper="article_detail"):
+            return ArticleDetail(**page["article"])
     except Exception as e:
         print(f"Error scrubbing article detail for {url}: {e}")
         return None
@@ -197,28 +267,9 @@ async def scrub_article_detail(url: str) -> Optional[ArticleDetail]:
 async def scrub_live_tv() -> Optional[LiveTV]:
     url = f"{BASE_URL}/live/3news24"
     try:
-        soup = await get_soup(url)
-        # Look for YouTube iframe or other video sources
-        iframes = soup.select("iframe")
-        video_url = "No live stream found"
-        for iframe in iframes:
-            src = iframe.get("src", "")
-            if "youtube.com/embed" in src or "facebook.com/plugins/video.php" in src:
-                video_url = src
-                break
-        
-        # Fallback to the first iframe if no specific one found and it's not a common ad
-        if video_url == "No live stream found" and iframes:
-            for iframe in iframes:
-                src = iframe.get("src", "")
-                if src and "googleads" not in src and "doubleclick" not in src:
-                    video_url = src
-                    break
-        
-        return LiveTV(
-            video_url=video_url,
-            title="3News Live TV"
-        )
+        page = await get_page(url, "live")
+        with MODEL_BUILD_SECONDS.time(scraper="live_tv"):
+            return LiveTV(**page["live"])
     except Exception as e:
         print(f"Error scrubbing live TV: {e}")
         return None
@@ -227,44 +278,9 @@ async def scrub_cartoons() -> List[Headline]:
     # Dedicated cartoon category
     url = f"{BASE_URL}/opinion/cartoon/"
     try:
-        soup = await get_soup(url)
-        headlines = []
-        # The structure on the cartoon page might be different
-        articles = soup.select("article") or soup.select(".post-item") or soup.select(".td-block-span6")
-        
-        for idx, article in enumerate(articles):
-            title_tag = (
-                article.select_one(".entry-title a") or 
-                article.select_one("h2 a") or 
-                article.select_one("h3 a") or
-                article.select_one("a[href*='/opinion/cartoon/']")
-            )
-            if not title_tag:
-                continue
-                
-            topic = title_tag.get_text(strip=True)
-            link = title_tag.get("href")
-            if not link.startswith("http"):
-                link = f"{BASE_URL}{link}"
-            
-            img_tags = article.select("img")
-            images = []
-            for img in img_tags:
-                src = img.get("data-src") or img.get("src")
-                if src and not src.startswith("data:"):
-                    if not src.startswith("http"):
-                        src = f"{BASE_URL}{src}"
-                    images.append(src)
-            
-            headlines.append(Headline(
-                topic=topic,
-                images=list(set(images)),
-                categories=["Cartoons", "Tilapia Corner"],
-                isLatest=(idx == 0),
-                url=link,
-                route=link.replace(BASE_URL, "") if link.startswith(BASE_URL) else link
-            ))
-        return headlines
+        page = await get_page(url, "cartoons")
+        with MODEL_BUILD_SECONDS.time(scraper="cartoons"):
+            return [Headline(**h) for h in page["cartoons"]]
     except Exception as e:
         print(f"Error scrubbing cartoons: {e}")
         return []
@@ -272,56 +288,9 @@ async def scrub_cartoons() -> List[Headline]:
 async def scrub_popular() -> List[Headline]:
     url = BASE_URL
     try:
-        soup = await get_soup(url)
-        headlines = []
-        
-        # Based on browser research, popular articles are in a sidebar with "Popular Today 24h"
-        # They are within article tags inside a div.p-4.space-y-4
-        
-        # Find the container by class or proximity to heading
-        container = soup.select_one("div.p-4.space-y-4")
-        if not container:
-            # Fallback: look for heading and find sibling container
-            popular_heading = soup.find(lambda tag: tag.name in ["h3", "h2", "div"] and "Popular Today" in tag.get_text())
-            if popular_heading:
-                parent = popular_heading.find_parent("div")
-                if parent:
-                    container = parent.find_next_sibling("div")
-        
-        if not container:
-            return []
-            
-        articles = container.select("article")
-        
-        for idx, article in enumerate(articles):
-            # Each popular article has a number div
-            number_div = article.select_one("div.shrink-0")
-            if not number_div or not number_div.get_text(strip=True).isdigit():
-                continue
-                
-            title_tag = article.select_one("h4")
-            link_tag = article.select_one("a.block")
-            
-            if not title_tag or not link_tag:
-                continue
-                
-            topic = title_tag.get_text(strip=True)
-            link = link_tag.get("href")
-            if not link:
-                continue
-            if not link.startswith("http"):
-                link = f"{BASE_URL}{link}"
-                
-            headlines.append(Headline(
-                topic=topic,
-                images=[], # Sidebar list doesn't have images
-                categories=["Popular"],
-                isLatest=(idx == 0),
-                url=link,
-                route=link.replace(BASE_URL, "") if link.startswith(BASE_URL) else link
-            ))
-            
-        return headlines
+        page = await get_page(url, "home")
+        with MODEL_BUILD_SECONDS.time(scraper="popular"):
+            return [Headline(**h) for h in page["popular"]]
     except Exception as e:
         print(f"Error scrubbing popular: {e}")
         return []
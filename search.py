@@ -0,0 +1,191 @@
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Set
+
+import config
+from scraper import route_of
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+# Field weights: a word in the headline counts for more than one in the body
+TOPIC_WEIGHT = 3
+CATEGORY_WEIGHT = 2
+BODY_WEIGHT = 1
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def terms(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+@dataclass
+class _Document:
+    # The story as a Headline-shaped dict, returned in results
+    item: dict
+    descriptions: List[str] = field(default_factory=list)
+    counts: Counter = field(default_factory=Counter)
+    length: int = 0
+    updated_at: float = 0.0
+
+
+class SearchIndex:
+    """An in-memory inverted index over scraped headlines and article bodies.
+
+    Documents are keyed by story URL. A headline and the article detail for
+    the same URL are indexed as one document: topic and categories from
+    whichever was seen, body text from the article. Re-adding a URL replaces
+    its postings. At most `max_documents` are kept, and documents not seen
+    again within `max_age` seconds are dropped, oldest first.
+
+    `search` ranks documents containing every query term by BM25, newer
+    stories first on ties. An article seen before its headline gets its
+    route from `route`, as the list extractors derive it.
+    """
+
+    def __init__(
+        self,
+        max_documents: int = config.SEARCH_MAX_DOCUMENTS,
+        max_age: float = config.SEARCH_MAX_AGE,
+        clock: Callable[[], float] = time.monotonic,
+        route: Callable[[str], str] = route_of,
+    ):
+        self.max_documents = max_documents
+        self.max_age = max_age
+        self.clock = clock
+        self.route = route
+        # url -> document, least recently updated first
+        self._documents: "OrderedDict[str, _Document]" = OrderedDict()
+        # term -> {url: weighted term frequency}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        # URLs added or changed since the last `take_changed`
+        self._changed: Set[str] = set()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._documents
+
+    def add_headlines(self, headlines: Iterable[dict]):
+        for headline in headlines:
+            document = self._documents.get(headline["url"])
+            self._index(headline["url"], headline, document.descriptions if document else [])
+
+    def add_article(self, detail: dict):
+        url = detail["url"]
+        document = self._documents.get(url)
+        if document is not None:
+            item = {**document.item, "images": document.item["images"] or detail["images"]}
+        else:
+            item = {
+                "topic": detail["topic"],
+                "images": detail["images"],
+                "categories": detail["categories"],
+                "isLatest": False,
+                "url": url,
+                "route": self.route(url),
+            }
+        self._index(url, item, detail["descriptions"])
+
+    def _index(self, url: str, item: dict, descriptions: List[str]):
+        counts = Counter()
+        for term in terms(item["topic"]):
+            counts[term] += TOPIC_WEIGHT
+        for term in terms(" ".join(item["categories"])):
+            counts[term] += CATEGORY_WEIGHT
+        for paragraph in descriptions:
+            for term in terms(paragraph):
+                counts[term] += BODY_WEIGHT
+
+        previous = self._documents.get(url)
+        if previous is not None and previous.counts == counts and previous.item == item:
+            previous.updated_at = self.clock()
+            self._documents.move_to_end(url)
+            return
+        if previous is not None:
+            self._remove(url)
+        document = _Document(item, descriptions, counts, sum(counts.values()), self.clock())
+        self._documents[url] = document
+        self._total_length += document.length
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[url] = count
+        self._changed.add(url)
+        self._evict()
+
+    def _remove(self, url: str):
+        document = self._documents.pop(url)
+        self._total_length -= document.length
+        for term in document.counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(url, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _evict(self):
+        cutoff = self.clock() - self.max_age
+        while self._documents:
+            url, oldest = next(iter(self._documents.items()))
+            if len(self._documents) <= self.max_documents and oldest.updated_at >= cutoff:
+                break
+            self._remove(url)
+            self._changed.discard(url)
+            self.evicted += 1
+
+    def search(self, query: str, limit: int = config.SEARCH_RESULTS) -> List[dict]:
+        """Stories containing every term of `query`, best match first."""
+        query_terms = list(dict.fromkeys(terms(query)))
+        if not query_terms:
+            return []
+        postings = [self._postings.get(term) for term in query_terms]
+        if not all(postings):
+            return []
+        # Intersect starting from the rarest term
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for more in postings[1:]:
+            candidates &= more.keys()
+        count = len(self._documents)
+        average = self._total_length / count if count else 1
+        scores = {}
+        for url in candidates:
+            document = self._documents[url]
+            score = 0.0
+            for matches in postings:
+                tf = matches[url]
+                idf = math.log(1 + (count - len(matches) + 0.5) / (len(matches) + 0.5))
+                score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * document.length / average))
+            scores[url] = score
+        ranked = sorted(scores, key=lambda url: (-scores[url], -self._documents[url].updated_at))
+        return [self._documents[url].item for url in ranked[:limit]]
+
+    def matches(self, url: str, query: str) -> bool:
+        document = self._documents.get(url)
+        return document is not None and all(term in document.counts for term in terms(query))
+
+    def take_changed(self) -> Set[str]:
+        """URLs indexed or re-indexed since the last call."""
+        changed, self._changed = self._changed, set()
+        return changed
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._documents),
+            "terms": len(self._postings),
+            "postings": sum(len(p) for p in self._postings.values()),
+            "evicted": self.evicted,
+        }
+
+
+search_index = SearchIndex()
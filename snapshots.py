@@ -0,0 +1,208 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import config
+
+
+def fingerprint(item: Any) -> str:
+    return hashlib.blake2b(json.dumps(item, sort_keys=True).encode(), digest_size=12).hexdigest()
+
+
+@dataclass
+class _Snapshot:
+    version: int
+    payload: Any
+    # url -> content hash, in headline order; a single "" key for non-list payloads
+    hashes: Dict[str, str]
+    history: Deque[Tuple[int, Dict[str, str]]] = field(default_factory=deque)
+    # Leader epoch of the last adopted version; versions only compare within one epoch
+    epoch: int = 0
+
+
+def unique(payload: Any) -> Any:
+    """A headline list with repeated URLs reduced to their first occurrence.
+
+    Deltas and `order` identify items by URL, so a list may hold each URL
+    only once for a client to rebuild it.
+    """
+    if not isinstance(payload, list):
+        return payload
+    seen = set()
+    return [item for item in payload if item["url"] not in seen and not seen.add(item["url"])]
+
+
+def _hashes(payload: Any) -> Dict[str, str]:
+    if isinstance(payload, list):
+        return {item["url"]: fingerprint(item) for item in payload}
+    return {"": fingerprint(payload)}
+
+
+class SnapshotStore:
+    """Keeps the last broadcast payload per channel and turns updates into deltas.
+
+    Headline lists are diffed by `url` and per-item content hash; other
+    payloads (live TV, article detail) are compared as a whole. The hashes of
+    the last `DELTA_HISTORY` versions are kept so a reconnecting client can be
+    caught up from the version it already has.
+
+    Versions come from one counter for the whole store, seeded with the
+    wall clock in milliseconds. A restarted process, or a channel whose
+    snapshot was evicted and rebuilt, never reissues a version a client
+    may still hold, so `since` cannot mistake new data for what the client
+    has. At most `max_channels` snapshots are kept, least recently used
+    dropped first.
+    """
+
+    def __init__(self, history: int = config.DELTA_HISTORY, max_channels: int = config.SNAPSHOT_MAX_CHANNELS,
+                 epoch: Optional[int] = None):
+        self.history = history
+        self.max_channels = max_channels
+        self._snapshots: "OrderedDict[str, _Snapshot]" = OrderedDict()
+        self._last_version = int(time.time() * 1000) if epoch is None else epoch
+        self.evicted = 0
+        # Called with (channel, payload, version) whenever a channel's snapshot changes
+        self.on_change: Optional[Callable[[str, Any, int], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def _get(self, channel: str) -> Optional[_Snapshot]:
+        snapshot = self._snapshots.get(channel)
+        if snapshot is not None:
+            self._snapshots.move_to_end(channel)
+        return snapshot
+
+    def _add(self, channel: str, snapshot: _Snapshot):
+        self._snapshots[channel] = snapshot
+        while len(self._snapshots) > self.max_channels:
+            self._snapshots.popitem(last=False)
+            self.evicted += 1
+
+    def _next_version(self) -> int:
+        self._last_version += 1
+        return self._last_version
+
+    def advance(self, epoch: int):
+        """Issue versions above `epoch` from now on."""
+        self._last_version = max(self._last_version, epoch)
+
+    def discard(self, channel: str):
+        self._snapshots.pop(channel, None)
+
+    def version(self, channel: str) -> int:
+        snapshot = self._snapshots.get(channel)
+        return snapshot.version if snapshot else 0
+
+    def full(self, channel: str) -> Optional[dict]:
+        snapshot = self._get(channel)
+        if snapshot is None:
+            return None
+        return {"type": "data", "version": snapshot.version, "data": snapshot.payload}
+
+    def update(self, channel: str, payload: Any) -> Optional[dict]:
+        """Record `payload` and return the message to broadcast, or None if unchanged.
+
+        Repeated URLs in a headline list are dropped, keeping the first.
+        """
+        hashes = _hashes(payload)
+        if isinstance(payload, list) and len(hashes) != len(payload):
+            payload = unique(payload)
+        snapshot = self._get(channel)
+        if snapshot is None:
+            self._add(channel, _Snapshot(self._next_version(), payload, hashes, deque(maxlen=self.history)))
+            self._changed(channel)
+            return self.full(channel)
+        if hashes == snapshot.hashes and list(hashes) == list(snapshot.hashes):
+            return None
+
+        previous = snapshot.version
+        snapshot.history.append((previous, snapshot.hashes))
+        snapshot.version = self._next_version()
+        snapshot.payload = payload
+        snapshot.hashes = hashes
+        self._changed(channel)
+        if not isinstance(payload, list):
+            return self.full(channel)
+        return self._delta(snapshot, previous, snapshot.history[-1][1])
+
+    def payload(self, channel: str) -> Any:
+        snapshot = self._get(channel)
+        return snapshot.payload if snapshot else None
+
+    def adopt(self, channel: str, payload: Any, version: int, epoch: int = 0):
+        """Take on a snapshot published by another process (the scrape leader) or saved to disk.
+
+        A snapshot from a later leader `epoch` replaces the one held whatever
+        its version; within an epoch only newer versions do.
+        """
+        payload = unique(payload)
+        # Versions issued here after a takeover follow the ones adopted
+        self.advance(version)
+        snapshot = self._get(channel)
+        if snapshot is None:
+            self._add(channel, _Snapshot(version, payload, _hashes(payload), deque(maxlen=self.history), epoch))
+            self._changed(channel)
+            return
+        if (epoch, version) <= (snapshot.epoch, snapshot.version):
+            return
+        snapshot.history.append((snapshot.version, snapshot.hashes))
+        snapshot.epoch = epoch
+        snapshot.version = version
+        snapshot.payload = payload
+        snapshot.hashes = _hashes(payload)
+        self._changed(channel)
+
+    def _changed(self, channel: str):
+        if self.on_change is not None:
+            snapshot = self._snapshots[channel]
+            self.on_change(channel, snapshot.payload, snapshot.version)
+
+    def since(self, channel: str, version: int) -> Optional[dict]:
+        """Catch a client up from `version`.
+
+        Returns None when the client is already current, a delta when
+        `version` is still in the history, and the full snapshot otherwise
+        (including for versions this store never issued).
+        """
+        snapshot = self._get(channel)
+        if snapshot is None:
+            return None
+        if version == snapshot.version:
+            return None
+        if isinstance(snapshot.payload, list):
+            for past_version, hashes in snapshot.history:
+                if past_version == version:
+                    return self._delta(snapshot, version, hashes)
+        return self.full(channel)
+
+    @staticmethod
+    def _delta(snapshot: _Snapshot, base: int, old: Dict[str, str]) -> dict:
+        added: List[dict] = []
+        updated: List[dict] = []
+        for item in snapshot.payload:
+            previous = old.get(item["url"])
+            if previous is None:
+                added.append(item)
+            elif previous != snapshot.hashes[item["url"]]:
+                updated.append(item)
+        message = {
+            "type": "delta",
+            "version": snapshot.version,
+            "base": base,
+            "added": added,
+            "removed": [url for url in old if url not in snapshot.hashes],
+            "updated": updated,
+        }
+        # Clients apply a delta by dropping `removed` and appending `added`;
+        # when that would not reproduce the new ordering, send it explicitly.
+        order = list(snapshot.hashes)
+        if [url for url in old if url in snapshot.hashes] + [item["url"] for item in added] != order:
+            message["order"] = order
+        return message
+
+
+snapshots = SnapshotStore()
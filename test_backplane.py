@@ -0,0 +1,144 @@
+import unittest
+
+import main
+from backplane import RedisBackplane
+from manager import ConnectionManager
+from testing import Clock, RecordingWebSocket, configured, run_tests, scenario, wait_for
+
+SPORTS = "news:SPORTS:headline"
+POLITICS = "news:POLITICS:headline"
+
+
+def headlines(slug: str) -> list:
+    return [{"topic": slug.title(), "images": [], "categories": ["Sports"], "isLatest": False,
+             "url": f"https://3news.com/news/{slug}", "route": f"/news/{slug}"}]
+
+
+def stand_in_clients(count: int):
+    """Redis clients that share one in-process fake server (fakeredis, from the dev group)."""
+    try:
+        import fakeredis
+        import lupa  # noqa: F401 - leadership is renewed with Lua scripts
+    except ImportError as e:
+        raise unittest.SkipTest(f"{e.name} is not installed")
+    server = fakeredis.FakeServer()
+    return [fakeredis.FakeAsyncRedis(server=server) for _ in range(count)]
+
+
+@scenario
+async def test_redis_backplane_fans_out_and_elects_one_leader():
+    clients = stand_in_clients(2)
+    managers = [ConnectionManager() for _ in clients]
+    sockets = [RecordingWebSocket(raw=True) for _ in clients]
+    backplanes = [RedisBackplane(client=client, node_id=f"node-{i}") for i, client in enumerate(clients)]
+    for manager, websocket, backplane in zip(managers, sockets, backplanes):
+        manager.subscribe(websocket, "news:HOME:headline")
+        await manager.use_backplane(backplane)
+    try:
+        # Exactly one process leads the scrape cycle
+        assert [m.is_leader for m in managers] == [True, False]
+
+        # A broadcast from the leader reaches sockets in every process
+        await managers[0].broadcast("news:HOME:headline", {"type": "data", "version": 1, "data": []})
+        await wait_for(lambda: all(ws.frames for ws in sockets))
+        assert sockets[1].frames[0] == '{"type":"data","channel":"news:HOME:headline","version":1,"data":[],"epoch":1}'
+
+        # A key that expired and was taken over is not renewed by its old holder
+        await clients[0].set(backplanes[0].leader_key, "node-1")
+        assert not await backplanes[0].elect()
+        assert await clients[0].get(backplanes[0].leader_key) == b"node-1"
+
+        # When the leader goes away another process takes over, in a new epoch
+        await clients[0].delete(backplanes[0].leader_key)
+        await managers[0].close_backplane()
+        assert await backplanes[1].elect() and backplanes[1].epoch == 2
+    finally:
+        for manager in managers:
+            await manager.close_backplane()
+
+
+@scenario
+async def test_leader_refreshes_channels_only_followers_watch():
+    clients = stand_in_clients(2)
+    follower = ConnectionManager()
+    await main.manager.use_backplane(RedisBackplane(client=clients[0], node_id="leader"))
+    await follower.use_backplane(RedisBackplane(client=clients[1], node_id="follower"))
+    websocket = RecordingWebSocket()
+    follower.subscribe(websocket, SPORTS)
+    await follower.backplane.advertise()
+
+    scrubbed = []
+
+    async def scrub_channel(channel: str) -> bool:
+        scrubbed.append(channel)
+        return False
+
+    clock = Clock()
+    original = main.scheduler.clock, main.scrub_channel
+    main.scheduler.clock, main.scrub_channel = clock, scrub_channel
+    try:
+        # Nobody subscribes to SPORTS in the leader's process
+        assert main.manager.is_leader and not main.manager.active_connections
+        assert await main.manager.all_subscriber_counts() == {SPORTS: 1}
+        await main.run_scrub_cycle()  # First due one interval after it is seen
+        clock.now += 3600
+        await main.run_scrub_cycle()
+        assert scrubbed == [SPORTS]
+
+        # Once the follower's client leaves, the leader stops counting the channel
+        follower.unsubscribe(websocket, SPORTS)
+        await follower.backplane.advertise()
+        assert await main.manager.all_subscriber_counts() == {}
+    finally:
+        main.scheduler.clock, main.scrub_channel = original
+        await follower.close_backplane()
+        await main.manager.close_backplane()
+
+
+@scenario
+async def test_follower_asks_the_leader_for_a_cold_channel():
+    clients = stand_in_clients(2)
+    leader = ConnectionManager()
+
+    async def answer(channel: str):
+        await leader.broadcast(channel, {"type": "snapshot", "version": 7}, headlines("leader-story"))
+
+    leader.on_scrape_request = answer
+    await leader.use_backplane(RedisBackplane(client=clients[0], node_id="leader"))
+    await main.manager.use_backplane(RedisBackplane(client=clients[1], node_id="follower"))
+    watcher = RecordingWebSocket()
+    leader.subscribe(watcher, SPORTS)
+
+    scraped = []
+
+    async def get_channel_data(channel: str, refresh: bool = False):
+        scraped.append(channel)
+        return headlines("local-story")
+
+    original = main.get_channel_data
+    main.get_channel_data = get_channel_data
+    restore = configured(LEADER_REQUEST_TIMEOUT=0.2)
+    try:
+        assert not main.manager.is_leader
+        # The leader scrapes and publishes the snapshot; the follower never scrapes
+        assert await main.initial_data(SPORTS) == headlines("leader-story")
+        assert scraped == [] and main.snapshots.version(SPORTS) == 7
+        # The reply is only for mirroring: the leader's own subscribers are not sent it
+        await leader.flush()
+        assert watcher.frames == []
+
+        # With no answer in time, the follower falls back to scraping
+        leader.on_scrape_request = None
+        assert await main.initial_data(POLITICS) == headlines("local-story")
+        assert scraped == [POLITICS]
+    finally:
+        restore()
+        main.get_channel_data = original
+        main.snapshots.discard(SPORTS)
+        leader.disconnect(watcher)
+        await leader.close_backplane()
+        await main.manager.close_backplane()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Backplane fan-out and leader election work")
@@ -0,0 +1,128 @@
+import asyncio
+
+from browser import BrowserPool
+from testing import configured, run_tests, scenario
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    def on(self, event, handler):
+        pass
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        if url.endswith("/crash"):
+            self.closed = True
+            raise RuntimeError("Target crashed")
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+    async def content(self) -> str:
+        if self.closed:
+            raise RuntimeError("Target closed")
+        return "<html></html>"
+
+    async def evaluate(self, script):
+        return 0
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_context(self, user_agent=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Browser has been closed")
+        return FakeContext()
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+
+def fake_pool(size: int, browsers: list) -> BrowserPool:
+    """A pool whose start() launches the next of `browsers` instead of Chromium."""
+    pool = BrowserPool(size)
+    launched = iter(browsers)
+
+    async def start():
+        await pool._close_browser()
+        pool._browser = next(launched)
+
+    pool.start = start
+    return pool
+
+
+@scenario
+async def test_failures_hand_the_slot_back():
+    pool = fake_pool(1, [FakeBrowser(failures=1)])
+    try:
+        await pool.fetch("https://3news.com/a")
+        assert False, "the first page could not be opened"
+    except RuntimeError:
+        pass
+    # The slot came back empty, so the next fetch opens a page instead of waiting forever
+    assert await asyncio.wait_for(pool.fetch("https://3news.com/a"), 1) == "<html></html>"
+    assert pool._pages.qsize() == 1
+
+
+@scenario
+async def test_crashed_pages_and_browsers_are_replaced():
+    first, second = FakeBrowser(), FakeBrowser()
+    pool = fake_pool(2, [first, second])
+    waiters = [pool.fetch("https://3news.com/crash"), pool.fetch("https://3news.com/crash"), pool.fetch("https://3news.com/a")]
+    results = await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 1)
+    assert isinstance(results[0], RuntimeError) and results[2] == "<html></html>"
+    assert pool._pages.qsize() == 2
+
+    # The browser went away: it is closed before a new one is launched
+    first.connected = False
+    assert await asyncio.wait_for(pool.fetch("https://3news.com/a"), 1) == "<html></html>"
+    assert first.closed and pool._browser is second
+
+
+@scenario
+async def test_waiting_for_a_page_times_out():
+    restore = configured(BROWSER_ACQUIRE_TIMEOUT=0.05)
+    try:
+        pool = fake_pool(1, [FakeBrowser()])
+        held = await pool._acquire()
+        try:
+            await pool.fetch("https://3news.com/a")
+            assert False, "no page was free"
+        except TimeoutError:
+            pass
+        await pool._release(held)
+        assert await pool.fetch("https://3news.com/a") == "<html></html>"
+    finally:
+        restore()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Browser pool slots survive failed pages, crashes and relaunches")
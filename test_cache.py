@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+
+from cache import ScrapeCache
+from testing import run_tests, scenario
+
+
+def counting_loader(value, release: asyncio.Event = None):
+    """A loader returning `value`, after `release` is set if given; `calls` counts its runs."""
+    async def load():
+        load.calls += 1
+        if release is not None:
+            await release.wait()
+        return value
+    load.calls = 0
+    return load
+
+
+@scenario
+async def test_concurrent_misses_share_one_load():
+    cache = ScrapeCache()
+    release = asyncio.Event()
+    load = counting_loader(["a"], release)
+    waiters = [asyncio.create_task(cache.get("headline:HOME", load, ttl=60)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == [["a"]] * 5
+    assert load.calls == 1 and cache.misses == 5 and cache.coalesced == 4
+    # Fresh from here on: served without loading again
+    assert await cache.get("headline:HOME", load, ttl=60) == ["a"] and load.calls == 1
+
+
+@scenario
+async def test_stale_entries_are_served_while_they_refresh():
+    cache = ScrapeCache()
+    cache.set("headline:HOME", ["old"], age=120)
+    release = asyncio.Event()
+    load = counting_loader(["new"], release)
+    # The stale value comes back at once; the refresh runs behind it
+    assert await cache.get("headline:HOME", load, ttl=60) == ["old"]
+    assert await cache.get("headline:HOME", load, ttl=60) == ["old"]
+    await asyncio.sleep(0)
+    assert load.calls == 1 and cache.stale_hits == 2
+    release.set()
+    await asyncio.sleep(0)
+    assert cache.peek("headline:HOME") == ["new"]
+    assert await cache.get("headline:HOME", load, ttl=60) == ["new"] and cache.hits == 1
+
+
+@scenario
+async def test_failed_loads_keep_the_last_good_value():
+    cache = ScrapeCache()
+    cache.set("headline:HOME", ["good"], age=120)
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    with unittest.TestCase().assertLogs("cache", "ERROR") as logs:
+        assert await cache.refresh("headline:HOME", fail) == ["good"]
+    assert "Error loading headline:HOME" in logs.output[0] and "upstream down" in logs.output[0]
+    assert cache.peek("headline:HOME") == ["good"]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Scrape cache loads once, serves stale entries and survives failed loads")
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import main
+from cache import scrape_cache
+from models import Headline
+from testing import RecordingWebSocket, run_tests, scenario
+
+HOME = "news:HOME:headline"
+POLITICS = "news:POLITICS:headline"
+
+
+def headlines(slug: str) -> list:
+    return [Headline(topic=slug.title(), images=[], categories=["News"], isLatest=True,
+                     url=f"https://3news.com/news/{slug}", route=f"/news/{slug}")]
+
+
+async def connected() -> RecordingWebSocket:
+    """A multiplexed client, with HOME and POLITICS fresh in the cache so subscribing never scrapes."""
+    scrape_cache.set("headline:HOME", headlines("home-story"))
+    scrape_cache.set("headline:POLITICS", headlines("politics-story"))
+    websocket = RecordingWebSocket()
+    await main.manager.connect(websocket)
+    return websocket
+
+
+async def send(websocket: RecordingWebSocket, command) -> list:
+    """Send one command, as JSON unless it is already text; returns the frames it produced."""
+    before = len(websocket.frames)
+    tasks = set()
+    await main.handle_command(websocket, command if isinstance(command, str) else json.dumps(command), tasks)
+    await asyncio.gather(*tasks)
+    await main.manager.flush()
+    return websocket.frames[before:]
+
+
+def data(frames: list) -> dict:
+    """The data frames among `frames`, by channel."""
+    return {frame["channel"]: frame for frame in frames if frame["type"] == "data"}
+
+
+@scenario
+async def test_subscribe_and_unsubscribe():
+    websocket = await connected()
+    try:
+        frames = await send(websocket, {"action": "subscribe", "channels": [HOME, POLITICS]})
+        received = data(frames)
+        assert set(received) == {HOME, POLITICS}
+        assert received[HOME]["data"][0]["url"] == "https://3news.com/news/home-story"
+        # Each subscription goes through loading, fetching and ready, as on its own socket
+        home = [f["data"]["status"] if f["type"] == "status" else f["type"] for f in frames if f["channel"] == HOME]
+        assert home == ["loading", "fetching", "data", "ready"]
+        assert main.manager.subscriptions[websocket] == {HOME, POLITICS}
+
+        # Subscribing again is a no-op: no second snapshot
+        assert await send(websocket, {"action": "subscribe", "channel": HOME}) == []
+
+        [confirmation] = await send(websocket, {"action": "unsubscribe", "channel": HOME})
+        assert confirmation["type"] == "status" and confirmation["channel"] == HOME
+        assert confirmation["data"]["status"] == "unsubscribed"
+        assert main.manager.subscriptions[websocket] == {POLITICS} and websocket not in main.manager.active_connections.get(HOME, ())
+    finally:
+        main.manager.disconnect(websocket)
+
+
+@scenario
+async def test_resume_from_a_version():
+    first = await connected()
+    current = data(await send(first, {"action": "subscribe", "channel": HOME}))[HOME]["version"]
+
+    # Already current: only the ready status
+    resumed = await connected()
+    frames = await send(resumed, {"action": "subscribe", "channel": HOME, "since": current})
+    assert [f["type"] for f in frames] == ["status", "status", "status"] and frames[-1]["data"]["status"] == "ready"
+
+    # A version the server never issued gets the full snapshot
+    behind = await connected()
+    caught_up = data(await send(behind, {"action": "subscribe", "channel": HOME, "since": current + 1000}))[HOME]
+    assert caught_up["version"] == current and caught_up["data"][0]["url"] == "https://3news.com/news/home-story"
+    for websocket in (first, resumed, behind):
+        main.manager.disconnect(websocket)
+
+
+@scenario
+async def test_bad_commands_get_errors():
+    websocket = await connected()
+    try:
+        for malformed in ("not json", '["subscribe"]', '{"action": "subscribe"}', '{"action": "subscribe", "channels": 5}',
+                          '{"action": "subscribe", "channels": "news:liveTV"}'):
+            [error] = await send(websocket, malformed)
+            assert error == {"type": "error", "error": "Invalid command"}, malformed
+
+        errors = await send(websocket, {"action": "subscribe", "channels": ["news:HOME:weather", 7, "news:search:"]})
+        assert [e["error"] for e in errors] == [
+            "Unknown channel: news:HOME:weather", "Unknown channel: 7", "Unknown channel: news:search:",
+        ]
+        assert all("channel" not in e for e in errors)
+        # Not a channel name at all: an error, not a dropped connection
+        [error] = await send(websocket, {"action": "unsubscribe", "channel": ["news:liveTV"]})
+        assert error["error"] == "Unknown channel: ['news:liveTV']"
+
+        [error] = await send(websocket, {"action": "dance", "channel": HOME})
+        assert error["error"] == "Unknown action: dance"
+        assert main.manager.subscriptions[websocket] == set()
+
+        # Keep-alive commands still work on the same socket
+        assert await send(websocket, {"action": "ping"}) == [{"type": "pong"}]
+        assert await send(websocket, {"action": "pong"}) == []
+        assert main.manager.presence[websocket].answers_pings
+    finally:
+        main.manager.disconnect(websocket)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Clients subscribe, resume and get errors through commands")
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+import main
+from cache import article_cache, scrape_cache
+from channels import get_channel_data
+from durable import ARTICLE, CHANNEL, DurableStore
+from models import ArticleDetail, Headline
+from snapshots import snapshots
+from testing import configured, run_tests, scenario
+
+HOME = "news:HOME:headline"
+ARTICLE_URL = "https://3news.com/news/politics/saved-article"
+HEADLINES = [
+    {"topic": "Saved headline", "images": [], "categories": ["News"], "isLatest": True,
+     "url": "https://3news.com/news/news/saved-headline", "route": "/news/news/saved-headline"},
+]
+DETAIL = {"topic": "Saved article", "images": [], "categories": ["Politics"], "descriptions": ["Text"], "url": ARTICLE_URL}
+
+
+@scenario
+async def test_saved_snapshots_serve_the_first_client():
+    path = os.path.join(tempfile.mkdtemp(), "snapshots.db")
+    store = DurableStore(path, flush_interval=0.01)
+    store.open()
+    store.save(HOME, CHANNEL, HEADLINES, 7)
+    store.save(f"article:{ARTICLE_URL}", ARTICLE, DETAIL)
+    await store.stop()
+
+    # A fresh process: nothing in memory until the store is read
+    scrape_cache.clear()
+    article_cache.clear()
+    main.durable = DurableStore(path)
+    main.durable.open()
+    try:
+        main.restore_snapshots()
+        assert snapshots.version(HOME) == 7
+
+        misses = scrape_cache.misses
+        assert await get_channel_data(HOME) == [Headline(**HEADLINES[0])]
+        # Served from the restored entry, without a scrape
+        assert scrape_cache.misses == misses
+        assert isinstance(article_cache.peek(f"article:{ARTICLE_URL}"), ArticleDetail)
+
+        # Changes from here on are saved again
+        snapshots.update(HOME, HEADLINES + [{**HEADLINES[0], "url": "https://3news.com/news/news/new", "route": "/news/news/new"}])
+        await main.durable.flush()
+        assert {s.key: s.version for s in main.durable.load()}[HOME] == snapshots.version(HOME) > 7
+    finally:
+        snapshots.on_change = None
+        article_cache.on_set = None
+        await main.durable.stop()
+
+
+@scenario
+async def test_retention_drops_old_and_excess_entries():
+    path = os.path.join(tempfile.mkdtemp(), "snapshots.db")
+    store = DurableStore(path, max_bytes=250, max_age=3600)
+    store.open()
+    for i in range(5):
+        store.save(f"article:{i}", ARTICLE, {"text": "x" * 100})
+        await store.flush()
+    # Only the two newest fit in 250 bytes
+    assert [s.key for s in store.load()] == ["article:3", "article:4"]
+
+    db = sqlite3.connect(path)
+    db.execute("UPDATE snapshots SET saved_at = ? WHERE key = 'article:3'", (time.time() - 7200,))
+    db.commit()
+    db.close()
+    assert [s.key for s in store.load()] == ["article:4"]
+    store.save("article:5", ARTICLE, {"text": "y"})
+    await store.flush()
+    assert store.pruned == 4
+    await store.stop()
+
+
+@scenario
+async def test_shutdown_saves_despite_a_hung_step():
+    path = os.path.join(tempfile.mkdtemp(), "snapshots.db")
+    original = main.durable, main.browser_pool.stop, main.manager.close_backplane
+    closed = []
+
+    async def hang():
+        await asyncio.Event().wait()
+
+    async def close_backplane():
+        closed.append("backplane")
+
+    main.durable = DurableStore(path)
+    main.durable.open()
+    main.browser_pool.stop, main.manager.close_backplane = hang, close_backplane
+    restore = configured(SHUTDOWN_STEP_TIMEOUT=0.05)
+    try:
+        main.durable.save(HOME, CHANNEL, HEADLINES, 3)
+        await main.shutdown_event()
+        # The browser never stopped, yet the save was written and the later steps ran
+        assert closed == ["backplane"]
+        reopened = DurableStore(path)
+        reopened.open()
+        assert [s.key for s in reopened.load()] == [HOME]
+        await reopened.stop()
+    finally:
+        main.durable, main.browser_pool.stop, main.manager.close_backplane = original
+        restore()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Snapshots survive a restart and are pruned by size and age")
@@ -0,0 +1,70 @@
+import json
+
+from bench_broadcast import sample_message
+from encoding import compact, encode, expand, msgpack
+from manager import ConnectionManager
+from testing import RecordingWebSocket, run_tests, scenario
+
+CHANNEL = "news:HOME:headline"
+
+
+def test_compact_round_trips():
+    message = sample_message()
+    message["data"][1]["categories"] = ["Politics", "Elections"]
+    message["data"][2]["route"] = "/elsewhere"  # Not derivable from the url, so it is kept
+    packed = compact(message)
+    assert packed["categories"] == ["Politics", "Elections"]
+    assert packed["data"][1]["categories"] == [0, 1]
+    assert "route" not in packed["data"][0] and packed["data"][2]["route"] == "/elsewhere"
+    assert expand(json.loads(encode(message, "compact"))) == message
+    assert len(encode(message, "compact")) < len(encode(message))
+
+    delta = {"type": "delta", "version": 2, "base": 1, "added": message["data"][:2], "removed": ["x"], "updated": []}
+    assert expand(compact(delta)) == delta
+    # Without any category names the routes still come back
+    uncategorised = {"type": "data", "version": 3, "data": [{**item, "categories": []} for item in message["data"]]}
+    assert expand(json.loads(encode(uncategorised, "compact"))) == uncategorised
+    # Messages without headline lists are left alone
+    detail = {"type": "data", "version": 1, "data": {"topic": "t", "categories": ["Politics"], "url": "u"}}
+    assert compact(detail) == detail
+
+
+@scenario
+async def test_each_format_is_encoded_once():
+    manager = ConnectionManager()
+    clients = {
+        encoding: [RecordingWebSocket(raw=True), RecordingWebSocket(raw=True)]
+        for encoding in ("json", "compact", "msgpack")
+        if encoding != "msgpack" or msgpack is not None
+    }
+    for encoding, sockets in clients.items():
+        for websocket in sockets:
+            await manager.connect(websocket, CHANNEL, encoding=encoding)
+    message = {**sample_message(), "version": 1}
+    await manager.broadcast(CHANNEL, message, message["data"])
+    await manager.flush()
+
+    for sockets in clients.values():
+        # The same frame object went to both clients of a format
+        assert sockets[0].frames[0] is sockets[1].frames[0]
+    tagged = {"type": "data", "channel": CHANNEL, **message}
+    assert json.loads(clients["json"][0].frames[0]) == tagged
+    assert expand(json.loads(clients["compact"][0].frames[0])) == tagged
+    if msgpack is None:
+        print("msgpack not installed, skipping MessagePack frames")
+        return
+    assert msgpack.unpackb(clients["msgpack"][0].frames[0]) == tagged
+
+
+@scenario
+async def test_unknown_encoding_falls_back_to_json():
+    manager = ConnectionManager()
+    websocket = RecordingWebSocket(raw=True)
+    await manager.connect(websocket, CHANNEL, encoding="xml")
+    await manager.send_status(websocket, "ready", "Data loaded", CHANNEL)
+    await manager.flush()
+    assert json.loads(websocket.frames[0])["data"]["status"] == "ready"
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Wire encodings round-trip and are encoded once per broadcast")
@@ -0,0 +1,58 @@
+import os
+
+from extraction import ListSpec, Matcher, matchers
+from parsing import css, make_soup
+from testing import run_tests
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SELECTORS = [
+    "h2 a", ".entry-title a", "a.post-title", "a[href*='/news/']", ".entry-meta .cat-links a",
+    "div.shrink-0", "a.block", "img", "a[href^='https']", "a[href$='/']", "div[class='p-4 space-y-4'] h4",
+]
+
+
+def test_matcher_agrees_with_soupsieve():
+    with open(os.path.join(FIXTURES, "home.html")) as f:
+        soup = make_soup(f.read())
+    elements = list(soup.find_all(True))
+    for selector in SELECTORS:
+        matcher = Matcher(selector)
+        assert matcher.compounds is not None, f"{selector} should not need soupsieve"
+        for el in elements:
+            ancestors = lambda: el.parents
+            assert matcher.match(el, ancestors) == bool(matcher.selector.match(el)), f"{selector} on <{el.name}>"
+
+
+PAGE = """
+<ul class="briefs">
+  <li><span class="n">1</span><a class="t" href="/news/a">First <b>brief</b></a><img data-src="/a.jpg"><img src="/a.jpg"></li>
+  <li><span class="n">x</span><a class="t" href="/news/b">Not numbered</a></li>
+  <li><span class="n">3</span><a class="t" href="https://elsewhere.com/c">Third</a><i class="tag">World</i><i class="tag">Africa</i></li>
+</ul>
+"""
+
+
+def test_new_section_is_a_spec():
+    briefs = ListSpec(
+        container=(css("ul.briefs"),),
+        items=(css("li"),),
+        numbered=Matcher("span.n"),
+        title=matchers("a.t"),
+        categories=matchers("i.tag"),
+        fixed_categories=("Briefs",),
+        image_attrs=("data-src", "src"),
+        base_url="https://3news.com",
+        route=lambda link: link.replace("https://3news.com", ""),
+    )
+    items = briefs(make_soup(PAGE), "https://3news.com/briefs")
+    assert items == [
+        {"topic": "Firstbrief", "images": ["https://3news.com/a.jpg"], "categories": ["Briefs"],
+         "isLatest": True, "url": "https://3news.com/news/a", "route": "/news/a"},
+        {"topic": "Third", "images": [], "categories": ["World", "Africa"],
+         "isLatest": False, "url": "https://elsewhere.com/c", "route": "https://elsewhere.com/c"},
+    ]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "The extraction engine matches like soupsieve and reads new sections from a spec")
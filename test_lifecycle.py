@@ -0,0 +1,94 @@
+import asyncio
+
+from manager import ConnectionManager
+from testing import RecordingWebSocket, configured, run_tests, scenario
+
+CHANNEL = "news:HOME:headline"
+
+
+@scenario
+async def test_limits_refuse_the_handshake():
+    restore = configured(MAX_CONNECTIONS_PER_ADDRESS=2, MAX_SUBSCRIBERS_PER_CHANNEL=2)
+    try:
+        manager = ConnectionManager()
+        first, second, third = (RecordingWebSocket() for _ in range(3))
+        assert await manager.connect(first, CHANNEL)
+        assert await manager.connect(second, CHANNEL)
+        assert not await manager.connect(third)
+        # Refused before accept; uvicorn turns this into an HTTP 403 on the upgrade
+        assert not third.accepted and third.close_code == 1013
+
+        # Another address is under its own limit, but the channel is full
+        elsewhere = RecordingWebSocket("10.0.0.2")
+        assert not await manager.connect(elsewhere, CHANNEL)
+        assert await manager.connect(elsewhere)
+        assert not manager.subscribe(elsewhere, CHANNEL)
+        assert manager.subscribe(elsewhere, "news:liveTV")
+
+        manager.disconnect(first)
+        assert manager.subscribe(elsewhere, CHANNEL)
+        assert await manager.connect(third)
+        assert manager.connection_counters["rejected_address_limit"] == 1
+        assert manager.connection_counters["rejected_channel_limit"] == 2
+    finally:
+        restore()
+
+
+@scenario
+async def test_disconnect_is_idempotent():
+    manager = ConnectionManager()
+    websocket = RecordingWebSocket()
+    await manager.connect(websocket, CHANNEL)
+    manager.subscribe(websocket, "news:liveTV")
+    # The channel first, as a failed send would, then the whole socket, twice
+    manager.disconnect(websocket, CHANNEL)
+    manager.disconnect(websocket)
+    manager.disconnect(websocket)
+    manager.unsubscribe(websocket, CHANNEL)
+    assert manager.active_connections == {} and manager.subscriptions == {}
+    assert manager.outboxes == {} and manager.presence == {} and not manager.per_address
+    assert manager.connection_counters["opened"] == 1 and manager.connection_counters["closed"] == 1
+
+
+@scenario
+async def test_silent_and_idle_clients_are_reaped():
+    restore = configured(HEARTBEAT_INTERVAL=20, HEARTBEAT_TIMEOUT=20, IDLE_TIMEOUT=300)
+    try:
+        manager = ConnectionManager()
+        legacy, answering, silent, idle = (RecordingWebSocket() for _ in range(4))
+        for websocket in (legacy, answering, silent):
+            await manager.connect(websocket, CHANNEL)
+        await manager.connect(idle)
+        start = manager.presence[legacy].last_seen
+        manager.seen(answering, pong=True)
+        manager.seen(silent, pong=True)
+        manager.presence[answering].last_seen = start + 30
+
+        # Clients that never answer pings are left to the protocol-level ping
+        assert manager.reap(start + 45) == 1
+        assert silent not in manager.subscriptions and silent.close_code is None
+        manager.presence[answering].last_seen = start + 290
+        assert manager.reap(start + 301) == 1
+        assert idle not in manager.subscriptions
+        assert set(manager.subscriptions) == {legacy, answering}
+        assert manager.queue_counters["missed_heartbeat"] == 1 and manager.queue_counters["idle"] == 1
+        await asyncio.sleep(0)
+        assert silent.close_code == 1000
+    finally:
+        restore()
+
+
+@scenario
+async def test_pings_reach_every_client():
+    manager = ConnectionManager()
+    websocket = RecordingWebSocket()
+    await manager.connect(websocket, CHANNEL)
+    heartbeat = asyncio.create_task(manager.heartbeat(0.01))
+    await asyncio.sleep(0.05)
+    heartbeat.cancel()
+    await manager.flush()
+    assert websocket.frames and all(frame["type"] == "ping" for frame in websocket.frames)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Connections are limited, reaped and accounted for")
@@ -0,0 +1,38 @@
+from metrics import Counter, Histogram, Registry
+from testing import run_tests
+
+
+def test_metrics_render_in_prometheus_text_format():
+    registry = Registry()
+    fetch = registry.register(Histogram("fetch_seconds", "Fetch time.", ["tier"], buckets=(0.1, 1.0)))
+    sends = registry.register(Counter("sends_total", "Sends.", ["result"]))
+    fetch.observe(0.05, tier="http")
+    fetch.observe(0.5, tier="http")
+    fetch.observe(5, tier="browser")
+    sends.inc(3, result="ok")
+    registry.collected("connections", "Open connections.", lambda: [({}, 2)])
+
+    assert registry.render() == "\n".join([
+        "# HELP fetch_seconds Fetch time.",
+        "# TYPE fetch_seconds histogram",
+        'fetch_seconds_bucket{tier="http",le="0.1"} 1',
+        'fetch_seconds_bucket{tier="http",le="1"} 2',
+        'fetch_seconds_bucket{tier="http",le="+Inf"} 2',
+        'fetch_seconds_sum{tier="http"} 0.55',
+        'fetch_seconds_count{tier="http"} 2',
+        'fetch_seconds_bucket{tier="browser",le="0.1"} 0',
+        'fetch_seconds_bucket{tier="browser",le="1"} 0',
+        'fetch_seconds_bucket{tier="browser",le="+Inf"} 1',
+        'fetch_seconds_sum{tier="browser"} 5',
+        'fetch_seconds_count{tier="browser"} 1',
+        "# HELP sends_total Sends.",
+        "# TYPE sends_total counter",
+        'sends_total{result="ok"} 3',
+        "# HELP connections Open connections.",
+        "# TYPE connections gauge",
+        "connections 2",
+    ]) + "\n"
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Metrics render in the Prometheus text format")
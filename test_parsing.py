@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import unittest
+
+import config
+import parsing
+import scraper
+from fetcher import HttpPage, fetcher
+from testing import run_tests
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+with open(os.path.join(FIXTURES, "pages.json")) as f:
+    PAGES = json.load(f)
+
+with open(os.path.join(FIXTURES, "expected.json")) as f:
+    EXPECTED = json.load(f)
+
+
+async def fetch_fixture(url: str, etag=None, last_modified=None) -> HttpPage:
+    """Serve a fixture page, tagged with its file name so conditional requests get a 304."""
+    tag = f'"{PAGES[url]}"'
+    if etag == tag:
+        return HttpPage(None, tag)
+    with open(os.path.join(FIXTURES, PAGES[url])) as f:
+        return HttpPage(f.read(), tag)
+
+
+async def fetch_fixture_untagged(url: str, etag=None, last_modified=None) -> HttpPage:
+    return (await fetch_fixture(url))._replace(etag=None)
+
+
+def normalize(result):
+    """Images (and article categories) are de-duplicated through a set, so compare them unordered."""
+    if result is None:
+        return None
+    items = result if isinstance(result, list) else [result]
+    dumped = [item.model_dump() for item in items]
+    for item in dumped:
+        if "images" in item:
+            item["images"] = sorted(item["images"])
+        if "descriptions" in item:
+            item["categories"] = sorted(item["categories"])
+    return dumped if isinstance(result, list) else dumped[0]
+
+
+async def scrape_fixtures() -> dict:
+    scraper._recent.clear()
+    results = {
+        "headlines:HOME": await scraper.scrub_headlines("HOME"),
+        "headlines:POLITICS": await scraper.scrub_headlines("POLITICS"),
+        "headlines:ELECTIONS": await scraper.scrub_headlines("ELECTIONS"),
+        "popular": await scraper.scrub_popular(),
+        "cartoons": await scraper.scrub_cartoons(),
+        "live": await scraper.scrub_live_tv(),
+    }
+    for n, section in enumerate(["politics", "sports", "business"], 1):
+        results[f"article:{n}"] = await scraper.scrub_article_detail(f"{scraper.BASE_URL}/news/{section}/fixture-article-{n}")
+    return {key: normalize(value) for key, value in results.items()}
+
+
+def check_parser(parser: str, executor: str = "inline"):
+    original = parsing.PARSER, config.PARSE_EXECUTOR, fetcher.fetch_http
+    parsing.PARSER, config.PARSE_EXECUTOR, fetcher.fetch_http = parser, executor, fetch_fixture
+    fetcher.seen.clear()
+    try:
+        results = asyncio.run(scrape_fixtures())
+    finally:
+        parsing.stop_executor()
+        parsing.PARSER, config.PARSE_EXECUTOR, fetcher.fetch_http = original
+    for key, expected in EXPECTED.items():
+        assert results[key] == expected, f"{parser}: {key} differs from the recorded output"
+
+
+def test_unchanged_pages_are_not_parsed_again():
+    parses = []
+
+    async def counting_parser(func, *args):
+        parses.append(args[2])
+        return func(*args)
+
+    original = config.PARSE_EXECUTOR, fetcher.fetch_http, scraper.run_parser
+    config.PARSE_EXECUTOR, fetcher.fetch_http, scraper.run_parser = "inline", fetch_fixture, counting_parser
+    fetcher.seen.clear()
+    try:
+        first = asyncio.run(scrape_fixtures())
+        assert parses and fetcher.not_modified == 0
+        parses.clear()
+
+        # Validators from the first round turn every refetch into a 304
+        assert asyncio.run(scrape_fixtures()) == first
+        assert parses == [] and fetcher.not_modified == len(PAGES)
+
+        # Without validators the content hash catches the unchanged pages
+        fetcher.fetch_http = fetch_fixture_untagged
+        assert asyncio.run(scrape_fixtures()) == first
+        assert parses == [] and fetcher.unchanged == len(PAGES)
+    finally:
+        config.PARSE_EXECUTOR, fetcher.fetch_http, scraper.run_parser = original
+        fetcher.seen.clear()
+
+
+def test_html_parser_matches_recorded_output():
+    check_parser("html.parser")
+
+
+def test_lxml_matches_recorded_output():
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        raise unittest.SkipTest("lxml not installed")
+    check_parser("lxml")
+
+
+def test_process_pool_matches_recorded_output():
+    check_parser(parsing.PARSER, executor="process")
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "All fixture pages parse to the recorded output")
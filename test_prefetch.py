@@ -0,0 +1,48 @@
+import asyncio
+
+from cache import ScrapeCache
+from prefetch import Prefetcher, article_key
+from testing import run_tests, scenario
+
+
+@scenario
+async def test_prefetcher_warms_cache_in_priority_order():
+    cache = ScrapeCache(max_entries=2, name="test article cache")
+    loaded = []
+
+    async def load(url: str):
+        loaded.append(url)
+        return {"url": url}
+
+    prefetcher = Prefetcher(cache, load, concurrency=1, interval=0, max_queued=3)
+    prefetcher.offer("https://3news.com/news/a")
+    prefetcher.offer("https://3news.com/news/b", urgent=True)
+    prefetcher.offer("https://3news.com/news/a")  # already queued
+    prefetcher.offer("https://3news.com/news/c")
+    prefetcher.offer("https://3news.com/news/d")  # queue is full
+    assert prefetcher.dropped == 1
+
+    prefetcher.start()
+    try:
+        while prefetcher.fetched < 3:
+            await asyncio.sleep(0.01)
+    finally:
+        await prefetcher.stop()
+
+    # Latest/Popular items go first, then in the order they were seen
+    assert loaded == ["https://3news.com/news/b", "https://3news.com/news/a", "https://3news.com/news/c"]
+    # The two-entry cache pushed out b before anyone opened it
+    assert prefetcher.wasted == 1
+
+    key = article_key("https://3news.com/news/c")
+    prefetcher.opened(key)
+    assert await cache.get(key, load, ttl=60) == {"url": "https://3news.com/news/c"}
+    assert prefetcher.used == 1 and cache.hits == 1
+
+    # Cached articles are not queued again
+    prefetcher.offer("https://3news.com/news/c")
+    assert prefetcher.stats()["queued"] == 0
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Prefetcher queues, loads and accounts for articles correctly")
@@ -0,0 +1,56 @@
+import httpx
+
+import main
+from cache import scrape_cache
+from models import Headline
+from rest import not_modified
+from testing import run_tests, scenario
+
+HEADLINES = [
+    Headline(topic="Cached headline", images=[], categories=["News"], isLatest=True,
+             url="https://3news.com/news/news/cached-headline", route="/news/news/cached-headline"),
+]
+
+
+@scenario
+async def test_snapshots_are_served_with_validators():
+    scrape_cache.clear()
+    scrape_cache.set("headline:POLITICS", HEADLINES, age=20)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/headlines/politics")
+        assert response.status_code == 200
+        assert response.json() == {"channel": "news:POLITICS:headline", "data": [HEADLINES[0].model_dump()]}
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and not etag.startswith("W/")
+        # Fresh for what is left of the headline TTL
+        directives = dict(d.strip().partition("=")[::2] for d in response.headers["cache-control"].split(","))
+        assert main.config.HEADLINE_TTL - 21 <= int(directives["max-age"]) <= main.config.HEADLINE_TTL - 20
+        assert "public" in directives and "stale-while-revalidate" in directives
+
+        built = main.representations.built
+        revalidated = await client.get("/headlines/POLITICS", headers={"If-None-Match": f'"other", W/{etag}'})
+        assert revalidated.status_code == 304 and revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+        # Unchanged data is not serialized again
+        assert main.representations.built == built
+
+        scrape_cache.set("headline:POLITICS", [HEADLINES[0].model_copy(update={"topic": "Updated headline"})])
+        changed = await client.get("/headlines/POLITICS", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+        assert changed.json()["data"][0]["topic"] == "Updated headline"
+
+        assert (await client.get("/headlines/weather")).status_code == 404
+
+
+def test_if_none_match():
+    assert not_modified('"a"', '"a"')
+    assert not_modified('W/"a"', '"a"')
+    assert not_modified('"b", "a"', '"a"')
+    assert not_modified("*", '"a"')
+    assert not not_modified('"b"', '"a"')
+    assert not not_modified(None, '"a"')
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "REST snapshots carry ETags and caching headers, and revalidate with 304s")
@@ -0,0 +1,84 @@
+import random
+
+from channels import CARTOONS_CHANNEL, LIVE_TV_CHANNEL, headline_channel
+from scheduler import Policy, RefreshScheduler
+from testing import Clock, run_tests
+
+HOME = headline_channel("HOME")
+OPINION = headline_channel("OPINION")
+
+
+def make_scheduler(jitter: float = 0.0):
+    clock = Clock()
+    scheduler = RefreshScheduler(
+        headline=Policy(30, 900, 300, jitter),
+        live=Policy(120, 1800, 300, jitter),
+        clock=clock,
+        rng=random.Random(0),
+    )
+    return scheduler, clock
+
+
+def run(scheduler, clock, subscribers, changes, until: float):
+    """Advance the clock second by second, refreshing whatever is due; returns refresh times per channel."""
+    refreshed = {channel: [] for channel in subscribers}
+    while clock.now < until:
+        for channel in scheduler.due(subscribers):
+            refreshed[channel].append(clock.now)
+            scheduler.record(channel, changes(channel), subscribers[channel])
+        clock.now += 1
+    return refreshed
+
+
+def test_busy_channels_speed_up_and_quiet_ones_slow_down():
+    scheduler, clock = make_scheduler()
+    subscribers = {HOME: 1, OPINION: 1}
+    refreshed = run(scheduler, clock, subscribers, lambda channel: channel == HOME, until=3600)
+    assert scheduler.interval(HOME) == 30
+    assert scheduler.interval(OPINION) == 900
+    assert len(refreshed[HOME]) > 100
+    assert len(refreshed[OPINION]) == 5  # at 300, 750, 1425, 2325 and 3225 s
+
+
+def test_subscribers_shorten_the_wait_within_bounds():
+    scheduler, clock = make_scheduler()
+    run(scheduler, clock, {HOME: 1, CARTOONS_CHANNEL: 100}, lambda channel: False, until=1)
+    clock.now = 299
+    assert scheduler.due({HOME: 1, CARTOONS_CHANNEL: 100}) == [CARTOONS_CHANNEL]  # due at 300 / 3 = 100 s
+    clock.now = 300
+    assert scheduler.due({HOME: 1, CARTOONS_CHANNEL: 100}) == [HOME]
+
+
+def test_live_tv_has_its_own_policy():
+    scheduler, clock = make_scheduler()
+    subscribers = {LIVE_TV_CHANNEL: 1, HOME: 1}
+    run(scheduler, clock, subscribers, lambda channel: True, until=3600)
+    assert scheduler.interval(LIVE_TV_CHANNEL) == 120
+    assert scheduler.interval(HOME) == 30
+
+
+def test_unsubscribed_and_unscheduled_channels_stay_idle():
+    scheduler, clock = make_scheduler()
+    article = "news:POLITICS:topic_detail:news/politics/some-article"
+    refreshed = run(scheduler, clock, {HOME: 0, article: 3}, lambda channel: True, until=3600)
+    assert refreshed == {HOME: [], article: []}
+    assert scheduler.sleep_time(tick=5) == 5
+
+    # Dropping a channel's last subscriber forgets its state
+    run(scheduler, clock, {HOME: 1}, lambda channel: True, until=clock.now + 1000)
+    assert scheduler.interval(HOME) is not None
+    scheduler.due({})
+    assert scheduler.interval(HOME) is None
+
+
+def test_jitter_spreads_refreshes_within_bounds():
+    scheduler, clock = make_scheduler(jitter=0.1)
+    channels = {headline_channel(cat): 1 for cat in ("NEWS", "SPORTS", "BUSINESS", "POLITICS")}
+    refreshed = run(scheduler, clock, channels, lambda channel: False, until=301)
+    first = [times[0] for times in refreshed.values() if times]
+    assert len(set(first)) > 1
+    assert all(270 <= t <= 330 for t in first)
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Refresh scheduler adapts to change rate and subscribers")
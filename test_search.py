@@ -0,0 +1,105 @@
+import asyncio
+
+import config
+
+config.SEARCH_PUSH_DELAY = 0
+
+import main
+from channels import get_channel_data, known, resolve
+from search import SearchIndex
+from testing import Clock, RecordingWebSocket, run_tests, scenario
+
+BASE = "https://3news.com/news"
+
+
+def headline(slug: str, topic: str, categories=("News",), latest=False) -> dict:
+    return {"topic": topic, "images": [], "categories": list(categories), "isLatest": latest,
+            "url": f"{BASE}/{slug}", "route": f"/news/{slug}"}
+
+
+def test_ranks_matches_of_every_term():
+    index = SearchIndex()
+    index.add_headlines([
+        headline("a", "Parliament approves budget"),
+        headline("b", "Budget debate stalls in parliament", categories=("Politics",)),
+        headline("c", "Black Stars win friendly", categories=("Sports",)),
+    ])
+    index.add_article({"topic": "Budget debate stalls in parliament", "images": ["i.jpg"], "categories": ["Politics"],
+                       "descriptions": ["The budget vote was delayed.", "Budget talks resume on Monday."],
+                       "url": f"{BASE}/b"})
+
+    assert [r["url"] for r in index.search("Budget")] == [f"{BASE}/b", f"{BASE}/a"]
+    # Every term must match; stopwords and case are ignored
+    assert [r["url"] for r in index.search("the PARLIAMENT approves")] == [f"{BASE}/a"]
+    assert index.search("budget football") == []
+    assert index.search("the") == []
+    # Body text is searchable, and the result keeps the headline's shape with the article's images
+    [result] = index.search("monday")
+    assert result == {**headline("b", "Budget debate stalls in parliament", categories=("Politics",)), "images": ["i.jpg"]}
+    assert index.search("budget", limit=1)[0]["url"] == f"{BASE}/b"
+
+    # An article with no headline yet is routed like one
+    index.add_article({"topic": "Cedi steadies", "images": [], "categories": ["Business"],
+                       "descriptions": ["The cedi held its ground."], "url": f"{BASE}/d"})
+    [result] = index.search("cedi")
+    assert result["route"] == "/news/d" and not result["isLatest"]
+
+
+def test_stays_within_its_limits():
+    clock = Clock()
+    index = SearchIndex(max_documents=2, max_age=60, clock=clock)
+    for i, name in enumerate(("alpha", "beta", "gamma")):
+        index.add_headlines([headline(f"s{i}", f"Flood in {name}")])
+    assert len(index) == 2 and f"{BASE}/s0" not in index
+    assert index.evicted == 1
+
+    # Seeing a story again keeps it; the other ages out
+    clock.now = 50
+    index.add_headlines([headline("s2", "Flood in gamma")])
+    clock.now = 100
+    index.add_headlines([headline("s3", "Flood in delta")])
+    assert [r["url"] for r in index.search("flood")] == [f"{BASE}/s3", f"{BASE}/s2"]
+    # Postings of dropped stories go with them
+    assert index.search("beta") == [] and index.stats()["terms"] == 4
+
+
+def test_reports_only_changed_stories():
+    index = SearchIndex()
+    index.add_headlines([headline("a", "Cedi falls"), headline("b", "Cedi rises")])
+    assert index.take_changed() == {f"{BASE}/a", f"{BASE}/b"}
+    index.add_headlines([headline("a", "Cedi falls"), headline("b", "Cedi rises sharply")])
+    assert index.take_changed() == {f"{BASE}/b"}
+    assert index.matches(f"{BASE}/b", "sharply cedi") and not index.matches(f"{BASE}/a", "sharply")
+
+
+@scenario
+async def test_subscribers_get_new_matches_live():
+    main.search_index.__init__()
+    channel = "news:search:flood warning"
+    assert known(channel) and resolve(channel) is None and not known("news:search:")
+    main.index_scrape("headline:HOME", [headline("a", "Flood warning for Accra")])
+    assert [r["url"] for r in await get_channel_data(channel)] == [f"{BASE}/a"]
+
+    websocket = RecordingWebSocket()
+    await main.manager.connect(websocket, channel, "final")
+    await main.push_initial(websocket, channel)
+    await main.manager.flush()
+    [first] = [f for f in websocket.frames if f["type"] == "data"]
+    assert len(first["data"]) == 1
+
+    # An unrelated story does not recompute the query; a matching one is pushed as a delta
+    main.index_scrape("headline:SPORTS", [headline("b", "Derby ends goalless")])
+    await asyncio.sleep(0.05)
+    main.index_scrape("headline:NEWS", [headline("c", "Second flood warning issued", latest=True)])
+    await asyncio.sleep(0.05)
+    await main.manager.flush()
+    delta = websocket.frames[-2]
+    assert delta["type"] == "delta" and delta["base"] == first["version"] and [a["url"] for a in delta["added"]] == [f"{BASE}/c"]
+    assert websocket.frames[-1]["data"]["message"] == "New results"
+    main.manager.disconnect(websocket)
+    # The query's results are not kept once its last subscriber is gone
+    assert main.snapshots.version(channel) == 0 and channel not in main.manager.active_connections
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Search ranks scraped stories and pushes new matches to subscribers")
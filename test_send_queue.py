@@ -0,0 +1,99 @@
+import asyncio
+
+from manager import ConnectionManager
+from testing import RecordingWebSocket, configured, run_tests, scenario
+
+CHANNEL = "news:HOME:headline"
+
+
+class StalledWebSocket(RecordingWebSocket):
+    """A client that stops reading until `resume` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.resume = asyncio.Event()
+
+    async def send_text(self, text: str):
+        await self.resume.wait()
+        await super().send_text(text)
+
+
+def status(manager, websocket, text):
+    return manager.send_status(websocket, text, None, CHANNEL)
+
+
+@scenario
+async def test_backed_up_client_gets_only_current_frames():
+    restore = configured(SEND_QUEUE_SIZE=3)
+    try:
+        manager = ConnectionManager()
+        websocket = StalledWebSocket()
+        await manager.connect(websocket, CHANNEL)
+        await status(manager, websocket, "loading")
+        await asyncio.sleep(0)  # The writer takes the first frame and blocks on it
+
+        await manager.broadcast(CHANNEL, {"type": "data", "version": 1, "data": ["a"]}, ["a"])
+        await status(manager, websocket, "syncing")
+        await status(manager, websocket, "ready")
+        # Full: a newer status replaces the queued one, a newer update becomes the newest snapshot
+        await status(manager, websocket, "syncing")
+        await manager.broadcast(CHANNEL, {"type": "delta", "version": 2, "base": 1, "added": [], "removed": [], "updated": []}, ["b"])
+        assert manager.queue_counters["coalesced"] == 2
+
+        websocket.resume.set()
+        await manager.flush()
+        assert [f["data"]["status"] if f["type"] == "status" else f["data"] for f in websocket.frames] == [
+            "loading", ["b"], "syncing", "syncing",
+        ]
+        assert websocket.frames[1] == {"type": "data", "channel": CHANNEL, "version": 2, "data": ["b"]}
+    finally:
+        restore()
+
+
+@scenario
+async def test_lost_update_is_resent_as_snapshot():
+    restore = configured(SEND_QUEUE_SIZE=1)
+    try:
+        manager = ConnectionManager()
+        websocket = StalledWebSocket()
+        await manager.connect(websocket, CHANNEL)
+        await manager.send(websocket, None, {"type": "error", "error": "first"})
+        await asyncio.sleep(0)
+        await manager.send(websocket, None, {"type": "error", "error": "second"})
+        # Queue full of a frame that cannot be merged: the update is dropped
+        await manager.broadcast(CHANNEL, {"type": "data", "version": 1, "data": ["a"]}, ["a"])
+        assert manager.queue_counters["dropped"] == 1
+
+        websocket.resume.set()
+        await manager.flush()
+        delta = {"type": "delta", "version": 2, "base": 1, "added": [{"url": "b"}], "removed": [], "updated": []}
+        await manager.broadcast(CHANNEL, delta, ["b"])
+        await manager.flush()
+        assert websocket.frames[-1] == {"type": "data", "channel": CHANNEL, "version": 2, "data": ["b"]}
+    finally:
+        restore()
+
+
+@scenario
+async def test_stalled_client_is_evicted():
+    restore = configured(SEND_QUEUE_SIZE=1, SLOW_CONSUMER_SECONDS=0)
+    try:
+        manager = ConnectionManager()
+        stalled, healthy = StalledWebSocket(), StalledWebSocket()
+        healthy.resume.set()
+        await manager.connect(stalled, CHANNEL)
+        await manager.connect(healthy, CHANNEL)
+        for version in range(1, 5):
+            await manager.broadcast(CHANNEL, {"type": "data", "version": version, "data": [version]}, [version])
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+        assert manager.queue_counters["slow_consumer"] == 1
+        assert stalled.close_code is not None and stalled not in manager.subscriptions and stalled not in manager.outboxes
+        assert manager.active_connections[CHANNEL] == {healthy}
+        assert [f["version"] for f in healthy.frames] == [1, 2, 3, 4]
+    finally:
+        restore()
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Send queues coalesce, drop and evict as expected")
@@ -0,0 +1,108 @@
+from snapshots import SnapshotStore
+from testing import run_tests
+
+CHANNEL = "news:HOME:headline"
+
+
+def item(name: str, latest: bool = False, topic: str = None) -> dict:
+    return {"topic": topic or name.upper(), "images": [], "categories": ["News"], "isLatest": latest,
+            "url": f"https://3news.com/news/{name}", "route": f"/news/{name}"}
+
+
+def apply(items: list, message: dict) -> list:
+    """Apply a data or delta message the way the README tells clients to."""
+    if message["type"] == "data":
+        return list(message["data"])
+    updated = {i["url"]: i for i in message["updated"]}
+    result = [updated.get(i["url"], i) for i in items if i["url"] not in message["removed"]] + message["added"]
+    if "order" in message:
+        by_url = {i["url"]: i for i in result}
+        result = [by_url[url] for url in message["order"]]
+    return result
+
+
+def test_updates_become_deltas():
+    store = SnapshotStore()
+    first = store.update(CHANNEL, [item("a", True), item("b")])
+    assert first["type"] == "data"
+    assert store.update(CHANNEL, [item("a", True), item("b")]) is None
+
+    payload = [item("c", True), item("a"), item("b", topic="B, revised")]
+    delta = store.update(CHANNEL, payload)
+    assert delta["type"] == "delta" and delta["base"] == first["version"]
+    assert [i["url"] for i in delta["added"]] == [item("c")["url"]]
+    assert [i["url"] for i in delta["updated"]] == [item("a")["url"], item("b")["url"]]
+    assert apply(first["data"], delta) == payload
+
+    # Non-list payloads are always sent whole
+    store.update("news:liveTV", {"video_url": "v1", "title": "t"})
+    assert store.update("news:liveTV", {"video_url": "v2", "title": "t"})["type"] == "data"
+
+
+def test_repeated_urls_keep_their_first_occurrence():
+    store = SnapshotStore()
+    a = item("a", True)
+    first = store.update(CHANNEL, [a, item("b"), a])
+    assert first["data"] == [a, item("b")]
+
+    delta = store.update(CHANNEL, [item("c", True), item("a"), item("b"), item("a")])
+    assert apply(first["data"], delta) == [item("c", True), item("a"), item("b")]
+    assert store.payload(CHANNEL) == [item("c", True), item("a"), item("b")]
+
+
+def test_since_catches_clients_up():
+    store = SnapshotStore(history=2)
+    versions = []
+    payloads = [[item("a")], [item("a"), item("b")], [item("b")], [item("b"), item("c")]]
+    for payload in payloads:
+        store.update(CHANNEL, payload)
+        versions.append(store.version(CHANNEL))
+
+    assert store.since(CHANNEL, versions[-1]) is None
+    catch_up = store.since(CHANNEL, versions[1])
+    assert catch_up["type"] == "delta" and apply(payloads[1], catch_up) == payloads[-1]
+    # Out of the history, or never issued here: the full snapshot
+    assert store.since(CHANNEL, versions[0])["type"] == "data"
+    assert store.since(CHANNEL, versions[-1] + 5)["type"] == "data"
+    assert store.since("news:POLITICS:headline", 3) is None
+
+
+def test_versions_survive_restarts_and_eviction():
+    before = SnapshotStore()
+    before.update(CHANNEL, [item("a")])
+    old = before.version(CHANNEL)
+
+    # A restarted process never reissues a version a client may hold
+    after = SnapshotStore(epoch=old)
+    after.update(CHANNEL, [item("b")])
+    assert after.version(CHANNEL) > old
+    assert after.since(CHANNEL, old)["type"] == "data"
+
+    store = SnapshotStore(max_channels=2, epoch=0)
+    for name in ("a", "b", "c"):
+        store.update(f"news:topic_detail:{name}", {"url": name})
+    assert len(store) == 2 and store.version("news:topic_detail:a") == 0 and store.evicted == 1
+    # Rebuilt after eviction: a fresh version, not the one the evicted snapshot had
+    store.update("news:topic_detail:a", {"url": "a"})
+    assert store.version("news:topic_detail:a") == 4
+
+    # Adopting the leader's versions moves the counter past them
+    store.adopt(CHANNEL, [item("a")], 100)
+    store.update(CHANNEL, [item("b")])
+    assert store.version(CHANNEL) == 101
+
+
+def test_a_new_leader_epoch_replaces_older_versions():
+    store = SnapshotStore(epoch=0)
+    store.adopt(CHANNEL, [item("a")], 50, epoch=1)
+    # The next leader's versions may be lower; its epoch decides
+    store.adopt(CHANNEL, [item("b")], 10, epoch=2)
+    assert store.payload(CHANNEL) == [item("b")] and store.version(CHANNEL) == 10
+    # A late message from the replaced leader is ignored
+    store.adopt(CHANNEL, [item("c")], 60, epoch=1)
+    store.adopt(CHANNEL, [item("c")], 9, epoch=2)
+    assert store.payload(CHANNEL) == [item("b")]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Snapshots turn updates into deltas that rebuild the channel")
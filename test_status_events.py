@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from manager import ConnectionManager, status_event
+from testing import RecordingWebSocket, run_tests, scenario
+
+CHANNEL = "news:HOME:headline"
+
+
+def kinds(websocket):
+    return [f["data"]["status"] if f["type"] == "status" else f["type"] for f in websocket.frames]
+
+
+async def sync_cycle(manager):
+    await manager.broadcast_status(CHANNEL, "syncing", "Syncing HOME headlines")
+    delta = {"type": "delta", "version": 2, "base": 1, "added": [], "removed": [], "updated": []}
+    await manager.broadcast(CHANNEL, {**delta, "status": status_event("ready", "Sync complete")}, ["b"])
+    await manager.flush()
+
+
+@scenario
+async def test_clients_choose_their_status_traffic():
+    manager = ConnectionManager()
+    clients = {mode: RecordingWebSocket() for mode in ("all", "final", "folded")}
+    for mode, websocket in clients.items():
+        await manager.connect(websocket, CHANNEL, mode)
+    await sync_cycle(manager)
+
+    assert kinds(clients["all"]) == ["syncing", "delta", "ready"]
+    assert kinds(clients["final"]) == ["delta", "ready"]
+    assert kinds(clients["folded"]) == ["delta"]
+    folded = clients["folded"].frames[0]
+    assert folded["status"]["status"] == "ready" and folded["channel"] == CHANNEL
+    # Everyone sees the same event, timestamp included
+    assert clients["all"].frames[2]["data"] == folded["status"]
+    # in UTC, with the offset spelled out
+    assert datetime.fromisoformat(folded["status"]["timestamp"]).utcoffset() == timedelta(0)
+    assert "status" not in clients["all"].frames[1]
+
+
+@scenario
+async def test_connect_statuses_are_skipped_or_folded():
+    manager = ConnectionManager()
+    chatty, quiet = RecordingWebSocket(), RecordingWebSocket()
+    await manager.connect(chatty, CHANNEL)
+    await manager.connect(quiet, CHANNEL, "folded")
+    for websocket in (chatty, quiet):
+        await manager.send_status(websocket, "loading", "Connecting to channel", CHANNEL)
+        await manager.send_status(websocket, "fetching", "Fetching initial data", CHANNEL)
+        await manager.send(websocket, CHANNEL, {"type": "data", "version": 1, "data": ["a"], "status": status_event("ready", "Data loaded")})
+    await manager.flush()
+
+    assert kinds(chatty) == ["loading", "fetching", "data", "ready"]
+    assert kinds(quiet) == ["data"] and quiet.frames[0]["status"]["message"] == "Data loaded"
+
+
+@scenario
+async def test_unknown_mode_falls_back_to_all():
+    manager = ConnectionManager()
+    websocket = RecordingWebSocket()
+    await manager.connect(websocket, CHANNEL, "verbose")
+    await sync_cycle(manager)
+    assert kinds(websocket) == ["syncing", "delta", "ready"]
+
+
+if __name__ == "__main__":
+    run_tests(globals(), "Status events reach each client as it asked")
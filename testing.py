@@ -0,0 +1,87 @@
+"""Fakes and helpers shared by the test_*.py scripts."""
+import asyncio
+import functools
+import json
+import unittest
+from types import SimpleNamespace
+
+import config
+
+
+class RecordingWebSocket:
+    """A client socket that keeps every frame it is sent.
+
+    Text frames are decoded from JSON, or kept as sent when `raw`; binary
+    frames are kept as bytes.
+    """
+
+    def __init__(self, host: str = "10.0.0.1", raw: bool = False):
+        self.client = SimpleNamespace(host=host, port=50000)
+        self.raw = raw
+        self.frames = []
+        self.accepted = False
+        self.close_code = None
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, text: str):
+        self.frames.append(text if self.raw else json.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        self.frames.append(data)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+
+class Clock:
+    """A clock that only moves when the test sets `now`."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def configured(**settings):
+    """Apply config overrides, returning a function that restores the old values."""
+    original = {name: getattr(config, name) for name in settings}
+    for name, value in settings.items():
+        setattr(config, name, value)
+    return lambda: [setattr(config, name, value) for name, value in original.items()]
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def scenario(func):
+    """Make an async scenario a plain test function that runs it on a fresh event loop."""
+    @functools.wraps(func)
+    def test(*args, **kwargs):
+        return asyncio.run(func(*args, **kwargs))
+    return test
+
+
+def run_tests(namespace: dict, summary: str):
+    """Run a script's test_* functions in the order they are defined, then print `summary`.
+
+    For the `__main__` block of a test script; pytest collects the same
+    functions. A test raising unittest.SkipTest is reported with its reason
+    and the rest still run; `summary` is only printed if none were skipped.
+    """
+    skipped = False
+    for name, test in list(namespace.items()):
+        if name.startswith("test_") and callable(test):
+            try:
+                test()
+            except unittest.SkipTest as reason:
+                print(f"Skipped {name}: {reason}")
+                skipped = True
+    if not skipped:
+        print(summary)